@@ -0,0 +1,437 @@
+import asyncio
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from llm_providers import ASYNC_PROVIDER_REGISTRY, LLMResponse, estimate_tokens
+from response_cache import ResponseCache
+from deadline import Deadline, DeadlineExceeded, step_timeout
+from dscoder import AIAgent, LLMClient, warm_pool, MAX_LOCAL_REPAIRS
+from execution_cache import ExecutionCache, ExecutionOutcome
+from prompts import build_system_prompt
+from cpp_build import get_cpp_engine
+from output_stream import CHUNK_SIZE, OutputMonitor, kill_group
+from environments import DependencyError
+from local_repair import local_repair
+
+
+class AsyncLLMClient(LLMClient):
+    """asyncio twin of LLMClient, backed by the AsyncOpenAI/AsyncAnthropic SDK clients"""
+
+    provider_registry = ASYNC_PROVIDER_REGISTRY
+
+    async def generate_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 5000,
+        temperature: float = 0,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        deadline: Optional[Deadline] = None,
+        structured: bool = False
+    ) -> LLMResponse:
+        key = self._cache_key(messages, max_tokens, temperature, model, use_cache, structured)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        async def complete() -> LLMResponse:
+            provider = self.current_provider
+            request = dict(
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                model=model,
+                timeout=step_timeout(deadline)
+            )
+            if self.use_structured(self.provider_name, model, structured):
+                try:
+                    return await provider.generate_structured(**request)
+                except Exception as e:
+                    if not self.tool_rejected(self.provider_name, model, e):
+                        raise
+            return await provider.generate_completion(**request)
+
+        response = await self.scheduler.acall(
+            self.provider_name,
+            self.request_tokens(messages, max_tokens),
+            complete,
+            deadline
+        )
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 5000,
+        temperature: float = 0,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        stop_when: Optional[Callable[[str], bool]] = None,
+        deadline: Optional[Deadline] = None,
+        structured: bool = False
+    ) -> LLMResponse:
+        """Async twin of LLMClient.stream_completion"""
+        key = self._cache_key(messages, max_tokens, temperature, model, use_cache, structured)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = await self.scheduler.acall(
+            self.provider_name,
+            self.request_tokens(messages, max_tokens),
+            lambda: self._collect_stream(
+                self.provider_name, messages, max_tokens, temperature, model, stop_when, deadline, structured
+            ),
+            deadline
+        )
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+
+
+    async def _collect_stream(
+        self,
+        provider: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str],
+        stop_when: Optional[Callable[[str], bool]] = None,
+        deadline: Optional[Deadline] = None,
+        structured: bool = False
+    ) -> LLMResponse:
+        """Async twin of LLMClient._collect_stream"""
+        provider_instance = self.get_provider(provider)
+        use_tool = self.use_structured(provider, model, structured)
+        content = ""
+        tokens_used = 0
+        stopped_early = False
+        stream = (provider_instance.stream_structured if use_tool else provider_instance.stream_completion)(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            model=model,
+            timeout=step_timeout(deadline)
+        )
+        try:
+            async for chunk in stream:
+                if deadline is not None:
+                    deadline.check()
+                content += chunk.content
+                tokens_used += chunk.tokens_used
+                if chunk.content and stop_when is not None and stop_when(content):
+                    stopped_early = True
+                    break
+        except Exception as e:
+            if not (use_tool and not content and self.tool_rejected(provider, model, e)):
+                raise
+            return await self._collect_stream(provider, messages, max_tokens, temperature, model, stop_when, deadline)
+        finally:
+            await stream.aclose()
+
+        if stopped_early and tokens_used == 0:
+            # Cancelled before the provider reported usage
+            prompt = "".join(message["content"] for message in messages)
+            tokens_used = estimate_tokens(prompt) + estimate_tokens(content)
+
+        return LLMResponse(
+            content=content,
+            tokens_used=tokens_used,
+            model=model or provider_instance.default_model,
+            provider=provider
+        )
+
+
+class AsyncAIAgent(AIAgent):
+    """
+    asyncio twin of AIAgent.
+
+    The attempt loop awaits LLM calls and runs candidates with
+    asyncio.create_subprocess_exec, so a single event loop can drive many
+    generations concurrently. Prompting, extraction, result checking and
+    file handling are shared with AIAgent.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if kwargs.get("race"):
+            raise ValueError("Racing providers is only supported by AIAgent")
+        if kwargs.get("candidates", 1) > 1:
+            raise ValueError("Several candidates per attempt are only supported by AIAgent")
+        super().__init__(*args, **kwargs)
+
+    def create_llm_client(self, provider: str, cache: Optional[ResponseCache]) -> AsyncLLMClient:
+        """Builds the asyncio LLM client used by the agent"""
+        return AsyncLLMClient(provider, cache=cache)
+
+    async def request_code(self) -> Optional[str]:
+        """Asks the LLM for code based on the current messages and returns the extracted block"""
+        if self.stream:
+            # Stop reading as soon as a complete code block has arrived
+            watcher = self.reply_watcher()
+            response = await self.llm_client.stream_completion(
+                messages=self.messages,
+                max_tokens=1500,
+                temperature=self.temperature,
+                model=self.model,
+                stop_when=watcher,
+                deadline=self.deadline,
+                structured=self.structured
+            )
+            generated_code = (watcher and watcher.code) or self.extract_reply(response.content)
+        else:
+            response = await self.llm_client.generate_completion(
+                messages=self.messages,
+                max_tokens=1500,
+                temperature=self.temperature,
+                model=self.model,
+                deadline=self.deadline,
+                structured=self.structured
+            )
+            generated_code = self.extract_reply(response.content)
+
+        self.record_response(response)
+        return generated_code
+
+    async def execute_code(
+        self,
+        file_path: str,
+        language: str,
+        expected_output: Optional[str] = None
+    ) -> Tuple[str, Optional[str]]:
+        """Async twin of AIAgent.execute_code that does not block the event loop"""
+        loop = asyncio.get_running_loop()
+        try:
+            timeout = self.step_timeout()
+            environment = await loop.run_in_executor(
+                None, self.candidate_environment, file_path, language, timeout
+            )
+            timeout = self.step_timeout()
+        except DeadlineExceeded:
+            return "", "Code execution timeout"
+        except DependencyError as e:
+            return "", str(e)
+
+        if language.lower() == "cpp":
+            engine = get_cpp_engine(self.cpp_profile)
+            return self.run_result(await loop.run_in_executor(
+                None, engine.run, file_path, timeout, timeout, expected_output
+            ))
+
+        pool = warm_pool(language) if self.warm_executors and environment is None else None
+        if pool is not None:
+            return self.run_result(await loop.run_in_executor(
+                None, pool.run, file_path, timeout, "run", expected_output
+            ))
+
+        command = self.execution_command(file_path, language, environment)
+        if command is None:
+            return "", f"Unsupported language: {language}"
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+                env={**os.environ, **environment.variables} if environment and environment.variables else None
+            )
+        except Exception as e:
+            return "", str(e)
+
+        monitor = OutputMonitor(expected_output)
+
+        async def read(stream: asyncio.StreamReader, feed: Callable[[bytes], None]) -> None:
+            while True:
+                data = await stream.read(CHUNK_SIZE)
+                if not data:
+                    return
+                feed(data)
+                if monitor.diverged:
+                    # Closes both pipes, which ends the other reader too
+                    kill_group(process.pid)
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(read(process.stdout, monitor.feed_stdout), read(process.stderr, monitor.feed_stderr)),
+                timeout=timeout
+            )
+            await asyncio.wait_for(process.wait(), timeout=self.step_timeout())
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            timed_out = True
+        finally:
+            if process.returncode is None:
+                kill_group(process.pid)
+                await process.wait()
+
+        return self.run_result(monitor.result(process.returncode, timed_out=timed_out))
+
+    async def run_candidate(self, code: str, language: str, expected_output: Optional[str]) -> ExecutionOutcome:
+        """Async twin of AIAgent.run_candidate"""
+        key = ExecutionCache.make_key(language, code, expected_output)
+        outcome = self.reused_outcome(key)
+        if outcome is not None:
+            return outcome
+
+        with self.candidate_file(code, language) as file_name:
+            loop = asyncio.get_running_loop()
+            diagnostics = await loop.run_in_executor(None, self.validate_code, file_name, language)
+            if diagnostics:
+                outcome = ExecutionOutcome(diagnostics, rejected=True)
+            else:
+                result, error_result = await self.execute_code(file_name, language, expected_output)
+                outcome = ExecutionOutcome(self.check_result(result, error_result, expected_output))
+        self.store_outcome(key, outcome)
+        return outcome
+
+    async def repair_locally(
+        self,
+        code: str,
+        language: str,
+        expected_output: Optional[str],
+        outcome: ExecutionOutcome
+    ) -> Tuple[str, ExecutionOutcome]:
+        """Async twin of AIAgent.repair_locally"""
+        for _ in range(MAX_LOCAL_REPAIRS):
+            fix = local_repair(code, outcome.error, language, self.dependency_envs)
+            if fix is None:
+                break
+            self.log(f"Local repair: {fix.description}", "info", self.trace)
+            self.metrics_collector.record_local_repair()
+            code = fix.code
+            self.context.record_code(code)
+            outcome = await self.run_candidate(code, language, expected_output)
+            if outcome.error is None:
+                break
+        return code, outcome
+
+    async def generate_code(
+        self,
+        description: str,
+        language: str = "python",
+        expected_output: Optional[str] = None,
+        max_attempts: int = 5,
+        timeout: float = 120.0
+    ) -> Optional[str]:
+        """Generates code based on provided description (see AIAgent.generate_code)"""
+        attempts = 0
+        previous_code = ""
+        error_result = ""
+        generated_code = ""
+        last_version = None
+        self.deadline = Deadline(timeout)
+        self.reset_job_state()
+        self.context.start(
+            self.build_task(description, language, expected_output),
+            language,
+            system_prompt=build_system_prompt(language, self.dependency_envs)
+        )
+
+        while attempts < max_attempts:
+            if self.deadline.expired():
+                self.log("Global timeout reached", "error", True)
+                break
+
+            attempts += 1
+            self.log(f"\n[Attempt {attempts}/{max_attempts}]", "info", False)
+
+            self.messages = self.context.build_messages()
+
+            try:
+                self.edit_error = None
+                generated_code = await self.request_code()
+                if not generated_code and self.edit_error:
+                    # The edits did not apply: ask again for the whole program
+                    with self.full_code_request():
+                        generated_code = await self.request_code()
+                if not generated_code:
+                    self.log("No valid code found in response", "error", True)
+                    error_result = "Response contains no valid code"
+                    self.context.record_error(error_result)
+                    continue
+
+                if self.trace:
+                    self.log("\nExtracted Code:", "info")
+                    self.log(generated_code, "info")
+
+                last_version = generated_code
+                self.context.record_code(generated_code)
+
+                # Validate and execute code, unless an identical candidate already ran
+                outcome = await self.run_candidate(generated_code, language, expected_output)
+                if outcome.error is not None:
+                    generated_code, outcome = await self.repair_locally(generated_code, language, expected_output, outcome)
+                    last_version = generated_code
+                if outcome.error is None:
+                    # Success!
+                    return self.finish_success(generated_code, language)
+
+                previous_code = generated_code
+                if not self.record_failure(generated_code, outcome):
+                    break
+
+            except DeadlineExceeded:
+                self.log("Global timeout reached", "error", True)
+                break
+            except Exception as e:
+                error = self.error_handler.handle_error(e, "Error generating code")
+                self.log(error, "error", True)
+                self.metrics_collector.update_metrics(0, False, error)
+                last_version = previous_code if previous_code else None
+
+        # Finalization after attempts or timeout
+        return self.finish_failure(last_version, language)
+
+
+async def adscoder(
+    description: str,
+    language: str = "python",
+    provider: str = "deepseek",
+    model: Optional[str] = None,
+    trace: bool = False,
+    timeout: int = 120,
+    max_attempts: int = 5,
+    expected_output: Optional[str] = None,
+    use_cache: bool = True,
+    stream: bool = True,
+    warm_executors: bool = True,
+    cpp_profile: str = "iterate",
+    keep_artifacts: bool = False,
+    dependency_envs: bool = False,
+    edit_repairs: bool = True,
+    structured_output: bool = True,
+) -> Optional[str]:
+    """
+    asyncio twin of dscoder(). Takes the same arguments and must be awaited.
+
+    Example:
+        >>> async def main():
+        ...     codes = await asyncio.gather(*[
+        ...         adscoder(description=task, language="python")
+        ...         for task in tasks
+        ...     ])
+
+    See Also:
+        dscoder(): Synchronous interface and full argument reference
+        AsyncAIAgent: Core implementation class
+    """
+    try:
+        agent = AsyncAIAgent(provider=provider, trace=trace, model=model, use_cache=use_cache,
+                             stream=stream, warm_executors=warm_executors,
+                             cpp_profile=cpp_profile, keep_artifacts=keep_artifacts,
+                             dependency_envs=dependency_envs, edit_repairs=edit_repairs,
+                             structured_output=structured_output)
+        return await agent.generate_code(
+            description=description,
+            language=language,
+            expected_output=expected_output,
+            max_attempts=max_attempts,
+            timeout=timeout
+        )
+    except Exception as e:
+        raise RuntimeError(f"Code generation failed: {str(e)}") from e
@@ -0,0 +1,431 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from dscoder import AIAgent, LLMClient, warm_pool
+from cpp_build import FLAG_PROFILES
+from response_cache import ResponseCache
+from execution_cache import ExecutionCache
+from rate_limiter import configure_rate_limits, get_rate_limit_scheduler
+from worker_pool import WorkerPool
+
+LANGUAGES = ("python", "cpp", "r", "julia", "rcpp")
+
+# Optional job fields and the types they must have when set
+JOB_FIELDS = {
+    "language": str,
+    "provider": str,
+    "model": str,
+    "expected_output": str,
+    "max_attempts": int,
+    "timeout": (int, float),
+}
+
+
+def job_id(job: Dict[str, Any]) -> str:
+    """Returns the job's own id, or a stable hash of its contents"""
+    if job.get("id") is not None:
+        return str(job["id"])
+    payload = json.dumps(job, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def check_job(job: Any) -> Optional[str]:
+    """Returns why a job record is invalid, or None; null fields count as missing"""
+    if not isinstance(job, dict):
+        return "is not a JSON object"
+    if not job.get("description") or not isinstance(job["description"], str):
+        return "has no description"
+    for key, kind in JOB_FIELDS.items():
+        value = job.get(key)
+        if value is None:
+            continue
+        if not isinstance(value, kind) or isinstance(value, bool):
+            return f"has an invalid {key}: {value!r}"
+        if key == "language" and value.lower() not in LANGUAGES:
+            return f"has an unsupported language: {value!r}"
+        if key in ("max_attempts", "timeout") and value <= 0:
+            return f"has a non-positive {key}: {value!r}"
+    return None
+
+
+def read_jobs(jobs_path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yields (id, record) pairs from a JSONL jobs file, skipping blank lines.
+
+    Raises:
+        ValueError: On a line that is not valid JSON or an invalid job (see check_job)
+    """
+    with open(jobs_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number} of {jobs_path}: {e}") from e
+            problem = check_job(job)
+            if problem:
+                raise ValueError(f"Job on line {line_number} of {jobs_path} {problem}")
+            yield job_id(job), job
+
+
+def read_checkpoint(checkpoint_path: str) -> Set[str]:
+    """Returns the ids of jobs already finished by a previous run"""
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+class BatchRunner:
+    """
+    Runs many code generation jobs on a bounded thread pool.
+
+    LLM clients (and so their HTTP connections) and the response cache are
+    shared by every job using the same provider, and candidate outcomes by
+    every job; each job still gets its own AIAgent, as agents keep per-job
+    conversation state. Results are appended
+    to a JSONL file as jobs finish, and each finished job id is recorded in a
+    checkpoint file so an interrupted run can be resumed.
+    With warm executors, each language's pool grows to one worker per job
+    thread (up to the number of jobs in that language).
+
+    Attributes:
+        workers: Maximum number of jobs running at once
+        defaults: Values used for fields missing from a job record
+        use_cache: Whether the shared response cache is used
+        stream: Whether completions are streamed
+        warm_executors: Whether candidates run in warm interpreter workers
+        cpp_profile: C++ compiler flag profile of every job
+        keep_artifacts: Whether every attempt is kept under output/temp
+        dependency_envs: Whether missing packages are installed into cached environments
+        edit_repairs: Whether repair attempts ask for search/replace edits
+        structured_output: Whether code is requested through a structured tool call
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        language: str = "python",
+        provider: str = "openrouter",
+        model: Optional[str] = None,
+        max_attempts: int = 5,
+        use_cache: bool = True,
+        stream: bool = True,
+        warm_executors: bool = True,
+        timeout: float = 120.0,
+        cpp_profile: str = "iterate",
+        keep_artifacts: bool = False,
+        dependency_envs: bool = False,
+        edit_repairs: bool = True,
+        structured_output: bool = True
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.defaults = {
+            "language": language,
+            "provider": provider,
+            "model": model,
+            "max_attempts": max_attempts,
+            "timeout": timeout,
+            "expected_output": None,
+        }
+        self.use_cache = use_cache
+        self.stream = stream
+        self.warm_executors = warm_executors
+        self.cpp_profile = cpp_profile
+        self.keep_artifacts = keep_artifacts
+        self.dependency_envs = dependency_envs
+        self.edit_repairs = edit_repairs
+        self.structured_output = structured_output
+        self.cache = ResponseCache(Path("output") / "cache" / "responses.sqlite3") if use_cache else None
+        self.execution_cache = ExecutionCache() if use_cache else None
+        self._clients: Dict[str, LLMClient] = {}
+        self._clients_lock = threading.Lock()
+
+    def get_client(self, provider: str) -> LLMClient:
+        """Returns the shared client for provider, building it on first use"""
+        with self._clients_lock:
+            if provider not in self._clients:
+                self._clients[provider] = LLMClient(provider, cache=self.cache)
+            return self._clients[provider]
+
+    def settings(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Job fields with the defaults filled in for missing and null ones"""
+        return {
+            key: job[key] if job.get(key) is not None else default
+            for key, default in self.defaults.items()
+        }
+
+    def run_job(self, identifier: str, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs a single job and returns its result record"""
+        settings = self.settings(job)
+        result = {
+            "id": identifier,
+            "description": job["description"],
+            "language": settings["language"],
+            "provider": settings["provider"],
+            "model": settings["model"],
+            "success": False,
+            "code": None,
+            "error": None,
+        }
+        start = time.monotonic()
+        try:
+            agent = AIAgent(
+                provider=settings["provider"],
+                model=settings["model"],
+                use_cache=self.use_cache,
+                stream=self.stream,
+                warm_executors=self.warm_executors,
+                llm_client=self.get_client(settings["provider"]),
+                execution_cache=self.execution_cache,
+                cpp_profile=self.cpp_profile,
+                keep_artifacts=self.keep_artifacts,
+                dependency_envs=self.dependency_envs,
+                edit_repairs=self.edit_repairs,
+                structured_output=self.structured_output
+            )
+            result["code"] = agent.generate_code(
+                description=job["description"],
+                language=settings["language"],
+                expected_output=settings["expected_output"],
+                max_attempts=settings["max_attempts"],
+                timeout=settings["timeout"]
+            )
+            metrics = agent.metrics_collector
+            result["success"] = metrics.successful_generations > 0
+            result["tokens"] = metrics.total_tokens
+            if not result["success"] and metrics.errors:
+                result["error"] = metrics.errors[-1]
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {str(e)}"
+        result["elapsed"] = round(time.monotonic() - start, 3)
+        return result
+
+    def run(self, jobs_path: str, output_path: str, checkpoint_path: str) -> Dict[str, int]:
+        """
+        Runs every job in jobs_path not already listed in checkpoint_path.
+
+        Returns:
+            Dict[str, int]: Counts of succeeded, failed and skipped jobs
+        """
+        done = read_checkpoint(checkpoint_path)
+        pending: List[Tuple[str, Dict[str, Any]]] = []
+        skipped = 0
+        for identifier, job in read_jobs(jobs_path):
+            if identifier in done:
+                skipped += 1
+            else:
+                done.add(identifier)  # also drops duplicate jobs within the file
+                pending.append((identifier, job))
+
+        for path in (output_path, checkpoint_path):
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        if self.warm_executors:
+            # One warm worker per job thread that can use it, so jobs of
+            # every language run concurrently rather than queueing on a
+            # single server
+            demand: Dict[WorkerPool, int] = {}
+            for _, job in pending:
+                pool = warm_pool(self.settings(job)["language"])
+                if pool is not None:
+                    demand[pool] = demand.get(pool, 0) + 1
+            for pool, jobs in demand.items():
+                pool.grow(min(self.workers, jobs))
+                # Warm up while the first LLM requests are in flight
+                pool.start()
+
+        summary = {"succeeded": 0, "failed": 0, "skipped": skipped}
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        futures = []
+        try:
+            with open(output_path, "a", encoding="utf-8") as output, \
+                    open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+                futures = [pool.submit(self.run_job, identifier, job) for identifier, job in pending]
+                for future in as_completed(futures):
+                    result = future.result()
+                    output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    output.flush()
+                    os.fsync(output.fileno())
+                    # The checkpoint is only written once the result is safely on disk
+                    checkpoint.write(result["id"] + "\n")
+                    checkpoint.flush()
+                    os.fsync(checkpoint.fileno())
+                    summary["succeeded" if result["success"] else "failed"] += 1
+        finally:
+            # On interruption, queued jobs are dropped; they are not checkpointed
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+        return summary
+
+
+def batch_main(argv: Optional[List[str]] = None):
+    """Command-line entry point for `dscoder batch`"""
+    parser = ArgumentParser(
+        prog="dscoder batch",
+        description="Generate code for every job in a JSONL file."
+    )
+    parser.add_argument(
+        "jobs",
+        type=str,
+        help="JSONL file with one {description, language, expected_output, provider, model} record per line."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of jobs run concurrently."
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="JSONL file results are appended to (default: output/<jobs>.results.jsonl)."
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default=None,
+        help="File recording finished jobs (default: <output>.checkpoint)."
+    )
+    parser.add_argument(
+        "--language",
+        type=str,
+        default="python",
+        choices=list(LANGUAGES),
+        help="Language for jobs that do not set one."
+    )
+    parser.add_argument(
+        "--provider",
+        type=str,
+        default="openrouter",
+        choices=["openai", "anthropic", "deepseek", "openrouter"],
+        help="LLM provider for jobs that do not set one."
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default=None,
+        help="Model for jobs that do not set one."
+    )
+    parser.add_argument(
+        "--max_attempts",
+        type=int,
+        default=5,
+        help="Maximum attempts per job."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=120.0,
+        help="Time budget in seconds of each job that does not set one."
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Bypass the LLM response cache."
+    )
+    parser.add_argument(
+        "--no_stream",
+        action="store_true",
+        help="Wait for complete responses instead of streaming them."
+    )
+    parser.add_argument(
+        "--no_warm_executors",
+        action="store_true",
+        help="Run every attempt in a fresh interpreter process."
+    )
+    parser.add_argument(
+        "--cpp_profile",
+        type=str,
+        default="iterate",
+        choices=list(FLAG_PROFILES),
+        help="C++ flags: iterate (-O0) or bench (-O2 -march=native)."
+    )
+    parser.add_argument(
+        "--keep_artifacts",
+        action="store_true",
+        help="Keep every attempt under output/temp instead of running it from memory."
+    )
+    parser.add_argument(
+        "--dependency_envs",
+        action="store_true",
+        help="Install packages a candidate imports but the interpreter lacks into a cached environment."
+    )
+    parser.add_argument(
+        "--no_edit_repairs",
+        action="store_true",
+        help="Ask for the whole program on every repair attempt instead of edits."
+    )
+    parser.add_argument(
+        "--no_structured_output",
+        action="store_true",
+        help="Extract code from markdown blocks instead of a structured tool call."
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=None,
+        help="Requests-per-minute limit of the default provider."
+    )
+    parser.add_argument(
+        "--tpm",
+        type=float,
+        default=None,
+        help="Tokens-per-minute limit of the default provider."
+    )
+
+    args = parser.parse_args(argv)
+    if args.rpm or args.tpm:
+        configure_rate_limits(args.provider, args.rpm, args.tpm)
+    output_path = args.output or str(Path("output") / f"{Path(args.jobs).stem}.results.jsonl")
+    checkpoint_path = args.checkpoint or f"{output_path}.checkpoint"
+
+    runner = BatchRunner(
+        workers=args.workers,
+        language=args.language,
+        provider=args.provider,
+        model=args.model,
+        max_attempts=args.max_attempts,
+        use_cache=not args.no_cache,
+        stream=not args.no_stream,
+        warm_executors=not args.no_warm_executors,
+        timeout=args.timeout,
+        cpp_profile=args.cpp_profile,
+        keep_artifacts=args.keep_artifacts,
+        dependency_envs=args.dependency_envs,
+        edit_repairs=not args.no_edit_repairs,
+        structured_output=not args.no_structured_output
+    )
+
+    try:
+        summary = runner.run(args.jobs, output_path, checkpoint_path)
+    except KeyboardInterrupt:
+        print(f"\nOperation interrupted by the user. Rerun to resume from {checkpoint_path}.")
+        exit(1)
+    except Exception as e:
+        print(f"\nFatal error: {str(e)}")
+        exit(1)
+
+    print(
+        f"\nBatch finished: {summary['succeeded']} succeeded, {summary['failed']} failed, "
+        f"{summary['skipped']} skipped. Results in {output_path}"
+    )
+    for provider, stats in get_rate_limit_scheduler().stats().items():
+        print(
+            f"{provider}: {stats['requests']} requests, {stats['throttled']} rate limited, "
+            f"peak queue {stats['max_queue_depth']}, avg wait {stats['avg_wait']}s, max wait {stats['max_wait']}s"
+        )
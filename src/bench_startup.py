@@ -0,0 +1,81 @@
+"""
+CLI cold-start benchmark.
+
+Measures the cumulative import time of the dscoder module with
+``python -X importtime`` in fresh interpreters, checks that no heavy
+dependency (provider SDKs, rich) is imported at startup, and fails when the
+median exceeds the regression budget.
+
+Usage:
+    python bench_startup.py [--runs 5] [--budget_ms 250]
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+from typing import Dict, List
+
+# Modules that must only be imported once they are actually used
+HEAVY_MODULES = ["openai", "anthropic", "rich", "httpx", "asyncio"]
+
+# Regression budget for the median cumulative import time of dscoder
+DEFAULT_BUDGET_MS = 250.0
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_import(module: str = "dscoder") -> Dict[str, float]:
+    """
+    Imports module in a fresh interpreter under -X importtime.
+
+    Returns:
+        Dict[str, float]: Cumulative import time in milliseconds of every
+                          top-level module imported at startup
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    timings = {}
+    for line in process.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)$", line)
+        if match and not match.group(2).startswith(" "):
+            timings[match.group(2)] = int(match.group(1)) / 1000
+    return timings
+
+
+def heavy_imports(timings: Dict[str, float]) -> List[str]:
+    """Returns the heavy modules that were imported at startup"""
+    return [module for module in HEAVY_MODULES if module in timings]
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark dscoder CLI cold start.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to measure.")
+    parser.add_argument("--budget_ms", type=float, default=DEFAULT_BUDGET_MS, help="Regression budget in milliseconds.")
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        timings = measure_import("dscoder")
+        eager = heavy_imports(timings)
+        if eager:
+            print(f"FAIL: imported at startup: {', '.join(eager)}")
+            sys.exit(1)
+        samples.append(timings["dscoder"])
+
+    median = statistics.median(samples)
+    print(f"dscoder import: median {median:.1f} ms, min {min(samples):.1f} ms over {args.runs} runs "
+          f"(budget {args.budget_ms:.0f} ms)")
+    if median > args.budget_ms:
+        print("FAIL: startup time over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
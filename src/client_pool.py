@@ -0,0 +1,158 @@
+import hashlib
+import sys
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+class ClientPool:
+    """
+    Process-wide pool of provider SDK clients.
+
+    SDK clients own an HTTP connection pool, so building a new one per agent
+    pays a fresh TCP/TLS handshake on every generation. This pool hands out
+    one client per SDK, base URL, API key and headers, built on a shared
+    HTTP transport configuration with keep-alive connections.
+
+    Attributes:
+        max_connections: Maximum open connections per client
+        max_keepalive_connections: Maximum idle connections kept alive per client
+        keepalive_expiry: Seconds an idle connection is kept alive
+        timeout: Default request timeout in seconds
+        connect_timeout: Connection timeout in seconds
+        max_retries: Retries performed by the SDK itself. 0 by default:
+                     RateLimitScheduler owns retries, and SDK retries of 429
+                     responses would bypass its backoff and token pacing
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 600.0,
+        connect_timeout: float = 10.0,
+        max_retries: int = 0
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self._clients: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, sdk: str, api_key: str, base_url: Optional[str],
+             default_headers: Optional[Dict[str, str]], asynchronous: bool) -> Tuple:
+        """Builds the pool key; the API key is hashed so it is not kept as a dict key"""
+        loop = None
+        if asynchronous:
+            # Async connections belong to the event loop that opened them. No
+            # loop can run before asyncio is imported, and importing it here
+            # would slow down every CLI start
+            asyncio = sys.modules.get("asyncio")
+            if asyncio is not None:
+                try:
+                    loop = id(asyncio.get_running_loop())
+                except RuntimeError:
+                    loop = None
+        return (
+            sdk,
+            asynchronous,
+            loop,
+            base_url,
+            hashlib.sha256(api_key.encode("utf-8")).hexdigest(),
+            tuple(sorted((default_headers or {}).items())),
+        )
+
+    def _http_options(self, sdk_module, asynchronous: bool) -> Dict[str, Any]:
+        """Builds the shared HTTP client and timeout arguments for an SDK"""
+        # Both SDKs export their httpx defaults, so the Limits type is reused
+        # from there instead of depending on httpx directly
+        limits = type(sdk_module.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+        timeout = sdk_module.Timeout(self.timeout, connect=self.connect_timeout)
+        http_client_class = (
+            sdk_module.DefaultAsyncHttpxClient if asynchronous else sdk_module.DefaultHttpxClient
+        )
+        return {
+            "http_client": http_client_class(limits=limits, timeout=timeout),
+            "timeout": timeout,
+            "max_retries": self.max_retries,
+        }
+
+    def openai(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        default_headers: Optional[Dict[str, str]] = None,
+        asynchronous: bool = False
+    ):
+        """Returns a shared OpenAI (or AsyncOpenAI) client for an OpenAI-compatible API"""
+        key = self._key("openai", api_key, base_url, default_headers, asynchronous)
+        with self._lock:
+            if key not in self._clients:
+                import openai
+                client_class = openai.AsyncOpenAI if asynchronous else openai.OpenAI
+                self._clients[key] = client_class(
+                    api_key=api_key,
+                    base_url=base_url,
+                    default_headers=default_headers,
+                    **self._http_options(openai, asynchronous)
+                )
+            return self._clients[key]
+
+    def anthropic(self, api_key: str, asynchronous: bool = False):
+        """Returns a shared Anthropic (or AsyncAnthropic) client"""
+        key = self._key("anthropic", api_key, None, None, asynchronous)
+        with self._lock:
+            if key not in self._clients:
+                import anthropic
+                client_class = anthropic.AsyncAnthropic if asynchronous else anthropic.Anthropic
+                self._clients[key] = client_class(
+                    api_key=api_key,
+                    **self._http_options(anthropic, asynchronous)
+                )
+            return self._clients[key]
+
+    def close(self) -> None:
+        """Closes every synchronous client and empties the pool"""
+        with self._lock:
+            clients = list(self._clients.items())
+            self._clients.clear()
+        for key, client in clients:
+            asynchronous = key[1]
+            if not asynchronous:
+                client.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+
+_pool: Optional[ClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> ClientPool:
+    """Returns the process-wide client pool, creating it with defaults on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClientPool()
+        return _pool
+
+
+def configure_client_pool(**kwargs) -> ClientPool:
+    """
+    Replaces the process-wide client pool with one using the given limits and
+    timeouts (see ClientPool). Clients handed out earlier stay usable but are
+    no longer shared.
+    """
+    global _pool
+    with _pool_lock:
+        _pool = ClientPool(**kwargs)
+        return _pool
@@ -0,0 +1,123 @@
+from typing import Dict, List, Optional
+
+from error_digest import digest_error, summarize_error, trim_error
+from llm_providers import estimate_tokens
+from prompts import EDIT_INSTRUCTIONS
+
+
+class ConversationContext:
+    """
+    Builds bounded requests for the generate/repair loop.
+
+    Instead of appending every attempt to an ever-growing message list, each
+    request is rebuilt from: the system prompt, the original task, the latest
+    candidate code (as the assistant turn) and a digest of its error (see
+    error_digest.py). Errors of older attempts are kept only as their
+    headline (the exception or first compiler error), and the whole request
+    is held within a token budget. A hint, when set, is added
+    to the repair request (e.g. to steer the model off a repeated answer).
+    With edits set, repair requests ask for search/replace edits of the
+    latest code (see edits.py) instead of the complete program.
+
+    The system prompt and the task always open the request unchanged, so
+    every attempt of a job shares the same prefix and benefits from provider
+    prompt caching; only the turns after them vary.
+
+    Attributes:
+        system_prompt: System message sent with every request
+        max_tokens: Token budget of a whole request
+        error_tokens: Token budget of the latest error digest
+        history_size: Number of earlier errors summarised
+        edits: Whether repair requests ask for edits of the latest code
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        max_tokens: int = 8000,
+        error_tokens: int = 1000,
+        history_size: int = 3,
+        edits: bool = False
+    ):
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.error_tokens = error_tokens
+        self.history_size = history_size
+        self.edits = edits
+        self.start("")
+
+    def start(self, task: str, language: str = "", system_prompt: Optional[str] = None) -> None:
+        """Starts a new job, forgetting everything from the previous one"""
+        if system_prompt is not None:
+            self.system_prompt = system_prompt
+        self.task = task
+        self.language = language
+        self.code: Optional[str] = None
+        self.error: Optional[str] = None
+        self.digest: Optional[str] = None
+        self.history: List[str] = []
+        self.hint: Optional[str] = None
+
+    def record_code(self, code: str) -> None:
+        """Records the latest candidate returned by the model"""
+        self.code = code
+
+    def record_error(self, error: str) -> None:
+        """Records why the latest attempt failed"""
+        if self.error:
+            self.history.append(summarize_error(self.error, self.language))
+            self.history = self.history[-self.history_size:]
+        self.error = error
+        self.digest = digest_error(error, self.language, self.error_tokens)
+
+    @property
+    def wants_edits(self) -> bool:
+        """Whether the next request asks for edits of the latest code"""
+        return self.edits and self.code is not None and self.error is not None
+
+    def repair_prompt(self, error: str, history: List[str]) -> str:
+        """Builds the user turn asking for a fix of the latest code"""
+        prompt = f"The previous code resulted in the error:\n{error}\n"
+        if history:
+            prompt += "Earlier attempts failed with:\n" + "\n".join(f"- {line}" for line in history) + "\n"
+        if self.hint:
+            prompt += self.hint + "\n"
+        if self.wants_edits:
+            prompt += "Please correct the code. " + EDIT_INSTRUCTIONS
+        else:
+            prompt += "Please correct the code and return the complete corrected version."
+        return prompt
+
+    def build_messages(self) -> List[Dict[str, str]]:
+        """Builds the messages of the next request within the token budget"""
+        history = list(self.history)
+        error_tokens = self.error_tokens
+
+        while True:
+            messages = self._assemble(history, error_tokens)
+            total = sum(estimate_tokens(message["content"]) for message in messages)
+            if total <= self.max_tokens:
+                return messages
+            # Drop older context first, then shrink the error digest
+            if history:
+                history.pop(0)
+            elif self.error and error_tokens > 100:
+                error_tokens //= 2
+            else:
+                return messages
+
+    def _assemble(self, history: List[str], error_tokens: int) -> List[Dict[str, str]]:
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": self.task},
+        ]
+        if self.error is None:
+            return messages
+
+        repair = self.repair_prompt(trim_error(self.digest, error_tokens), history)
+        if self.code is not None:
+            messages.append({"role": "assistant", "content": f"```{self.language}\n{self.code}\n```"})
+        # Without a candidate the repair follows the task as a second user
+        # turn rather than being merged into it, keeping the cached prefix
+        messages.append({"role": "user", "content": repair})
+        return messages
@@ -0,0 +1,249 @@
+"""
+C++ compile-and-run engine.
+
+Candidates are compiled into a content-addressed cache of binaries keyed on
+the source, the compiler flags and the compiler version, so a candidate that
+comes back unchanged (a retry, a cached LLM response, another job) is run
+without recompiling. Common STL headers are precompiled once per flag set
+and force-included, which removes most of the parse time of STL-heavy code.
+
+Flag profiles:
+    iterate: -O0, the fastest compile for the repair loop
+    bench:   -O2 -march=native, for timing the generated code
+"""
+import functools
+import hashlib
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from output_stream import RunResult, run_process
+
+BASE_FLAGS = ["-std=c++17", "-pthread"]
+
+FLAG_PROFILES: Dict[str, List[str]] = {
+    "iterate": ["-O0"],
+    "bench": ["-O2", "-march=native"],
+}
+
+CPP_CACHE_DIR = Path("output") / "cache" / "cpp"
+
+# Headers compiled into the precompiled header
+PCH_HEADERS = [
+    "algorithm", "array", "bitset", "cassert", "chrono", "climits", "cmath",
+    "cstdint", "cstdio", "cstdlib", "cstring", "deque", "functional",
+    "iomanip", "iostream", "iterator", "limits", "list", "map", "memory",
+    "numeric", "optional", "queue", "random", "set", "sstream", "stack",
+    "stdexcept", "string", "string_view", "tuple", "unordered_map",
+    "unordered_set", "utility", "variant", "vector",
+]
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_version(compiler: str) -> str:
+    """Returns the compiler's version banner, or an empty string when it is missing"""
+    try:
+        process = subprocess.run([compiler, "--version"], capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+    return process.stdout.strip()
+
+
+def cpp_compiler_available(compiler: str = "g++") -> bool:
+    """Checks whether the compiler is installed"""
+    return shutil.which(compiler) is not None
+
+
+class CppEngine:
+    """
+    Compiles C++ candidates into a binary cache and runs them.
+
+    Attributes:
+        compiler: Compiler executable
+        profile: Flag profile name (see FLAG_PROFILES)
+        flags: Full compiler flags of the profile
+        cache_dir: Directory of cached binaries and precompiled headers
+        use_pch: Whether common STL headers are precompiled (GCC only)
+        max_entries: Cached binaries kept; the least recently used are removed
+        compile_timeout: Seconds a compilation may take
+    """
+
+    def __init__(
+        self,
+        compiler: str = "g++",
+        profile: str = "iterate",
+        cache_dir: Path = CPP_CACHE_DIR,
+        use_pch: bool = True,
+        max_entries: int = 500,
+        compile_timeout: float = 120.0
+    ):
+        if profile not in FLAG_PROFILES:
+            raise ValueError(f"Unknown C++ profile: {profile}. Available: {', '.join(FLAG_PROFILES)}")
+        self.compiler = compiler
+        self.profile = profile
+        self.flags = BASE_FLAGS + FLAG_PROFILES[profile]
+        self.cache_dir = Path(cache_dir)
+        self.use_pch = use_pch
+        self.max_entries = max_entries
+        self.compile_timeout = compile_timeout
+        self._pch_flags: Optional[List[str]] = None
+        self._lock = threading.Lock()
+
+    def _key(self, *parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()[:32]
+
+    def pch_flags(self) -> List[str]:
+        """
+        Builds the precompiled header for the current flags on first use and
+        returns the flags that force-include it (empty when unavailable).
+        """
+        with self._lock:
+            if self._pch_flags is not None:
+                return self._pch_flags
+            self._pch_flags = []
+            version = compiler_version(self.compiler)
+            # .gch files are a GCC feature; other compilers just skip the PCH
+            if not self.use_pch or "Free Software Foundation" not in version:
+                return self._pch_flags
+
+            pch_dir = self.cache_dir / "pch" / self._key(" ".join(self.flags), version, platform.machine())
+            header = pch_dir / "dscoder_pch.hpp"
+            gch = pch_dir / "dscoder_pch.hpp.gch"
+            if not gch.exists():
+                pch_dir.mkdir(parents=True, exist_ok=True)
+                header.write_text("".join(f"#include <{name}>\n" for name in PCH_HEADERS))
+                tmp_path = pch_dir / f"dscoder_pch.{os.getpid()}.{threading.get_ident()}.gch"
+                try:
+                    process = subprocess.run(
+                        [self.compiler, *self.flags, "-x", "c++-header", str(header), "-o", str(tmp_path)],
+                        capture_output=True,
+                        text=True,
+                        timeout=self.compile_timeout
+                    )
+                except (OSError, subprocess.TimeoutExpired):
+                    return self._pch_flags
+                if process.returncode != 0:
+                    return self._pch_flags
+                os.replace(tmp_path, gch)
+            # GCC picks dscoder_pch.hpp.gch up in place of the header
+            self._pch_flags = ["-include", str(header.resolve())]
+            return self._pch_flags
+
+    def build(self, source_path: str, timeout: Optional[float] = None) -> Tuple[Optional[str], str]:
+        """
+        Compiles a source file, reusing the cached binary when there is one.
+
+        Args:
+            source_path (str): C++ source file
+            timeout (Optional[float]): Seconds the compilation may take, capped
+                                       by compile_timeout
+
+        Returns:
+            Tuple[Optional[str], str]: Binary path (None when compilation
+                                       failed) and the compiler diagnostics
+        """
+        with open(source_path, "rb") as f:
+            source = f.read()
+        pch = self.pch_flags()
+        flags = self.flags + pch
+        key = self._key(
+            hashlib.sha256(source).hexdigest(), " ".join(flags),
+            compiler_version(self.compiler), platform.machine()
+        )
+        binary = self.cache_dir / "bin" / key
+        if binary.exists():
+            # Refresh the timestamp so eviction drops the least recently used
+            os.utime(binary)
+            return str(binary), ""
+
+        binary.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=binary.parent, prefix=f".{key}.")
+        os.close(fd)
+        try:
+            process = subprocess.run(
+                [self.compiler, *flags, os.path.abspath(source_path), "-o", tmp_path],
+                capture_output=True,
+                text=True,
+                timeout=self.compile_timeout if timeout is None else min(timeout, self.compile_timeout)
+            )
+        except FileNotFoundError:
+            os.unlink(tmp_path)
+            return None, f"C++ compiler not found: {self.compiler}"
+        except subprocess.TimeoutExpired:
+            os.unlink(tmp_path)
+            return None, "Compilation timeout"
+        if process.returncode != 0:
+            os.unlink(tmp_path)
+            return None, process.stderr
+        os.replace(tmp_path, binary)
+        self._evict()
+        return str(binary), process.stderr
+
+    def _evict(self) -> None:
+        """Removes the least recently used binaries beyond max_entries"""
+        binaries = [path for path in (self.cache_dir / "bin").iterdir() if not path.name.startswith(".")]
+        if len(binaries) <= self.max_entries:
+            return
+        binaries.sort(key=lambda path: path.stat().st_mtime)
+        for path in binaries[:len(binaries) - self.max_entries]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def execute(self, binary: str, timeout: float = 30.0, expected_output: Optional[str] = None) -> RunResult:
+        """
+        Runs a built binary in its own process group, streaming its output.
+
+        The group is killed on timeout or as soon as the output diverges
+        from expected_output (see output_stream.run_process).
+        """
+        return run_process([binary], timeout, expected_output)
+
+    def run(
+        self,
+        source_path: str,
+        timeout: float = 30.0,
+        compile_timeout: Optional[float] = None,
+        expected_output: Optional[str] = None
+    ) -> RunResult:
+        """
+        Compiles (or fetches from the cache) and runs a C++ source file.
+
+        Args:
+            source_path (str): C++ source file
+            timeout (float): Seconds the binary may run
+            compile_timeout (Optional[float]): Seconds the compilation may take,
+                                               capped by the engine's compile_timeout
+            expected_output (Optional[str]): Output the binary should print; the
+                                             run stops as soon as it diverges
+
+        Returns:
+            RunResult: Output of the binary, or the compiler diagnostics with
+                       a non-zero status when compilation failed
+        """
+        binary, diagnostics = self.build(source_path, compile_timeout)
+        if binary is None:
+            return RunResult("", f"Compilation failed:\n{diagnostics}", 1)
+        return self.execute(binary, timeout, expected_output)
+
+
+_engines: Dict[str, CppEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_cpp_engine(profile: str = "iterate") -> CppEngine:
+    """Returns the process-wide engine of a flag profile"""
+    with _engines_lock:
+        if profile not in _engines:
+            _engines[profile] = CppEngine(profile=profile)
+        return _engines[profile]
@@ -0,0 +1,61 @@
+"""
+Time budget of one generation job.
+
+A Deadline is started when a job starts and handed to every step that can
+block: the rate limit queue, each LLM request (as its HTTP timeout), each
+candidate run (as its time limit) and the retry loop. Every step gets only
+what is left of the budget, so a job returns within its timeout instead of
+finding out it overran after the fact.
+"""
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a step has no time left in the job's budget"""
+
+
+class Deadline:
+    """
+    Monotonic-clock deadline.
+
+    Attributes:
+        seconds: Total budget in seconds
+        expires_at: time.monotonic() value at which the budget runs out
+    """
+
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            raise ValueError("timeout must be positive")
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self) -> None:
+        """Raises DeadlineExceeded once the budget is spent"""
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g}s exceeded")
+
+    def timeout(self, limit: Optional[float] = None) -> float:
+        """
+        Time limit for the next step: what is left of the budget, capped by limit.
+
+        Raises:
+            DeadlineExceeded: When nothing is left
+        """
+        self.check()
+        remaining = self.remaining()
+        return remaining if limit is None else min(limit, remaining)
+
+
+def step_timeout(deadline: Optional[Deadline], limit: Optional[float] = None) -> Optional[float]:
+    """Deadline.timeout() that also accepts no deadline, returning limit unchanged"""
+    if deadline is None:
+        return limit
+    return deadline.timeout(limit)
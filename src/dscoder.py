@@ -1,41 +1,83 @@
 # File system and environment
 import os
-import subprocess
+import hashlib
+import sys
 import logging
+import queue
+import threading
+import time
+from collections import deque
 from pathlib import Path
 from datetime import datetime
 import re
 import tempfile
+import uuid
 import shutil
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # Arguments and environment
 from argparse import ArgumentParser
-from dotenv import load_dotenv
 
 # Types
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any, Tuple
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Iterator, List, Optional, Any, Set, Tuple, Union
 from dataclasses import dataclass
 
-# UI
-from rich.console import Console
-from rich.table import Table
-from rich.logging import RichHandler
-
-# LLM APIs
-from openai import OpenAI
-from anthropic import Anthropic
+# UI: rich is imported on first render to keep CLI startup fast
+if TYPE_CHECKING:
+    from rich.console import Console
 
+# LLM APIs: provider SDKs are imported by the providers on first use
 from llm_providers import (
-    LLMProvider, OpenAIProvider, AnthropicProvider, 
-    DeepSeekProvider, OpenRouterProvider, LLMResponse
+    LLMProvider, PROVIDER_REGISTRY, LLMResponse, estimate_tokens, parse_delivery
 )
+from response_cache import ResponseCache
+from rate_limiter import RateLimitScheduler, get_rate_limit_scheduler
+from conversation import ConversationContext
+from deadline import Deadline, DeadlineExceeded, step_timeout
+from prompts import build_system_prompt
+from worker_pool import RunResult, WorkerPool
+from output_stream import run_process
+from environments import DependencyError, Environment, get_environment_manager
+from local_repair import local_repair
+from edits import EditError, apply_edits, parse_edits
+from python_pool import get_python_pool, python_pool_supported
+from julia_server import get_julia_pool, julia_server_supported
+from r_session import get_r_pool, r_session_supported, rcpp_command
+from cpp_build import FLAG_PROFILES, get_cpp_engine
+from validation import validate_candidate
+from scratch import scratch_file
+from execution_cache import ExecutionCache, ExecutionOutcome
+
+class LazyRichHandler(logging.Handler):
+    """Logging handler that imports rich and builds a RichHandler on the first record"""
+    
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.kwargs = kwargs
+        self.handler = None
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.handler is None:
+            from rich.logging import RichHandler
+            self.handler = RichHandler(**self.kwargs)
+            self.handler.setFormatter(self.formatter)
+        self.handler.handle(record)
 
 class ErrorHandler:
     """System error handler"""
     
     def __init__(self):
-        self.console = Console()
+        self._console = None
+    
+    @property
+    def console(self) -> "Console":
+        """Rich console, created on first use"""
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console()
+        return self._console
         
     def handle_error(self, error: Exception, context: str = "") -> str:
         """
@@ -60,6 +102,17 @@ class MetricsCollector:
         self.total_tokens = 0
         self.successful_generations = 0
         self.failed_generations = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.race_wins: Dict[str, int] = {}
+        self.race_time_saved = 0.0
+        self.validation_rejections = 0
+        self.reused_executions = 0
+        self.repeated_failures = 0
+        self.local_repairs = 0
+        self.edit_repairs = 0
+        self.edit_fallbacks = 0
+        self.structured_replies = 0
         self.errors = []
         
     def update_metrics(self, tokens: int, success: bool, error: str = None):
@@ -72,8 +125,48 @@ class MetricsCollector:
             if error:
                 self.errors.append(error)
     
-    def display_metrics(self, console: Console):
+    def record_cache_lookup(self, hit: bool):
+        """Counts a response cache hit or miss"""
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+    
+    def record_validation_rejection(self):
+        """Counts a candidate rejected by static validation before execution"""
+        self.validation_rejections += 1
+    
+    def record_execution_reuse(self):
+        """Counts a candidate whose outcome was reused instead of running it again"""
+        self.reused_executions += 1
+    
+    def record_repeated_failure(self):
+        """Counts an attempt that repeated an earlier (code, error) pair"""
+        self.repeated_failures += 1
+    
+    def record_local_repair(self):
+        """Counts a rule-based fix tried instead of an LLM round trip"""
+        self.local_repairs += 1
+    
+    def record_edit_repair(self, applied: bool):
+        """Counts a repair answered with edits, or one whose edits did not apply"""
+        if applied:
+            self.edit_repairs += 1
+        else:
+            self.edit_fallbacks += 1
+    
+    def record_structured_reply(self):
+        """Counts a reply whose code came through the code tool rather than from a code block"""
+        self.structured_replies += 1
+    
+    def record_race(self, outcome: "RaceOutcome"):
+        """Records which contender won a raced request and the time it saved"""
+        self.race_wins[outcome.winner] = self.race_wins.get(outcome.winner, 0) + 1
+        self.race_time_saved += outcome.time_saved
+    
+    def display_metrics(self, console: "Console"):
         """Displays metrics in a formatted table"""
+        from rich.table import Table
         table = Table(title="Execution Metrics")
         table.add_column("Metric", style="cyan")
         table.add_column("Value", style="magenta")
@@ -82,53 +175,718 @@ class MetricsCollector:
         table.add_row("Successful Generations", str(self.successful_generations))
         table.add_row("Failed Generations", str(self.failed_generations))
         table.add_row("Total Errors", str(len(self.errors)))
+        table.add_row("Cache Hits", str(self.cache_hits))
+        table.add_row("Cache Misses", str(self.cache_misses))
+        table.add_row("Rejected Before Execution", str(self.validation_rejections))
+        table.add_row("Executions Reused", str(self.reused_executions))
+        table.add_row("Repeated Failures", str(self.repeated_failures))
+        table.add_row("Local Repairs", str(self.local_repairs))
+        table.add_row("Edit Repairs", str(self.edit_repairs))
+        table.add_row("Edit Fallbacks", str(self.edit_fallbacks))
+        table.add_row("Structured Replies", str(self.structured_replies))
+        for winner, wins in self.race_wins.items():
+            table.add_row(f"Race Wins ({winner})", str(wins))
+        if self.race_wins:
+            table.add_row("Race Time Saved (s)", f"{self.race_time_saved:.2f}")
         
         console.print(table)
 
+@dataclass
+class RaceOutcome:
+    """Result of a raced request across several providers/models"""
+    winner: str
+    elapsed: float
+    time_saved: float
+    launched: int
+
+def parse_contender(spec: str) -> Tuple[str, Optional[str]]:
+    """Parses a "provider" or "provider:model" contender spec"""
+    provider, _, model = spec.partition(":")
+    return provider, model or None
+
+# HTTP statuses with which a model without tool support rejects a structured request
+TOOL_REJECTED_STATUS = (400, 404, 422)
+
 class LLMClient:
     """Generic client for LLMs that manages different providers"""
     
-    def __init__(self, provider: str = "openrouter"):
+    provider_registry = PROVIDER_REGISTRY
+    
+    def __init__(
+        self,
+        provider: str = "openrouter",
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RateLimitScheduler] = None
+    ):
+        from dotenv import load_dotenv
         load_dotenv()
-        self.providers = {
-            "openai": OpenAIProvider(),
-            "anthropic": AnthropicProvider(),
-            "deepseek": DeepSeekProvider(),
-            "openrouter": OpenRouterProvider()  # Add OpenRouter provider
-        }
-        
+        self.cache = cache
+        # Shared by default, so budgets hold across every client in the process
+        self.scheduler = scheduler or get_rate_limit_scheduler()
+        # Providers are built on first use, so only the selected SDK is imported
+        self.providers: Dict[str, LLMProvider] = {}
+        # Recent request latencies per "provider:model", used for hedging
+        self.latencies: Dict[str, Deque[float]] = {}
+        # "provider:model" contenders that rejected the code tool
+        self.unstructured: Set[str] = set()
+        self.switch_provider(provider)
+    
+    def get_provider(self, provider: str) -> LLMProvider:
+        """Returns the provider instance for a name, building it on first use"""
+        if provider not in self.provider_registry:
+            raise ValueError(f"Provider {provider} not supported. Available providers: {', '.join(self.provider_registry.keys())}")
         if provider not in self.providers:
-            raise ValueError(f"Provider {provider} not supported. Available providers: {', '.join(self.providers.keys())}")
-            
-        self.current_provider = self.providers[provider]
-        self.current_provider.initialize_client()
+            self.providers[provider] = self.provider_registry[provider]()
+        return self.providers[provider]
     
     def switch_provider(self, provider: str) -> None:
-        if provider not in self.providers:
-            raise ValueError(f"Provider {provider} not supported")
-        self.current_provider = self.providers[provider]
+        self.current_provider = self.get_provider(provider)
+        self.provider_name = provider
         self.current_provider.initialize_client()
     
+    def contender_label(self, provider: str, model: Optional[str]) -> str:
+        """Returns the "provider:model" label used in latency history and metrics"""
+        return f"{provider}:{model or self.get_provider(provider).default_model}"
+    
+    def use_structured(self, provider: str, model: Optional[str], structured: bool) -> bool:
+        """Whether a request asking for structured output goes through the contender's code tool"""
+        return (
+            structured
+            and getattr(self.get_provider(provider), "supports_structured", False)
+            and self.contender_label(provider, model) not in self.unstructured
+        )
+    
+    def tool_rejected(self, provider: str, model: Optional[str], error: Exception) -> bool:
+        """
+        Tells whether a structured request failed because the model does not
+        support tools (e.g. some OpenRouter models), in which case the
+        contender is switched to plain text for the rest of the process.
+        """
+        status = getattr(error, "status_code", None)
+        if status not in TOOL_REJECTED_STATUS:
+            return False
+        if status == 400 and not any(word in str(error).lower() for word in ("tool", "function")):
+            # Some other bad request (e.g. context length)
+            return False
+        label = self.contender_label(provider, model)
+        self.unstructured.add(label)
+        logging.getLogger(__name__).warning(f"{label} rejected the code tool ({error}); using plain text replies")
+        return True
+    
+    def record_latency(self, label: str, seconds: float) -> None:
+        """Adds a request latency to the bounded history of a contender"""
+        self.latencies.setdefault(label, deque(maxlen=100)).append(seconds)
+    
+    def latency_percentile(self, label: str, percentile: float) -> Optional[float]:
+        """Returns a latency percentile for a contender, or None without enough history"""
+        history = sorted(self.latencies.get(label, ()))
+        if len(history) < 5:
+            return None
+        index = min(len(history) - 1, int(round(percentile / 100 * (len(history) - 1))))
+        return history[index]
+    
+    @staticmethod
+    def request_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+        """Tokens a request counts against a tokens-per-minute budget"""
+        # Providers reserve max_tokens up front, so it is counted in full
+        return estimate_tokens("".join(message["content"] for message in messages)) + max_tokens
+    
     def generate_completion(
         self,
         messages: List[Dict[str, str]],
         max_tokens: int = 5000,
         temperature: float = 0,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        deadline: Optional[Deadline] = None,
+        structured: bool = False
+    ) -> LLMResponse:
+        key = self._cache_key(messages, max_tokens, temperature, model, use_cache, structured)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        def complete() -> LLMResponse:
+            provider = self.current_provider
+            request = dict(
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                model=model,
+                timeout=step_timeout(deadline)
+            )
+            if self.use_structured(self.provider_name, model, structured):
+                try:
+                    return provider.generate_structured(**request)
+                except Exception as e:
+                    if not self.tool_rejected(self.provider_name, model, e):
+                        raise
+            return provider.generate_completion(**request)
+        
+        start = time.monotonic()
+        response = self.scheduler.call(
+            self.provider_name,
+            self.request_tokens(messages, max_tokens),
+            complete,
+            deadline
+        )
+        self.record_latency(self.contender_label(self.provider_name, model), time.monotonic() - start)
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+    
+    def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 5000,
+        temperature: float = 0,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        stop_when: Optional[Callable[[str], bool]] = None,
+        deadline: Optional[Deadline] = None,
+        structured: bool = False
     ) -> LLMResponse:
-        return self.current_provider.generate_completion(
+        """
+        Streams a completion and assembles it into a single response.
+        
+        Args:
+            messages: List of messages in OpenAI format
+            max_tokens: Maximum number of tokens in the response
+            temperature: Generation temperature
+            model: Specific model to use (optional)
+            use_cache: Whether the response cache may be used
+            stop_when: Called with the text received so far after each delta;
+                       returning True cancels the stream and keeps only that text
+            deadline: Job deadline; bounds the rate limit wait and the request,
+                      and cancels the stream once it passes
+            structured: Have the model answer through the deliver_code tool
+                        where the provider supports it; the content is then
+                        the tool arguments as JSON (see parse_delivery)
+            
+        Returns:
+            LLMResponse: Response holding the (possibly truncated) content
+            
+        Raises:
+            DeadlineExceeded: When the deadline passes first
+        """
+        key = self._cache_key(messages, max_tokens, temperature, model, use_cache, structured)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        start = time.monotonic()
+        response = self.scheduler.call(
+            self.provider_name,
+            self.request_tokens(messages, max_tokens),
+            lambda: self._collect_stream(
+                self.provider_name, messages, max_tokens, temperature, model, stop_when,
+                deadline=deadline, structured=structured
+            ),
+            deadline
+        )
+        self.record_latency(self.contender_label(self.provider_name, model), time.monotonic() - start)
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+    
+    def _collect_stream(
+        self,
+        provider: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str],
+        stop_when: Optional[Callable[[str], bool]] = None,
+        cancelled: Optional[threading.Event] = None,
+        deadline: Optional[Deadline] = None,
+        structured: bool = False
+    ) -> LLMResponse:
+        """
+        Reads a provider stream into one response, stopping on stop_when or
+        cancellation, and raising DeadlineExceeded once the deadline passes.
+        A structured stream the model rejects is retried as plain text.
+        """
+        provider_instance = self.get_provider(provider)
+        use_tool = self.use_structured(provider, model, structured)
+        content = ""
+        tokens_used = 0
+        stopped_early = False
+        stream = (provider_instance.stream_structured if use_tool else provider_instance.stream_completion)(
             messages=messages,
             max_tokens=max_tokens,
             temperature=temperature,
-            model=model
+            model=model,
+            timeout=step_timeout(deadline)
+        )
+        try:
+            for chunk in stream:
+                if cancelled is not None and cancelled.is_set():
+                    stopped_early = True
+                    break
+                if deadline is not None:
+                    # The request timeout bounds each read, not the whole stream
+                    deadline.check()
+                content += chunk.content
+                tokens_used += chunk.tokens_used
+                if chunk.content and stop_when is not None and stop_when(content):
+                    stopped_early = True
+                    break
+        except Exception as e:
+            if not (use_tool and not content and self.tool_rejected(provider, model, e)):
+                raise
+            return self._collect_stream(
+                provider, messages, max_tokens, temperature, model, stop_when, cancelled, deadline
+            )
+        finally:
+            stream.close()
+        
+        if stopped_early and tokens_used == 0:
+            # Cancelled before the provider reported usage
+            prompt = "".join(message["content"] for message in messages)
+            tokens_used = estimate_tokens(prompt) + estimate_tokens(content)
+        
+        return LLMResponse(
+            content=content,
+            tokens_used=tokens_used,
+            model=model or provider_instance.default_model,
+            provider=provider
+        )
+    
+    def race_completion(
+        self,
+        messages: List[Dict[str, str]],
+        contenders: List[Tuple[str, Optional[str]]],
+        max_tokens: int = 5000,
+        temperature: float = 0,
+        accept: Optional[Callable[[str], bool]] = None,
+        stop_when_factory: Optional[Callable[[], Callable[[str], bool]]] = None,
+        hedge_delay: Union[float, str, None] = None,
+        deadline: Optional[Deadline] = None,
+        structured: bool = False
+    ) -> Tuple[LLMResponse, RaceOutcome]:
+        """
+        Sends the same request to several providers/models and keeps the first
+        acceptable response, cancelling the streams that are still running.
+        
+        Args:
+            messages: List of messages in OpenAI format
+            contenders: (provider, model) pairs; the first one is the primary
+            max_tokens: Maximum number of tokens in the response
+            temperature: Generation temperature
+            accept: Decides whether a finished response wins; any response
+                    wins when omitted
+            stop_when_factory: Builds a fresh stop_when callback per stream
+            hedge_delay: None races every contender at once; a number of
+                         seconds launches each further contender only after
+                         that delay without a winner; "p95" uses the 95th
+                         percentile of the primary's recent latency (all at
+                         once until enough history exists)
+            deadline: Job deadline; the race is cancelled when it passes
+            structured: Use the code tool of the contenders that support it
+            
+        Returns:
+            Tuple[LLMResponse, RaceOutcome]: Winning response and race details
+            
+        Raises:
+            ValueError: If no contender is given
+            DeadlineExceeded: When the deadline passes without a response
+            Exception: The last contender error, if every contender failed
+        """
+        if not contenders:
+            raise ValueError("At least one contender is required")
+        
+        labels = [self.contender_label(provider, model) for provider, model in contenders]
+        for provider, _ in contenders:
+            self.get_provider(provider).initialize_client()
+        
+        if hedge_delay == "p95":
+            hedge_delay = self.latency_percentile(labels[0], 95)
+        
+        cancelled = threading.Event()
+        results: "queue.Queue[Tuple[int, Optional[LLMResponse], float, Optional[Exception]]]" = queue.Queue()
+        
+        def run(index: int) -> None:
+            provider, model = contenders[index]
+            start = time.monotonic()
+            try:
+                response = self.scheduler.call(
+                    provider,
+                    self.request_tokens(messages, max_tokens),
+                    lambda: self._collect_stream(
+                        provider, messages, max_tokens, temperature, model,
+                        stop_when_factory() if stop_when_factory else None,
+                        cancelled,
+                        deadline,
+                        structured
+                    ),
+                    deadline
+                )
+                results.put((index, response, time.monotonic() - start, None))
+            except Exception as e:
+                results.put((index, None, time.monotonic() - start, e))
+        
+        def launch(index: int) -> None:
+            threading.Thread(target=run, args=(index,), daemon=True).start()
+        
+        start = time.monotonic()
+        launched = 0
+        finished = 0
+        fallback: Optional[LLMResponse] = None
+        last_error: Optional[Exception] = None
+        
+        while True:
+            while launched < len(contenders) and (
+                hedge_delay is None or time.monotonic() - start >= launched * hedge_delay
+            ):
+                launch(launched)
+                launched += 1
+            
+            wait = None
+            if launched < len(contenders):
+                wait = max(0.0, start + launched * hedge_delay - time.monotonic())
+            if deadline is not None:
+                wait = deadline.remaining() if wait is None else min(wait, deadline.remaining())
+            try:
+                index, response, latency, error = results.get(timeout=wait)
+            except queue.Empty:
+                if deadline is not None and deadline.expired():
+                    cancelled.set()
+                    deadline.check()
+                continue
+            
+            finished += 1
+            if error is not None:
+                last_error = error
+            else:
+                self.record_latency(labels[index], latency)
+                if accept is None or accept(response.content):
+                    cancelled.set()
+                    elapsed = time.monotonic() - start
+                    time_saved = 0.0
+                    if index != 0:
+                        # Estimated from how long the primary usually takes
+                        typical = self.latency_percentile(labels[0], 50)
+                        time_saved = max(0.0, typical - elapsed) if typical else 0.0
+                    return response, RaceOutcome(
+                        winner=labels[index],
+                        elapsed=elapsed,
+                        time_saved=time_saved,
+                        launched=launched
+                    )
+                fallback = fallback or response
+            
+            if launched < len(contenders) and finished == launched:
+                # Everything launched so far lost; hedge right away
+                launch(launched)
+                launched += 1
+            
+            if finished == len(contenders):
+                if fallback is not None:
+                    return fallback, RaceOutcome(
+                        winner=fallback.provider + ":" + fallback.model,
+                        elapsed=time.monotonic() - start,
+                        time_saved=0.0,
+                        launched=launched
+                    )
+                raise last_error
+    
+    def sample_completions(
+        self,
+        messages: List[Dict[str, str]],
+        n: int,
+        max_tokens: int = 5000,
+        temperature: float = 0.7,
+        model: Optional[str] = None,
+        stop_when_factory: Optional[Callable[[], Callable[[str], bool]]] = None,
+        deadline: Optional[Deadline] = None,
+        cancelled: Optional[threading.Event] = None,
+        structured: bool = False
+    ) -> Iterator[LLMResponse]:
+        """
+        Requests n completions of the same messages and yields them as they arrive.
+        
+        Providers that support the `n` parameter answer all of them in one
+        request; otherwise n streams run in parallel. Sampled completions are
+        never served from or written to the response cache.
+        
+        Args:
+            messages: List of messages in OpenAI format
+            n: Number of completions
+            max_tokens: Maximum number of tokens of each completion
+            temperature: Sampling temperature; should be above 0 so that the
+                         completions differ
+            model: Specific model to use (optional)
+            stop_when_factory: Builds a fresh stop_when callback per stream
+            deadline: Job deadline; no completion is waited for past it
+            cancelled: Setting it (from any thread) stops the streams still
+                       running; closing the iterator sets it too
+            structured: Use the provider's code tool where supported
+            
+        Yields:
+            LLMResponse: One response per completion
+            
+        Raises:
+            DeadlineExceeded: When the deadline passes before any response
+            Exception: The last request error, if every request failed
+        """
+        cancelled = cancelled or threading.Event()
+        start = time.monotonic()
+        if self.current_provider.supports_n:
+            def complete() -> List[LLMResponse]:
+                request = dict(
+                    messages=messages,
+                    n=n,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    model=model,
+                    timeout=step_timeout(deadline)
+                )
+                if self.use_structured(self.provider_name, model, structured):
+                    try:
+                        return self.current_provider.generate_completions(**request, structured=True)
+                    except Exception as e:
+                        if not self.tool_rejected(self.provider_name, model, e):
+                            raise
+                return self.current_provider.generate_completions(**request)
+            
+            responses = self.scheduler.call(
+                self.provider_name,
+                # The prompt is sent once, but every completion reserves max_tokens
+                self.request_tokens(messages, max_tokens * n),
+                complete,
+                deadline
+            )
+            self.record_latency(self.contender_label(self.provider_name, model), time.monotonic() - start)
+            yield from responses
+            return
+        
+        results: "queue.Queue[Tuple[Optional[LLMResponse], Optional[Exception]]]" = queue.Queue()
+        
+        def run() -> None:
+            try:
+                response = self.scheduler.call(
+                    self.provider_name,
+                    self.request_tokens(messages, max_tokens),
+                    lambda: self._collect_stream(
+                        self.provider_name, messages, max_tokens, temperature, model,
+                        stop_when_factory() if stop_when_factory else None,
+                        cancelled,
+                        deadline,
+                        structured
+                    ),
+                    deadline
+                )
+                results.put((response, None))
+            except Exception as e:
+                results.put((None, e))
+        
+        for _ in range(n):
+            threading.Thread(target=run, daemon=True).start()
+        
+        delivered = 0
+        last_error: Optional[Exception] = None
+        try:
+            for _ in range(n):
+                try:
+                    response, error = results.get(timeout=deadline.remaining() if deadline else None)
+                except queue.Empty:
+                    deadline.check()
+                    continue
+                if cancelled.is_set():
+                    return
+                if error is not None:
+                    last_error = error
+                    continue
+                self.record_latency(self.contender_label(self.provider_name, model), time.monotonic() - start)
+                delivered += 1
+                yield response
+        finally:
+            cancelled.set()
+        if delivered == 0 and last_error is not None:
+            raise last_error
+    
+    def _cache_key(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str],
+        use_cache: bool,
+        structured: bool = False
+    ) -> Optional[str]:
+        """Returns the response cache key, or None when the request must not be cached"""
+        # Only deterministic requests are cached; sampled ones must stay fresh
+        if self.cache is None or not use_cache or temperature != 0:
+            return None
+        return ResponseCache.make_key(
+            provider=self.provider_name,
+            model=model or self.current_provider.default_model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            structured=self.use_structured(self.provider_name, model, structured)
         )
 
+class CodeFenceWatcher:
+    """
+    Detects incrementally when a streamed response holds a complete code block.
+    
+    Used as the stop_when callback of LLMClient.stream_completion: the response
+    is only re-parsed when a new ``` fence arrives, and the extracted code is
+    kept in the code attribute once a valid block is closed.
+    """
+    
+    def __init__(self, extract: Callable[[str], Optional[str]]):
+        self.extract = extract
+        self.fences = 0
+        self.position = 0
+        self.code = None
+    
+    def __call__(self, text: str) -> bool:
+        found = False
+        while True:
+            index = text.find("```", self.position)
+            if index < 0:
+                # Keep the tail so a fence split across deltas is still found
+                self.position = max(self.position, len(text) - 2)
+                break
+            self.fences += 1
+            self.position = index + 3
+            found = True
+        
+        if not found or self.fences < 2:
+            return False
+        
+        self.code = self.extract(text)
+        return self.code is not None
+
+# Time limit of a candidate run when no job deadline is set
+EXECUTION_TIMEOUT = 30.0
+
+# Sampling temperature used once the model repeats a failing candidate
+REPEAT_TEMPERATURE = 0.7
+
+# Minimum sampling temperature of parallel candidates, so that they differ
+CANDIDATE_TEMPERATURE = 0.7
+
+# Rule-based fixes tried on one candidate before its failure goes back to the model
+MAX_LOCAL_REPAIRS = 3
+
+# Repeats of one failing (code, error) pair after which a job stops
+STUCK_REPEATS = 2
+
+REPEAT_HINT = (
+    "This code is identical to an earlier attempt that failed with the same error. "
+    "Do not return it again: rethink the approach instead of repeating the same fix."
+)
+
+FILE_EXTENSIONS = {
+    "python": ".py",
+    "cpp": ".cpp",
+    "r": ".R",
+    "julia": ".jl",
+    "rcpp": ".cpp"
+}
+
+def warm_pool(language: str) -> Optional[WorkerPool]:
+    """Returns the shared warm executor pool of a language, or None when it has none here"""
+    language = language.lower()
+    if language == "python" and python_pool_supported():
+        return get_python_pool()
+    if language == "julia" and julia_server_supported():
+        return get_julia_pool()
+    if language in ("r", "rcpp") and r_session_supported():
+        return get_r_pool()
+    return None
+
+
+# Guards the one-time logging setup of the first AIAgent
+_logging_lock = threading.Lock()
+
+
 class AIAgent:
-    def __init__(self, provider: str = "openai", trace: bool = False):
-        """Initializes the AI agent"""
-        self.llm_client = LLMClient(provider)
+    def __init__(
+        self,
+        provider: str = "openai",
+        trace: bool = False,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        stream: bool = True,
+        llm_client: Optional[LLMClient] = None,
+        race: Optional[List[str]] = None,
+        hedge_delay: Union[float, str, None] = None,
+        context_tokens: int = 8000,
+        warm_executors: bool = True,
+        cpp_profile: str = "iterate",
+        keep_artifacts: bool = False,
+        execution_cache: Optional[ExecutionCache] = None,
+        candidates: int = 1,
+        dependency_envs: bool = False,
+        edit_repairs: bool = True,
+        structured_output: bool = True
+    ):
+        """
+        Initializes the AI agent
+        
+        Args:
+            provider: LLM provider to use
+            trace: Enable detailed logging
+            model: Specific model to use (provider default if None)
+            use_cache: Whether the on-disk response cache is used
+            stream: Whether completions are streamed with early code-block cutoff
+            llm_client: Existing client to share between agents; built from
+                        provider and use_cache when omitted
+            race: Extra "provider" or "provider:model" contenders raced against
+                  the main provider/model on every request
+            hedge_delay: Delay in seconds (or "p95") before each extra contender
+                         is launched; None races them all at once
+            context_tokens: Token budget of each request in the repair loop
+            warm_executors: Run candidates in warm interpreter workers (with
+                            common packages preloaded) instead of a fresh
+                            process per attempt, where supported
+            cpp_profile: C++ compiler flag profile: "iterate" (-O0) or
+                         "bench" (-O2 -march=native)
+            keep_artifacts: Save every attempt under output/temp; by default
+                            attempts run from memory-backed scratch files
+                            that are removed right after they ran
+            execution_cache: Cache of candidate outcomes shared with other
+                             agents; each job uses a private one when omitted
+            candidates: Completions sampled per attempt; above 1 they are run
+                        concurrently and the first that passes is kept
+            dependency_envs: Run candidates whose packages are missing in a
+                             cached environment holding them, built once per
+                             dependency set; this installs packages named by
+                             the model, so it is off by default
+            edit_repairs: Ask for search/replace edits of the latest code on
+                          repair attempts instead of the whole program,
+                          falling back to the whole program when they do
+                          not apply
+            structured_output: Have providers that support it deliver code
+                               through a tool call ({language, code})
+                               instead of a markdown block; code blocks
+                               are still extracted as a fallback
+        """
+        if candidates < 1:
+            raise ValueError("candidates must be at least 1")
+        if candidates > 1 and race:
+            raise ValueError("candidates and race cannot be combined")
         self.trace = trace
-        self.console = Console()
+        self.model = model
+        self.use_cache = use_cache
+        self.stream = stream
+        self.race = [parse_contender(spec) for spec in race or []]
+        self.hedge_delay = hedge_delay
+        self.warm_executors = warm_executors
+        self.cpp_profile = cpp_profile
+        self.keep_artifacts = keep_artifacts
+        self.execution_cache = execution_cache
+        self.candidates = candidates
+        self.dependency_envs = dependency_envs
+        self.edit_repairs = edit_repairs
+        self.structured_output = structured_output
+        self._console = None
         self.error_handler = ErrorHandler()
         self.metrics_collector = MetricsCollector()
         
@@ -137,81 +895,48 @@ class AIAgent:
         self.temp_dir = self.base_dir / "temp"
         self.logs_dir = self.base_dir / "logs"
         
-        for dir_path in [self.base_dir, self.temp_dir, self.logs_dir]:
+        for dir_path in [self.base_dir, self.logs_dir] + ([self.temp_dir] if keep_artifacts else []):
             dir_path.mkdir(parents=True, exist_ok=True)
         
-        # Logging configuration
-        log_format = "%(asctime)s [%(levelname)s] %(message)s"
-        log_file = self.logs_dir / f"ai_agent_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-        
-        logging.basicConfig(
-            level=logging.INFO,
-            format=log_format,
-            handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
-                RichHandler(rich_tracebacks=True)
-            ]
-        )
-        self.logger = logging.getLogger(__name__)
+        if llm_client is None:
+            cache = ResponseCache(self.base_dir / "cache" / "responses.sqlite3") if use_cache else None
+            llm_client = self.create_llm_client(provider, cache)
+        self.llm_client = llm_client
         
-        # Message initialization
-        self.messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a senior software engineering assistant specialized in generating high-quality code "
-                    "for Python, C++, R, Rcpp, and Julia. Your core requirements are:\n\n"
-                    
-                    "1. MANDATORY REQUIREMENTS FOR ALL LANGUAGES:\n"
-                    "- ALWAYS deliver code in a single, complete, functional block\n"
-                    "- ALL helper functions/methods MUST be implemented in the same block\n"
-                    "- Code MUST be self-contained with NO external dependencies\n"
-                    "- EVERY function used MUST have its complete implementation\n"
-                    "- Use ``` markers at the beginning and end of code blocks\n\n"
-                    "- Install missing/dependent libraries"
-                    
-                    "2. LANGUAGE-SPECIFIC REQUIREMENTS:\n"
-                    "C++:\n"
-                    "- Use ONLY Standard Library (STL) native features\n"
-                    "- NO external libraries beyond STL\n"
-                    "- Implement all functionality using only native features\n"
-                    "- Use modern C++ (17/20) best practices\n\n"
-                    
-                    "Python:\n"
-                    "- Prefer standard and data science libraries\n"
-                    "- Include all necessary helper functions\n"
-                    "- Use type hints and proper documentation\n\n"
-                    
-                    "R/Rcpp:\n"
-                    "- Include all required helper functions\n"
-                    "- Declare all dependencies\n"
-                    "- Rcpp code must be pre-compiled by using Rcpp resources\n"
-                    "- Ensure self-contained implementation\n\n"
-                    
-                    "Julia:\n"
-                    "- Implement all necessary functions\n"
-                    "- Prefer standard and data science packages\n"
-                    "- Include all type and method definitions\n"
-                    "- Ensure code independence\n\n"
-                    
-                    "3. IMPLEMENTATION STRUCTURE:\n"
-                    "- ALL helper functions must be implemented, even trivial ones\n"
-                    "- Include all necessary data structures\n"
-                    "- Ensure NO external dependencies\n"
-                    "- Maintain logical code organization\n\n"
-                    
-                    "4. DEVELOPMENT PROCESS:\n"
-                    "1. Analyze requirements including mathematics, data science and programming good practices\n"
-                    "2. Identify ALL needed functions and methods required\n"
-                    "3. Implement EVERYTHING in one block\n"
-                    "4. Validate completeness\n\n"
-                    
-                    "IMPORTANT: Generated code MUST be completely functional without external implementations. "
-                    "ALL mentioned or used functions MUST be fully implemented in the same code block. "
-                    "For C++, use EXCLUSIVELY STL native resources."
+        # Logging configuration, once per process: basicConfig ignores later
+        # calls, and a FileHandler built for one would leak its open log file
+        with _logging_lock:
+            if not logging.getLogger().handlers:
+                log_format = "%(asctime)s [%(levelname)s] %(message)s"
+                log_file = self.logs_dir / f"ai_agent_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+                logging.basicConfig(
+                    level=logging.INFO,
+                    format=log_format,
+                    handlers=[
+                        logging.FileHandler(log_file, encoding='utf-8'),
+                        LazyRichHandler(rich_tracebacks=True)
+                    ]
                 )
-            }
-        ]
+        self.logger = logging.getLogger(__name__)
+        
+        # Prompt and bounded conversation context for the repair loop
+        self.context = ConversationContext(build_system_prompt("python", dependency_envs), max_tokens=context_tokens, edits=edit_repairs)
+        self.messages: List[Dict[str, str]] = []
+        # Time budget of the running job (see generate_code)
+        self.deadline: Optional[Deadline] = None
+        self.reset_job_state()
+    
+    @property
+    def console(self) -> "Console":
+        """Rich console, created on first render"""
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console()
+        return self._console
+    
+    def create_llm_client(self, provider: str, cache: Optional[ResponseCache]) -> LLMClient:
+        """Builds the LLM client used by the agent"""
+        return LLMClient(provider, cache=cache)
     
     def log(self, message: str, level: str = "info", force: bool = False):
         """Logs messages"""
@@ -300,19 +1025,67 @@ class AIAgent:
         # Returns first valid block found or None
         return valid_blocks[0] if valid_blocks else None
     
+    @property
+    def structured(self) -> bool:
+        """Whether the next request asks for code through the provider's code tool"""
+        return self.structured_output and not self.context.wants_edits
+    
+    def is_complete_reply(self, content: str) -> bool:
+        """Whether a response holds a candidate (delivery, edits or code block), without side effects"""
+        if parse_delivery(content) is not None or self.extract_code(content) is not None:
+            return True
+        return self.context.wants_edits and bool(parse_edits(content))
+    
+    def extract_reply(self, content: str) -> Optional[str]:
+        """
+        Extracts the candidate of a response: the latest code with the reply's
+        edits applied when edits were asked for and sent, the code delivered
+        through the code tool, or else its code block.
+        
+        When the edits do not apply, the reason is kept in edit_error and
+        None is returned.
+        """
+        if self.context.wants_edits:
+            edits = parse_edits(content)
+            if edits:
+                try:
+                    code = apply_edits(self.context.code, edits)
+                except EditError as e:
+                    self.edit_error = str(e)
+                    self.metrics_collector.record_edit_repair(False)
+                    return None
+                self.metrics_collector.record_edit_repair(True)
+                return code
+        delivery = parse_delivery(content)
+        if delivery is not None:
+            self.metrics_collector.record_structured_reply()
+            return delivery.code
+        return self.extract_code(content)
+    
+    def reply_watcher(self) -> Optional[CodeFenceWatcher]:
+        """Early cutoff of a streamed reply; edits are read to the end, as they may span several blocks"""
+        if not self.stream or self.context.wants_edits:
+            return None
+        return CodeFenceWatcher(self.extract_code)
+    
+    @contextmanager
+    def full_code_request(self) -> Iterator[None]:
+        """Rebuilds the current request to ask for the complete code, for the duration of the block"""
+        reason = self.edit_error.splitlines()[0]
+        self.log(f"The edits did not apply ({reason}); asking for the complete code", "warning", self.trace)
+        self.context.edits = False
+        self.messages = self.context.build_messages()
+        try:
+            yield
+        finally:
+            self.context.edits = self.edit_repairs
+    
     def save_final_version(self, code: str, language: str, status: str) -> str:
         """Saves final version of generated code"""
-        extensions = {
-            "python": ".py",
-            "cpp": ".cpp",
-            "r": ".R",
-            "julia": ".jl",
-            "rcpp": ".cpp"
-        }
-        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        ext = extensions.get(language.lower(), ".txt")
-        filename = f"code_{status}_{timestamp}{ext}"
+        ext = FILE_EXTENSIONS.get(language.lower(), ".txt")
+        # The random suffix keeps concurrent agents from overwriting each other's files
+        filename = f"code_{status}_{timestamp}_{uuid.uuid4().hex[:8]}{ext}"
         
         if status == "temp":
             filepath = self.temp_dir / filename
@@ -324,86 +1097,512 @@ class AIAgent:
         
         return str(filepath)
     
-    def execute_code(self, file_path: str, language: str) -> Tuple[str, Optional[str]]:
-        """Executes generated code"""
+    @contextmanager
+    def candidate_file(self, code: str, language: str) -> Iterator[str]:
+        """
+        Provides the file a candidate is validated and run from.
+        
+        With keep_artifacts the attempt is saved under output/temp and kept;
+        otherwise it goes to a memory-backed scratch file that is removed on
+        exit, whether the attempt passed, failed or raised.
+        """
+        if self.keep_artifacts:
+            yield self.save_final_version(code, language, "temp")
+            return
+        with scratch_file(code, FILE_EXTENSIONS.get(language.lower(), ".txt")) as path:
+            yield path
+    
+    def execution_command(
+        self,
+        file_path: str,
+        language: str,
+        environment: Optional[Environment] = None
+    ) -> Optional[List[str]]:
+        """Returns the command that runs a saved file, or None for unsupported languages"""
+        python = environment.python if environment is not None and environment.python else sys.executable
         commands = {
-            "python": ["python", file_path],
-            "cpp": ["g++", file_path, "-o", file_path + ".exe"],
+            "python": [python, file_path],
             "r": ["Rscript", file_path],
             "julia": ["julia", file_path],
-            "rcpp": ["R", "CMD", "SHLIB", file_path]
         }
+        if language.lower() == "rcpp":
+            # Same build cache and entry points as the warm R sessions
+            return rcpp_command(file_path)
+        return commands.get(language.lower())
+    
+    def step_timeout(self) -> float:
+        """
+        Seconds the next step of the job may take: what is left of the job's
+        deadline, or EXECUTION_TIMEOUT outside of a job.
         
-        if language.lower() not in commands:
-            return "", f"Unsupported language: {language}"
+        Raises:
+            DeadlineExceeded: When the job's deadline has passed
+        """
+        return step_timeout(self.deadline, None if self.deadline else EXECUTION_TIMEOUT)
+    
+    def execute_code(
+        self,
+        file_path: str,
+        language: str,
+        expected_output: Optional[str] = None
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Executes generated code within the remaining time budget.
         
+        Output is streamed and capped (see output_stream); given
+        expected_output, the run is stopped as soon as its output diverges.
+        """
         try:
-            process = subprocess.Popen(
-                commands[language.lower()],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            stdout, stderr = process.communicate(timeout=30)
-            
-            if process.returncode != 0:
-                return "", stderr
-            
-            return stdout, None
-            
-        except subprocess.TimeoutExpired:
+            timeout = self.step_timeout()
+            environment = self.candidate_environment(file_path, language, timeout)
+            # An environment build may have used part of the budget
+            timeout = self.step_timeout()
+        except DeadlineExceeded:
             return "", "Code execution timeout"
+        except DependencyError as e:
+            return "", str(e)
+        
+        if language.lower() == "cpp":
+            engine = get_cpp_engine(self.cpp_profile)
+            return self.run_result(engine.run(
+                file_path, timeout=timeout, compile_timeout=timeout, expected_output=expected_output
+            ))
+        
+        # Warm executors run the base environment only
+        pool = warm_pool(language) if self.warm_executors and environment is None else None
+        if pool is not None:
+            return self.run_result(pool.run(file_path, timeout=timeout, expected_output=expected_output))
+        
+        command = self.execution_command(file_path, language, environment)
+        if command is None:
+            return "", f"Unsupported language: {language}"
+        
+        try:
+            # A session of its own, so a timeout also stops what the candidate spawned
+            return self.run_result(run_process(
+                command, timeout, expected_output, env=environment.variables if environment else None
+            ))
         except Exception as e:
             return "", str(e)
     
+    def candidate_environment(self, file_path: str, language: str, timeout: float) -> Optional[Environment]:
+        """
+        Returns the cached dependency environment a candidate must run in, building it if needed.
+        
+        Raises:
+            DependencyError: When its dependencies cannot be installed
+        """
+        if not self.dependency_envs:
+            return None
+        with open(file_path, encoding="utf-8") as f:
+            source = f.read()
+        environment = get_environment_manager().resolve(source, language, timeout)
+        if environment is not None:
+            self.log(f"Running in environment with {', '.join(environment.packages)}", "info", self.trace)
+        return environment
+    
+    def validate_code(self, file_path: str, language: str) -> Optional[str]:
+        """Statically checks a saved candidate; returns diagnostics when it cannot run"""
+        return validate_candidate(
+            file_path,
+            language,
+            pool=warm_pool(language) if self.warm_executors else None,
+            cpp_engine=get_cpp_engine(self.cpp_profile),
+            timeout=self.step_timeout()
+        )
+    
+    def reject_candidate(self, diagnostics: str) -> None:
+        """Feeds static validation diagnostics into the repair prompt"""
+        self.log("Static validation failed", "error", True)
+        self.metrics_collector.record_validation_rejection()
+        self.context.record_error(diagnostics)
+    
+    @staticmethod
+    def run_result(result: RunResult) -> Tuple[str, Optional[str]]:
+        """Converts a run result to the (stdout, error) pair of execute_code"""
+        if result.diverged:
+            # Stopped early; check_result reports the mismatch on what was printed
+            return result.stdout, None
+        if result.timed_out:
+            return "", "Code execution timeout"
+        if result.returncode != 0:
+            return "", result.stderr
+        return result.stdout, None
+    
+    def reset_job_state(self) -> None:
+        """Resets the sampling temperature, candidate outcomes and failure history for a new job"""
+        self.temperature = 0.0
+        self.outcomes = self.execution_cache if self.execution_cache is not None else ExecutionCache()
+        self.failures: Dict[Tuple[str, str], int] = {}
+        # Why the edits of the latest reply did not apply, if they did not
+        self.edit_error: Optional[str] = None
+    
+    def reused_outcome(self, key: str) -> Optional[ExecutionOutcome]:
+        """Returns the outcome of an identical candidate that already ran, if any"""
+        outcome = self.outcomes.get(key)
+        if outcome is not None:
+            self.log("Identical candidate already ran; reusing its result", "info", self.trace)
+            self.metrics_collector.record_execution_reuse()
+        return outcome
+    
+    def store_outcome(self, key: str, outcome: ExecutionOutcome) -> None:
+        """Remembers a candidate outcome for identical candidates"""
+        # A timeout depends on the budget that was left, not only on the code
+        if outcome.error != "Code execution timeout":
+            self.outcomes.put(key, outcome)
+    
+    def run_candidate(self, code: str, language: str, expected_output: Optional[str]) -> ExecutionOutcome:
+        """Validates, runs and checks a candidate, unless an identical one already ran"""
+        key = ExecutionCache.make_key(language, code, expected_output)
+        outcome = self.reused_outcome(key)
+        if outcome is not None:
+            return outcome
+        
+        with self.candidate_file(code, language) as file_name:
+            diagnostics = self.validate_code(file_name, language)
+            if diagnostics:
+                outcome = ExecutionOutcome(diagnostics, rejected=True)
+            else:
+                result, error_result = self.execute_code(file_name, language, expected_output)
+                outcome = ExecutionOutcome(self.check_result(result, error_result, expected_output))
+        self.store_outcome(key, outcome)
+        return outcome
+    
+    def repair_locally(
+        self,
+        code: str,
+        language: str,
+        expected_output: Optional[str],
+        outcome: ExecutionOutcome
+    ) -> Tuple[str, ExecutionOutcome]:
+        """
+        Tries rule-based fixes (see local_repair) on a failed candidate before the model is asked.
+        
+        Each fix is run like a new candidate; fixes are chained while they
+        keep applying, up to MAX_LOCAL_REPAIRS.
+        
+        Returns:
+            Tuple[str, ExecutionOutcome]: Last candidate and its outcome
+        """
+        for _ in range(MAX_LOCAL_REPAIRS):
+            fix = local_repair(code, outcome.error, language, self.dependency_envs)
+            if fix is None:
+                break
+            self.log(f"Local repair: {fix.description}", "info", self.trace)
+            self.metrics_collector.record_local_repair()
+            code = fix.code
+            self.context.record_code(code)
+            outcome = self.run_candidate(code, language, expected_output)
+            if outcome.error is None:
+                break
+        return code, outcome
+    
+    def record_failure(self, code: str, outcome: ExecutionOutcome) -> bool:
+        """
+        Feeds a failed outcome into the repair prompt and watches for a stuck loop.
+        
+        The first time a (code, error) pair repeats, the strategy changes:
+        later requests are sampled at REPEAT_TEMPERATURE (which also bypasses
+        the response cache) and the repair prompt asks for a different
+        approach. A pair repeated STUCK_REPEATS times stops the job.
+        
+        Returns:
+            bool: False when the job is stuck and should stop
+        """
+        if outcome.rejected:
+            self.reject_candidate(outcome.error)
+        else:
+            self.context.record_error(outcome.error)
+        
+        pair = (hashlib.sha256(code.encode("utf-8")).hexdigest(), outcome.error)
+        repeats = self.failures.get(pair, 0)
+        self.failures[pair] = repeats + 1
+        if repeats == 0:
+            self.context.hint = None
+            return True
+        
+        self.metrics_collector.record_repeated_failure()
+        if repeats >= STUCK_REPEATS:
+            self.log("The same code keeps failing with the same error; stopping early", "error", True)
+            return False
+        self.log("The same code failed with the same error again; changing strategy", "warning", True)
+        self.temperature = REPEAT_TEMPERATURE
+        self.context.hint = REPEAT_HINT
+        return True
+    
+    def build_task(
+        self,
+        description: str,
+        language: str,
+        expected_output: Optional[str]
+    ) -> str:
+        """Builds the user prompt describing the task"""
+        prompt = f"Develop a {language} code for: {description}"
+        if expected_output:
+            prompt += f"\nExpected output:\n{expected_output}"
+        return prompt
+    
+    def request_code(self) -> Optional[str]:
+        """Asks the LLM for code based on the current messages and returns the extracted block"""
+        if self.race:
+            contenders = [(self.llm_client.provider_name, self.model)]
+            contenders += [c for c in self.race if c not in contenders]
+            response, outcome = self.llm_client.race_completion(
+                messages=self.messages,
+                contenders=contenders,
+                max_tokens=1500,
+                temperature=self.temperature,
+                accept=self.is_complete_reply,
+                stop_when_factory=self.reply_watcher,
+                hedge_delay=self.hedge_delay,
+                deadline=self.deadline,
+                structured=self.structured
+            )
+            self.metrics_collector.record_race(outcome)
+            self.log(f"Race won by {outcome.winner} in {outcome.elapsed:.2f}s", "info", False)
+            generated_code = self.extract_reply(response.content)
+        elif self.stream:
+            # Stop reading as soon as a complete code block has arrived
+            watcher = self.reply_watcher()
+            response = self.llm_client.stream_completion(
+                messages=self.messages,
+                max_tokens=1500,
+                temperature=self.temperature,
+                model=self.model,
+                stop_when=watcher,
+                deadline=self.deadline,
+                structured=self.structured
+            )
+            generated_code = (watcher and watcher.code) or self.extract_reply(response.content)
+        else:
+            response = self.llm_client.generate_completion(
+                messages=self.messages,
+                max_tokens=1500,
+                temperature=self.temperature,
+                model=self.model,
+                deadline=self.deadline,
+                structured=self.structured
+            )
+            generated_code = self.extract_reply(response.content)
+        
+        self.record_response(response)
+        return generated_code
+    
+    def next_candidate(
+        self,
+        language: str,
+        expected_output: Optional[str]
+    ) -> Tuple[Optional[str], Optional[ExecutionOutcome]]:
+        """
+        Requests the candidate(s) of an attempt for the current messages.
+        
+        Returns:
+            Tuple[Optional[str], Optional[ExecutionOutcome]]: Code, and its
+            outcome when it already ran (several candidates per attempt)
+        """
+        self.edit_error = None
+        if self.candidates > 1:
+            return self.attempt_candidates(language, expected_output)
+        return self.request_code(), None
+    
+    def attempt_candidates(
+        self,
+        language: str,
+        expected_output: Optional[str]
+    ) -> Tuple[Optional[str], Optional[ExecutionOutcome]]:
+        """
+        Samples several candidates for the current messages and runs them concurrently.
+        
+        Each candidate starts running as soon as its completion arrives. The
+        first one that passes is returned right away: the streams still open
+        are cancelled and queued runs are dropped (runs already under way
+        finish in the background and are ignored). When none passes, the
+        first candidate that arrived is returned with its outcome, so the
+        repair loop goes on from it.
+        
+        Returns:
+            Tuple[Optional[str], Optional[ExecutionOutcome]]: Chosen code and its
+            outcome, or (None, None) when no completion contained code
+        """
+        events: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        cancelled = threading.Event()
+        pool = warm_pool(language) if self.warm_executors else None
+        if pool is not None:
+            pool.grow(self.candidates)
+        
+        def sample() -> None:
+            try:
+                for response in self.llm_client.sample_completions(
+                    messages=self.messages,
+                    n=self.candidates,
+                    max_tokens=1500,
+                    temperature=max(self.temperature, CANDIDATE_TEMPERATURE),
+                    model=self.model,
+                    stop_when_factory=self.reply_watcher,
+                    deadline=self.deadline,
+                    cancelled=cancelled,
+                    structured=self.structured
+                ):
+                    self.record_response(response)
+                    events.put(("code", self.extract_reply(response.content)))
+            except Exception as e:
+                events.put(("error", e))
+            events.put(("end", None))
+        
+        codes: List[str] = []
+        outcomes: Dict[str, ExecutionOutcome] = {}
+        sample_error: Optional[Exception] = None
+        sampling = True
+        executor = ThreadPoolExecutor(max_workers=self.candidates)
+        futures: List[Future] = []
+        threading.Thread(target=sample, daemon=True).start()
+        try:
+            while sampling or len(outcomes) < len(codes):
+                try:
+                    kind, value = events.get(timeout=self.deadline.remaining() if self.deadline else None)
+                except queue.Empty:
+                    raise DeadlineExceeded("Deadline exceeded while running candidates")
+                
+                if kind == "code":
+                    if value is None:
+                        self.log("No valid code found in one of the responses", "warning", self.trace)
+                    elif value not in codes:
+                        codes.append(value)
+                        future = executor.submit(self.run_candidate, value, language, expected_output)
+                        futures.append(future)
+                        future.add_done_callback(lambda f, code=value: events.put(("outcome", (code, f))))
+                elif kind == "outcome":
+                    code, future = value
+                    outcomes[code] = future.result()
+                    if outcomes[code].error is None:
+                        self.log(f"Candidate {codes.index(code) + 1} of {len(codes)} passed", "info", self.trace)
+                        return code, outcomes[code]
+                elif kind == "error":
+                    sample_error = value
+                else:
+                    sampling = False
+        finally:
+            cancelled.set()
+            # Runs not started yet are dropped (cancel_futures= needs Python 3.9)
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+        
+        if not codes:
+            if sample_error is not None:
+                raise sample_error
+            return None, None
+        return codes[0], outcomes[codes[0]]
+    
+    def record_response(self, response: LLMResponse) -> None:
+        """Records token usage and cache metrics for an LLM response"""
+        if self.use_cache:
+            self.metrics_collector.record_cache_lookup(response.cached)
+        tokens_used = 0 if response.cached else response.tokens_used
+        self.metrics_collector.update_metrics(tokens_used, False)
+    
+    def check_result(
+        self,
+        result: str,
+        error_result: Optional[str],
+        expected_output: Optional[str]
+    ) -> Optional[str]:
+        """
+        Checks an execution result against the expected output.
+        
+        Returns:
+            Optional[str]: Error to report back to the model, or None on success
+        """
+        if error_result:
+            self.log(f"Error encountered:\n{error_result}", "error", self.trace)
+            self.metrics_collector.update_metrics(0, False, error_result)
+            return error_result
+        
+        if expected_output and expected_output.strip() != result.strip():
+            self.log(
+                f"Output mismatch:\nExpected: {expected_output}\nGot: {result}",
+                "warning",
+                self.trace
+            )
+            return "Output mismatch"
+        
+        return None
+    
+    def finish_success(self, generated_code: str, language: str) -> str:
+        """Saves the successful code and returns it"""
+        self.metrics_collector.update_metrics(0, True)
+        self.log("\nCode generated successfully!", "info", True)
+        if self.trace:
+            self.log(generated_code, "info")
+            self.metrics_collector.display_metrics(self.console)
+
+        final_file_name = self.save_final_version(generated_code, language, "success")
+        self.log(f"\nFinal code saved at: {final_file_name}", "info", True)
+        
+        return generated_code
+    
+    def finish_failure(self, last_version: Optional[str], language: str) -> Optional[str]:
+        """Saves the last code version after attempts or timeout ran out"""
+        self.log("Maximum attempts reached or timeout occurred.", "error", True)
+        if last_version:
+            final_file_name = self.save_final_version(last_version, language, "failure")
+            self.log(f"Last code version saved at: {final_file_name}", "info", True)
+
+        if self.trace:
+            self.metrics_collector.display_metrics(self.console)
+        
+        # Retorna a última versão do código, mesmo que seja um fallback, se houver
+        return last_version if last_version else None
+    
     def generate_code(
         self,
         description: str,
         language: str = "python",
         expected_output: Optional[str] = None,
-        max_attempts: int = 5
+        max_attempts: int = 5,
+        timeout: float = 120.0
     ) -> Optional[str]:
-        """Generates code based on provided description"""
+        """
+        Generates code based on provided description
+        
+        timeout is the budget of the whole job in seconds: every LLM request
+        and candidate run gets only what is left of it, and no new attempt
+        starts once it is spent.
+        """
         attempts = 0
         previous_code = ""
         error_result = ""
         generated_code = ""
         last_version = None
-        start_execution = datetime.now()
+        self.deadline = Deadline(timeout)
+        self.reset_job_state()
+        self.context.start(
+            self.build_task(description, language, expected_output),
+            language,
+            system_prompt=build_system_prompt(language, self.dependency_envs)
+        )
         
         while attempts < max_attempts:
-            if (datetime.now() - start_execution).total_seconds() > 120:
+            if self.deadline.expired():
                 self.log("Global timeout reached", "error", True)
                 break
             
             attempts += 1
             self.log(f"\n[Attempt {attempts}/{max_attempts}]", "info", False)
 
-            prompt = (
-                f"Develop a {language} code for: {description}"
-                if attempts == 1
-                else f"The previous code resulted in the error:\n{error_result}\nPlease correct the code and explain the correction."
-            )
-            if expected_output and attempts == 1:
-                prompt += f"\nExpected output:\n{expected_output}"
-
-            self.messages.append({"role": "user", "content": prompt})
+            self.messages = self.context.build_messages()
 
             try:
                 # Use the generic LLM client to generate the code
-                response = self.llm_client.generate_completion(
-                    messages=self.messages,
-                    max_tokens=1500,
-                    temperature=0
-                )
-                
-                self.metrics_collector.update_metrics(response.tokens_used, False)
-                
-                generated_code = self.extract_code(response.content)
+                generated_code, outcome = self.next_candidate(language, expected_output)
+                if not generated_code and self.edit_error:
+                    # The edits did not apply: ask again for the whole program
+                    with self.full_code_request():
+                        generated_code, outcome = self.next_candidate(language, expected_output)
                 if not generated_code:
                     self.log("No valid code found in response", "error", True)
                     error_result = "Response contains no valid code"
+                    self.context.record_error(error_result)
                     continue
 
                 if self.trace:
@@ -411,45 +1610,26 @@ class AIAgent:
                     self.log(generated_code, "info")
 
                 last_version = generated_code
+                self.context.record_code(generated_code)
                 
-                # Save and execute code
-                file_name = self.save_final_version(generated_code, language, "temp")
-                result, error_result = self.execute_code(file_name, language)
-
-                if error_result:
-                    self.log(f"Error encountered:\n{error_result}", "error", self.trace)
-                    previous_code = generated_code
-                    self.metrics_collector.update_metrics(0, False, error_result)
-                    continue
-
-                if expected_output and expected_output.strip() != result.strip():
-                    self.log(
-                        f"Output mismatch:\nExpected: {expected_output}\nGot: {result}",
-                        "warning",
-                        self.trace
-                    )
-                    previous_code = generated_code
-                    error_result = "Output mismatch"
-                    continue
+                # Validate and execute code, unless an identical candidate already ran
+                if outcome is None:
+                    outcome = self.run_candidate(generated_code, language, expected_output)
+                if outcome.error is not None:
+                    # Mechanical failures are fixed without a round trip
+                    generated_code, outcome = self.repair_locally(generated_code, language, expected_output, outcome)
+                    last_version = generated_code
+                if outcome.error is None:
+                    # Success!
+                    return self.finish_success(generated_code, language)
 
-                # Success!
-                self.log("\nCode generated successfully!", "info", True)
-                if self.trace:
-                    self.log(generated_code, "info")
-                    self.metrics_collector.display_metrics(self.console)
-
-                final_file_name = self.save_final_version(generated_code, language, "success")
-                self.log(f"\nFinal code saved at: {final_file_name}", "info", True)
-                
-                # Clean up temporary files
-                try:
-                    if os.path.exists(file_name):
-                        os.remove(file_name)
-                except Exception as e:
-                    self.log(f"Error cleaning temporary file: {str(e)}", "warning", False)
-                
-                return generated_code
+                previous_code = generated_code
+                if not self.record_failure(generated_code, outcome):
+                    break
 
+            except DeadlineExceeded:
+                self.log("Global timeout reached", "error", True)
+                break
             except Exception as e:
                 error = self.error_handler.handle_error(e, "Error generating code")
                 self.log(error, "error", True)
@@ -457,25 +1637,7 @@ class AIAgent:
                 last_version = previous_code if previous_code else None
 
         # Finalization after attempts or timeout
-        # self.log("Maximum attempts reached or timeout occurred.", "error", True)
-        # if last_version:
-        #     final_file_name = self.save_final_version(last_version, language, "failure")
-        #     self.log(f"Last code version saved at: {final_file_name}", "info", True)
-        
-        # if self.trace:
-        #     self.metrics_collector.display_metrics(self.console)
-        # return None
-            # Finalization after attempts or timeout
-        self.log("Maximum attempts reached or timeout occurred.", "error", True)
-        if last_version:
-            final_file_name = self.save_final_version(last_version, language, "failure")
-            self.log(f"Last code version saved at: {final_file_name}", "info", True)
-
-        if self.trace:
-            self.metrics_collector.display_metrics(self.console)
-        
-        # Retorna a última versão do código, mesmo que seja um fallback, se houver
-        return last_version if last_version else None
+        return self.finish_failure(last_version, language)
 
 
 
@@ -488,6 +1650,17 @@ def dscoder(
     timeout: int = 120,
     max_attempts: int = 5,
     expected_output: Optional[str] = None,
+    use_cache: bool = True,
+    stream: bool = True,
+    race: Optional[List[str]] = None,
+    hedge_delay: Union[float, str, None] = None,
+    warm_executors: bool = True,
+    cpp_profile: str = "iterate",
+    keep_artifacts: bool = False,
+    candidates: int = 1,
+    dependency_envs: bool = False,
+    edit_repairs: bool = True,
+    structured_output: bool = True,
 ) -> Optional[str]:
     """
     Core function for generating code using AI models. This function provides a programmatic
@@ -518,11 +1691,48 @@ def dscoder(
         model: Specific model to use. If not provided, uses provider's default model.
                See README.md for supported models per provider.
         trace: Enable detailed logging and debugging output (default: False)
-        timeout: Global timeout in seconds for code generation (default: 120)
+        timeout: Time budget in seconds for the whole generation: LLM requests,
+                 validation and candidate runs only get what is left of it, so
+                 the call returns within it (default: 120)
         max_attempts: Maximum number of generation attempts (default: 5)
         expected_output: Expected output string for validation (optional). If provided,
                        the generated code will be executed and its output compared
                        against this value.
+        use_cache: Serve repeated deterministic requests from the on-disk response
+                   cache under output/cache (default: True). Set to False to always
+                   query the provider.
+        stream: Stream completions and stop reading as soon as a complete code
+                block has arrived, skipping the trailing explanation (default: True)
+        race: Additional contenders ("provider" or "provider:model") that receive
+              the same prompt; the first response with valid code wins and the
+              others are cancelled (optional)
+        hedge_delay: Seconds to wait before launching each additional contender,
+                     or "p95" to use the main model's recent 95th-percentile
+                     latency. None launches all contenders at once (default)
+        warm_executors: Run candidates in warm interpreter workers that keep
+                        common packages loaded between attempts (default: True)
+        cpp_profile: C++ flag profile, "iterate" (-O0, fastest compile, default)
+                     or "bench" (-O2 -march=native)
+        keep_artifacts: Keep every attempt under output/temp for debugging. By
+                        default attempts run from memory-backed scratch files
+                        (/dev/shm) removed right after each run (default: False)
+        candidates: Completions sampled per attempt. Above 1 they are run
+                    concurrently and the first one that passes is returned;
+                    cannot be combined with race (default: 1)
+        dependency_envs: Install the packages a candidate imports but the
+                         interpreter lacks into a cached environment (venv,
+                         R library or Julia project) built once per dependency
+                         set, and run the candidate there. Package names come
+                         from the generated code, so this is opt-in
+                         (default: False)
+        edit_repairs: On repair attempts, ask for search/replace edits of the
+                      last code instead of the whole program, and apply them
+                      locally; the whole program is requested when they do
+                      not apply (default: True)
+        structured_output: Have providers with tool support (OpenAI, DeepSeek,
+                           OpenRouter models with tools, Anthropic) return the
+                           code as a structured {language, code} object; markdown code blocks are extracted as a
+                           fallback (default: True)
         
     Returns:
         Generated code as string if successful, None otherwise
@@ -566,18 +1776,29 @@ def dscoder(
         AIAgent: Core implementation class
     """
     try:
-        agent = AIAgent(provider=provider, trace=trace)
+        agent = AIAgent(provider=provider, trace=trace, model=model, use_cache=use_cache,
+                        stream=stream, race=race, hedge_delay=hedge_delay,
+                        warm_executors=warm_executors, cpp_profile=cpp_profile,
+                        keep_artifacts=keep_artifacts, candidates=candidates,
+                        dependency_envs=dependency_envs, edit_repairs=edit_repairs,
+                        structured_output=structured_output)
         return agent.generate_code(
             description=description,
             language=language,
             expected_output=expected_output,
-            max_attempts=max_attempts
+            max_attempts=max_attempts,
+            timeout=timeout
         )
     except Exception as e:
         raise RuntimeError(f"Code generation failed: {str(e)}") from e
 
 def main():
     """Main function for command-line execution"""
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from batch import batch_main
+        batch_main(sys.argv[2:])
+        return
+    
     parser = ArgumentParser(description="AI Agent for code generation.")
     parser.add_argument(
         "description",
@@ -613,7 +1834,7 @@ def main():
         "--timeout",
         type=int,
         default=120,
-        help="Global timeout in seconds."
+        help="Time budget in seconds for the whole generation."
     )
     parser.add_argument(
         "--model",
@@ -627,6 +1848,67 @@ def main():
         help="Specific max_attempts.",
         default=5
     )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Bypass the LLM response cache."
+    )
+    parser.add_argument(
+        "--no_stream",
+        action="store_true",
+        help="Wait for complete responses instead of streaming them."
+    )
+    parser.add_argument(
+        "--race",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Extra provider or provider:model contenders to race against the main provider."
+    )
+    parser.add_argument(
+        "--hedge_delay",
+        type=lambda value: value if value == "p95" else float(value),
+        default=None,
+        help="Seconds (or 'p95') to wait before launching each extra contender."
+    )
+    parser.add_argument(
+        "--no_warm_executors",
+        action="store_true",
+        help="Run every attempt in a fresh interpreter process."
+    )
+    parser.add_argument(
+        "--cpp_profile",
+        type=str,
+        default="iterate",
+        choices=list(FLAG_PROFILES),
+        help="C++ flags: iterate (-O0) or bench (-O2 -march=native)."
+    )
+    parser.add_argument(
+        "--keep_artifacts",
+        action="store_true",
+        help="Keep every attempt under output/temp instead of running it from memory."
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=1,
+        help="Completions sampled and run concurrently per attempt."
+    )
+    parser.add_argument(
+        "--dependency_envs",
+        action="store_true",
+        help="Install packages a candidate imports but the interpreter lacks into a cached environment."
+    )
+    parser.add_argument(
+        "--no_edit_repairs",
+        action="store_true",
+        help="Ask for the whole program on every repair attempt instead of edits."
+    )
+    parser.add_argument(
+        "--no_structured_output",
+        action="store_true",
+        help="Extract code from markdown blocks instead of a structured tool call."
+    )
     
     args = parser.parse_args()
     
@@ -639,7 +1921,18 @@ def main():
             trace=args.trace,
             timeout=args.timeout,
             model=args.model,
-            max_attempts = args.max_attempts
+            max_attempts = args.max_attempts,
+            use_cache=not args.no_cache,
+            stream=not args.no_stream,
+            race=args.race,
+            hedge_delay=args.hedge_delay,
+            warm_executors=not args.no_warm_executors,
+            cpp_profile=args.cpp_profile,
+            keep_artifacts=args.keep_artifacts,
+            candidates=args.candidates,
+            dependency_envs=args.dependency_envs,
+            edit_repairs=not args.no_edit_repairs,
+            structured_output=not args.no_structured_output
         )
         
         if generated_code:
@@ -0,0 +1,116 @@
+"""
+Search/replace edits of the latest candidate.
+
+On repair attempts the model used to send the whole program again, even for
+a one-line fix, and long programs were cut off by the completion limit and
+failed once more. With edit repairs the model is asked instead for blocks
+of the form
+
+    <<<<<<< SEARCH
+    lines copied from the current code
+    =======
+    lines replacing them
+    >>>>>>> REPLACE
+
+which are applied here to the code it was shown. A SEARCH part must match
+one place of the code: exactly, or else line by line ignoring trailing
+whitespace, or else ignoring indentation (the replacement is then
+re-indented). Anything else raises EditError and the agent asks for the
+complete code instead.
+
+Search/replace blocks are used rather than unified diffs: they carry no
+line numbers or hunk counts for the model to get wrong.
+"""
+import re
+from dataclasses import dataclass
+from typing import Callable, List
+
+EDIT_BLOCK = re.compile(
+    r"^[ \t]*<{5,9} ?SEARCH[^\n]*\n(?P<search>.*?)^[ \t]*={5,9}[ \t]*\n(?P<replace>.*?)^[ \t]*>{5,9} ?REPLACE[^\n]*$",
+    re.DOTALL | re.MULTILINE
+)
+
+
+class EditError(ValueError):
+    """Raised when edits cannot be applied to the code they were written for"""
+
+
+@dataclass
+class Edit:
+    """One search/replace block"""
+    search: str
+    replace: str
+
+
+def parse_edits(content: str) -> List[Edit]:
+    """
+    Reads the search/replace blocks of an LLM response.
+
+    Returns:
+        List[Edit]: Edits in the order they appear; empty when there are none
+    """
+    return [Edit(match.group("search"), match.group("replace")) for match in EDIT_BLOCK.finditer(content)]
+
+
+def find_block(lines: List[str], block: List[str], key: Callable[[str], str]) -> List[int]:
+    """Indexes where block starts in lines, comparing lines through key"""
+    target = [key(line) for line in block]
+    size = len(block)
+    return [
+        i for i in range(len(lines) - size + 1)
+        if key(lines[i]) == target[0] and [key(line) for line in lines[i:i + size]] == target
+    ]
+
+
+def indentation(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def apply_edit(code: str, edit: Edit) -> str:
+    """
+    Applies one edit.
+
+    Raises:
+        EditError: When the SEARCH part is empty, not found or found more than once
+    """
+    search = edit.search.rstrip("\n")
+    if not search.strip():
+        raise EditError("a SEARCH part is empty")
+    lines = code.split("\n")
+    block = search.split("\n")
+    replacement = edit.replace.rstrip("\n").split("\n") if edit.replace.strip("\n") else []
+
+    for key in (str.rstrip, str.strip):
+        matches = find_block(lines, block, key)
+        if len(matches) > 1:
+            raise EditError(f"a SEARCH part matches {len(matches)} places:\n{search}")
+        if matches:
+            start = matches[0]
+            if key is str.strip:
+                # Moved to the indentation found in the code
+                found, written = indentation(lines[start]), indentation(block[0])
+                replacement = [
+                    found + line[len(written):] if line.startswith(written) else line
+                    for line in replacement
+                ]
+            return "\n".join(lines[:start] + replacement + lines[start + len(block):])
+    raise EditError(f"a SEARCH part does not match the code:\n{search}")
+
+
+def apply_edits(code: str, edits: List[Edit]) -> str:
+    """
+    Applies edits in order, each to the result of the previous ones.
+
+    Args:
+        code (str): Code the edits were written against
+        edits (List[Edit]): Edits from parse_edits
+
+    Returns:
+        str: Edited code
+
+    Raises:
+        EditError: When an edit does not apply; no partial result is returned
+    """
+    for edit in edits:
+        code = apply_edit(code, edit)
+    return code
@@ -0,0 +1,359 @@
+"""
+Cached dependency environments for candidates.
+
+Generated code used to install its own packages (pip install /
+install.packages inside the script) on every attempt. Instead, the
+dependencies of a candidate are now read statically from its source
+(imports, library()/require()/pkg::, using/import) and mapped to packages:
+
+- when the base interpreter already has them all, nothing changes and the
+  candidate runs as usual (warm executors included);
+- otherwise it runs in an environment keyed by the sorted dependency set,
+  built once under output/cache/envs and reused by every later attempt and
+  job that needs the same set: a venv on top of the base interpreter's
+  packages for Python, a library directory on R_LIBS for R and Rcpp, and a
+  project on JULIA_PROJECT for Julia.
+
+A failed installation is remembered for the rest of the process, so the
+model gets the installer's error right away instead of waiting for the
+same installation on every attempt. A build stopped by the attempt's time
+budget keeps its partial environment and resumes from it on the next
+attempt; once a dependency set has used INSTALL_TIMEOUT seconds of builds
+it is reported as failed too.
+"""
+import ast
+import functools
+import hashlib
+import importlib.util
+import json
+import re
+import shutil
+import subprocess
+import sys
+import sysconfig
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ENV_CACHE_DIR = Path("output") / "cache" / "envs"
+
+# Seconds the builds of an environment may take in total
+INSTALL_TIMEOUT = 900.0
+
+R_REPOSITORY = "https://cloud.r-project.org"
+
+# Python import names that differ from the name of their package
+PYTHON_PACKAGE_NAMES = {
+    "sklearn": "scikit-learn",
+    "skimage": "scikit-image",
+    "cv2": "opencv-python",
+    "PIL": "Pillow",
+    "yaml": "PyYAML",
+    "bs4": "beautifulsoup4",
+    "dateutil": "python-dateutil",
+    "dotenv": "python-dotenv",
+    "Crypto": "pycryptodome",
+    "OpenSSL": "pyOpenSSL",
+    "jwt": "PyJWT",
+    "serial": "pyserial",
+    "attr": "attrs",
+    "Levenshtein": "python-Levenshtein",
+}
+
+# Packages that ship with R
+R_BASE_PACKAGES = frozenset({
+    "base", "compiler", "datasets", "graphics", "grDevices", "grid", "methods",
+    "parallel", "splines", "stats", "stats4", "tcltk", "tools", "utils",
+})
+
+# Julia standard libraries, always available
+JULIA_STDLIB = frozenset({
+    "Base", "Core", "Main", "Artifacts", "Base64", "CRC32c", "Dates",
+    "DelimitedFiles", "Distributed", "FileWatching", "Future",
+    "InteractiveUtils", "LazyArtifacts", "LibGit2", "Libdl", "LinearAlgebra",
+    "Logging", "Markdown", "Mmap", "Pkg", "Printf", "Profile", "REPL", "Random",
+    "SHA", "Serialization", "SharedArrays", "Sockets", "SparseArrays",
+    "Statistics", "SuiteSparse", "TOML", "Test", "UUIDs", "Unicode",
+})
+
+
+class DependencyError(RuntimeError):
+    """Raised when the environment of a candidate cannot be built"""
+
+
+def is_stdlib_module(name: str) -> bool:
+    """Checks whether a top-level module belongs to the Python standard library"""
+    names = getattr(sys, "stdlib_module_names", None)
+    if names is not None:
+        return name in names
+    # Python < 3.10: look where the module would be loaded from
+    if name in sys.builtin_module_names:
+        return True
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return False
+    stdlib = sysconfig.get_paths()["stdlib"]
+    return bool(spec and spec.origin and spec.origin.startswith(stdlib) and "site-packages" not in spec.origin)
+
+
+def python_dependencies(source: str) -> List[str]:
+    """Top-level modules imported by Python source, standard library excluded"""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.add(node.module.split(".")[0])
+    return sorted(name for name in names if name != "__future__" and not is_stdlib_module(name))
+
+
+def r_dependencies(source: str) -> List[str]:
+    """Packages loaded or referenced by R source, base packages excluded"""
+    names = set(re.findall(
+        r"\b(?:library|require|requireNamespace|loadNamespace)\(\s*[\"']?([A-Za-z][A-Za-z0-9.]*)",
+        source
+    ))
+    names.update(re.findall(r"\b([A-Za-z][A-Za-z0-9.]*):::?[A-Za-z.]", source))
+    return sorted(names - R_BASE_PACKAGES)
+
+
+def julia_dependencies(source: str) -> List[str]:
+    """Packages loaded with using/import by Julia source, standard libraries excluded"""
+    names = set()
+    for match in re.finditer(r"^\s*(?:using|import)\s+([^:\n#]+)", source, re.MULTILINE):
+        for name in match.group(1).split(","):
+            name = name.strip().split(".")[0].split(" ")[0]
+            if name:
+                names.add(name)
+    return sorted(names - JULIA_STDLIB)
+
+
+def extract_dependencies(source: str, language: str) -> List[str]:
+    """
+    Reads the dependencies of a candidate from its source.
+
+    Args:
+        source (str): Candidate source
+        language (str): Candidate language
+
+    Returns:
+        List[str]: Sorted package names (Python import names for Python);
+                   empty for languages without package dependencies
+    """
+    language = language.lower()
+    if language == "python":
+        return python_dependencies(source)
+    if language in ("r", "rcpp"):
+        return r_dependencies(source)
+    if language == "julia":
+        return julia_dependencies(source)
+    return []
+
+
+@dataclass
+class Environment:
+    """
+    A built dependency environment.
+
+    Attributes:
+        language: Language the environment serves
+        packages: Sorted dependency set it was built for
+        path: Directory of the environment
+        variables: Environment variables set when running a candidate in it
+        python: Interpreter of a Python environment
+    """
+    language: str
+    packages: Tuple[str, ...]
+    path: str
+    variables: Dict[str, str] = field(default_factory=dict)
+    python: Optional[str] = None
+
+
+class EnvironmentManager:
+    """
+    Resolves candidates to cached dependency environments, building them on first use.
+
+    Attributes:
+        root: Directory holding one environment per dependency set
+        python: Base Python interpreter (also the one candidates run with)
+        rscript: Rscript executable
+        julia: Julia executable
+    """
+
+    def __init__(
+        self,
+        root: Path = ENV_CACHE_DIR,
+        python: Optional[str] = None,
+        rscript: str = "Rscript",
+        julia: str = "julia"
+    ):
+        self.root = Path(root)
+        self.python = python or sys.executable
+        self.rscript = rscript
+        self.julia = julia
+        self._locks: Dict[str, threading.Lock] = {}
+        self._failures: Dict[str, str] = {}
+        self._build_time: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(language: str, packages: Tuple[str, ...]) -> str:
+        """Cache key of a dependency set"""
+        payload = json.dumps([language, list(packages)])
+        return f"{language}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]}"
+
+    def missing(self, language: str, packages: List[str]) -> List[str]:
+        """Returns the packages the base interpreter does not have"""
+        if language == "python":
+            return [name for name in packages if importlib.util.find_spec(name) is None]
+        return [name for name in packages if name not in self.installed(language)]
+
+    @functools.lru_cache(maxsize=None)
+    def installed(self, language: str) -> frozenset:
+        """Packages of the base R library or Julia environment, listed once per process"""
+        if language == "r":
+            command = [self.rscript, "-e", "cat(rownames(installed.packages()), sep = '\\n')"]
+        else:
+            command = [self.julia, "-e", "using Pkg; foreach(println, keys(Pkg.project().dependencies))"]
+        try:
+            process = subprocess.run(command, capture_output=True, text=True, timeout=120)
+        except (OSError, subprocess.TimeoutExpired):
+            return frozenset()
+        return frozenset(process.stdout.split())
+
+    def resolve(self, source: str, language: str, timeout: Optional[float] = None) -> Optional[Environment]:
+        """
+        Returns the environment a candidate must run in.
+
+        Args:
+            source (str): Candidate source
+            language (str): Candidate language
+            timeout (Optional[float]): Seconds a build may take, capped by what is
+                                       left of INSTALL_TIMEOUT for the dependency set
+
+        Returns:
+            Optional[Environment]: None when the base interpreter already has
+                                   every dependency (or cannot be queried)
+
+        Raises:
+            DependencyError: When the environment cannot be built
+        """
+        language = language.lower()
+        packages = extract_dependencies(source, language)
+        if language == "rcpp":
+            # Same R library as plain R candidates
+            language = "r"
+        if language in ("r", "julia") and shutil.which(self.rscript if language == "r" else self.julia) is None:
+            # Nothing to install into; the run reports the missing interpreter
+            return None
+        if not packages or not self.missing(language, packages):
+            return None
+
+        packages = tuple(packages)
+        key = self.key(language, packages)
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key in self._failures:
+                raise DependencyError(self._failures[key])
+            path = self.root / key
+            if not (path / ".ready").exists():
+                # A directory left by an interrupted build is resumed, not rebuilt
+                path.mkdir(parents=True, exist_ok=True)
+                left = INSTALL_TIMEOUT - self._build_time.get(key, 0.0)
+                limit = left if timeout is None else min(timeout, left)
+                started = time.monotonic()
+                try:
+                    self.build(language, packages, path, limit)
+                except subprocess.TimeoutExpired:
+                    self._build_time[key] = self._build_time.get(key, 0.0) + time.monotonic() - started
+                    if self._build_time[key] < INSTALL_TIMEOUT:
+                        raise DependencyError(
+                            f"Dependency installation timeout for {', '.join(packages)}; "
+                            "the next attempt resumes it"
+                        )
+                    self._failures[key] = (
+                        f"Dependency installation for {', '.join(packages)} "
+                        f"did not finish within {INSTALL_TIMEOUT:.0f}s"
+                    )
+                    raise DependencyError(self._failures[key])
+                except DependencyError as e:
+                    shutil.rmtree(path, ignore_errors=True)
+                    self._failures[key] = str(e)
+                    raise
+                (path / ".ready").touch()
+            return self.environment(language, packages, path)
+
+    def environment(self, language: str, packages: Tuple[str, ...], path: Path) -> Environment:
+        """Describes how candidates run in a built environment"""
+        if language == "python":
+            return Environment(language, packages, str(path), python=str(path / "bin" / "python"))
+        if language == "r":
+            return Environment(language, packages, str(path), {"R_LIBS": str(path)})
+        return Environment(language, packages, str(path), {"JULIA_PROJECT": str(path)})
+
+    def build(self, language: str, packages: Tuple[str, ...], path: Path, timeout: float) -> None:
+        """
+        Installs a dependency set into a directory, completing what an
+        interrupted build left there.
+
+        Raises:
+            DependencyError: With the installer's output when it fails
+            subprocess.TimeoutExpired: When the build takes longer than timeout
+        """
+        if language == "python":
+            steps = [
+                # The venv sees the base packages, so only what is missing is installed
+                [self.python, "-m", "venv", "--system-site-packages", str(path)],
+                [str(path / "bin" / "python"), "-m", "pip", "install", "--disable-pip-version-check", "-q",
+                 *[PYTHON_PACKAGE_NAMES.get(name, name) for name in packages]],
+            ]
+        elif language == "r":
+            script = (
+                f"pkgs <- c({', '.join(json.dumps(name) for name in packages)}); "
+                f"lib <- {json.dumps(str(path))}; "
+                f"install.packages(setdiff(pkgs, rownames(installed.packages())), lib = lib, "
+                f"repos = {json.dumps(R_REPOSITORY)}); "
+                "ok <- vapply(pkgs, requireNamespace, logical(1), lib.loc = c(lib, .libPaths()), quietly = TRUE); "
+                "if (!all(ok)) { message('Could not install: ', paste(pkgs[!ok], collapse = ', ')); quit(status = 1) }"
+            )
+            steps = [[self.rscript, "-e", script]]
+            # Locks of installations killed mid-way would make R refuse to install again
+            for lock in path.glob("00LOCK*"):
+                shutil.rmtree(lock, ignore_errors=True)
+        else:
+            script = f"using Pkg; Pkg.add([{', '.join(json.dumps(name) for name in packages)}])"
+            steps = [[self.julia, f"--project={path}", "-e", script]]
+
+        deadline = time.monotonic() + timeout
+        for command in steps:
+            try:
+                process = subprocess.run(
+                    command, capture_output=True, text=True, timeout=max(0.0, deadline - time.monotonic())
+                )
+            except OSError as e:
+                raise DependencyError(f"Dependency installation failed: {e}")
+            if process.returncode != 0:
+                raise DependencyError(
+                    f"Dependency installation failed for {', '.join(packages)}:\n{process.stderr or process.stdout}"
+                )
+
+
+_manager: Optional[EnvironmentManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_environment_manager() -> EnvironmentManager:
+    """Returns the process-wide environment manager"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = EnvironmentManager()
+        return _manager
@@ -0,0 +1,361 @@
+"""
+Digests of failure output for the repair prompt.
+
+Compiler diagnostics and tracebacks were pasted into the next request as
+they came, often tens of KB of template instantiation chains, library
+frames and repeated warnings. digest_error() keeps what the model needs to
+fix the code, per language:
+
+- C++ (GCC/Clang): the first error with its source excerpt, then one line
+  per further distinct error; instantiation/inclusion chains collapsed and
+  nested template arguments elided
+- Python: the frames of the candidate with their source lines and the
+  final exception; library frames collapsed
+- R: the error lines with a shortened call chain; repeated warnings merged
+- Julia: the error message and the frames of the candidate; Base and
+  package frames collapsed
+
+In every language identical lines are merged, paths of scratch files are
+replaced with a stable name, and trim_error() enforces the token budget.
+"""
+import re
+from typing import List, Optional
+
+from llm_providers import estimate_tokens
+
+# Further errors listed (one line each) after the first C++ error
+MAX_CPP_ERRORS = 8
+
+# Candidate frames kept from the end of a Python or Julia stack
+MAX_FRAMES = 6
+
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+# Scratch and artifact files the candidate ran from (see scratch.py)
+CANDIDATE_PATH = re.compile(r"(?:[\w.\-]*/)*(?:dscoder_|code_temp_)[\w\-]+(\.\w+)")
+
+
+def trim_error(error: str, max_tokens: int) -> str:
+    """
+    Shortens an error message to roughly max_tokens, keeping its first and
+    last lines, where the failing statement and the final exception live.
+    """
+    if estimate_tokens(error) <= max_tokens:
+        return error
+
+    budget = max_tokens * 4
+    lines = error.splitlines()
+    head: List[str] = []
+    tail: List[str] = []
+    first, last = 0, len(lines) - 1
+    used = 0
+    take_head = True
+    while first <= last:
+        line = lines[first] if take_head else lines[last]
+        if used + len(line) + 1 > budget:
+            break
+        used += len(line) + 1
+        if take_head:
+            head.append(line)
+            first += 1
+        else:
+            tail.insert(0, line)
+            last -= 1
+        take_head = not take_head
+
+    if first > last:
+        return "\n".join(head + tail)
+    if not head:
+        return error[:budget] + "\n[... truncated ...]"
+    return "\n".join(head + ["[... truncated ...]"] + tail)
+
+
+def normalize(error: str) -> str:
+    """Removes terminal colors and replaces candidate file paths with a stable name"""
+    error = ANSI_ESCAPE.sub("", error)
+    return CANDIDATE_PATH.sub(lambda match: "candidate" + match.group(1), error)
+
+
+def dedupe_lines(lines: List[str]) -> List[str]:
+    """Drops repeated non-blank lines, keeping the first occurrence"""
+    seen = set()
+    kept = []
+    for line in lines:
+        key = line.strip()
+        if key and key in seen:
+            continue
+        seen.add(key)
+        kept.append(line)
+    return kept
+
+
+def elide_templates(line: str, depth: int = 1) -> str:
+    """Replaces template arguments nested deeper than depth with '...'"""
+    if "<" not in line:
+        return line
+    result = []
+    level = 0
+    for char in line:
+        if char == "<":
+            level += 1
+            if level == depth + 1:
+                result.append("<...")
+            if level > depth:
+                continue
+        elif char == ">" and level > 0:
+            level -= 1
+            if level == depth:
+                result.append(">")
+                continue
+            if level > depth:
+                continue
+        elif level > depth:
+            continue
+        result.append(char)
+    return "".join(result)
+
+
+# ---------------------------------------------------------------------------
+# C++
+# ---------------------------------------------------------------------------
+
+CPP_DIAGNOSTIC = re.compile(r"^(?P<location>[^\s:][^:]*:\d+(?::\d+)?): (?P<kind>fatal error|error|warning|note): (?P<message>.*)$")
+CPP_CHAIN = re.compile(r"In instantiation of|required from|required by substitution|In file included from|"
+                       r"^\s+from |In member function|In function|In constructor|In lambda function|"
+                       r"in instantiation of|requested here")
+
+
+def digest_cpp(error: str) -> Optional[str]:
+    """Digest of compiler output; None when it holds no error diagnostic"""
+    lines = error.splitlines()
+    header = [line for line in lines[:1] if line.startswith("Compilation failed")]
+    first: List[str] = []
+    others: List[str] = []
+    seen_messages = set()
+    collapsed = 0
+    # Where the candidate triggered a template error reported inside a library header
+    trigger: Optional[str] = None
+    current: Optional[List[str]] = None
+    for line in lines[len(header):]:
+        match = CPP_DIAGNOSTIC.match(line)
+        if CPP_CHAIN.search(line) and (match is None or match.group("kind") == "note"):
+            if not first and trigger is None and "candidate" in line and "here" in line:
+                trigger = elide_templates(line.strip())
+            else:
+                collapsed += 1
+            current = None
+            continue
+        if match is None:
+            # Source excerpt, caret or fix-it line of the diagnostic above
+            if current is not None and len(current) < 6:
+                current.append(elide_templates(line))
+            continue
+
+        kind, message = match.group("kind"), elide_templates(match.group("message"))
+        if kind in ("error", "fatal error"):
+            if not first:
+                first = [trigger] if trigger else []
+                first.append(f"{match.group('location')}: {kind}: {message}")
+                current = first
+                continue
+            current = None
+            if message not in seen_messages and len(others) < MAX_CPP_ERRORS:
+                others.append(f"{match.group('location')}: {kind}: {message}")
+            seen_messages.add(message)
+        elif kind == "note" and current is first and len(first) < 12:
+            # Notes of the first error (candidates, "did you forget to #include")
+            first.append(f"{match.group('location')}: note: {message}")
+        else:
+            current = None
+
+    if not first:
+        return None
+    digest = header + first
+    if collapsed:
+        digest.append(f"[... {collapsed} template instantiation/include context lines omitted ...]")
+    if others:
+        digest.append("Further errors:")
+        digest += others
+    return "\n".join(digest)
+
+
+# ---------------------------------------------------------------------------
+# Python
+# ---------------------------------------------------------------------------
+
+PYTHON_FRAME = re.compile(r'^\s*File "(?P<path>[^"]+)", line \d+')
+LIBRARY_PATH = re.compile(r"site-packages|dist-packages|/lib/python\d|<frozen |\\Lib\\")
+
+
+def digest_python(error: str) -> str:
+    lines = error.splitlines()
+    # Of chained exceptions, keep the last traceback and the first's final line
+    starts = [i for i, line in enumerate(lines) if line.startswith("Traceback (most recent call last)")]
+    prefix: List[str] = []
+    if len(starts) > 1:
+        earlier = [line for line in lines[starts[-2]:starts[-1]] if line.strip() and not line.startswith(" ")]
+        cause = [line for line in earlier if not line.startswith(("Traceback", "During handling", "The above exception"))]
+        if cause:
+            prefix = [f"(while handling {cause[0].strip()})"]
+        lines = lines[starts[-1]:]
+    elif starts:
+        prefix = lines[:starts[0]]
+        lines = lines[starts[0]:]
+
+    frames: List[List[str]] = []
+    body: List[str] = []
+    library = 0
+    tail: List[str] = []
+    for line in lines:
+        match = PYTHON_FRAME.match(line)
+        if match:
+            frames.append([line])
+            continue
+        if frames and line.startswith("    ") and not tail:
+            frames[-1].append(line)
+            continue
+        if line.startswith("Traceback"):
+            body.append(line)
+            continue
+        if frames or body:
+            tail.append(line)
+        else:
+            prefix.append(line)
+
+    kept: List[str] = []
+    for frame in frames:
+        if LIBRARY_PATH.search(frame[0]):
+            library += 1
+            continue
+        if kept and library:
+            kept.append(f"  [... {library} library frames ...]")
+        library = 0
+        kept.extend(frame[:3])
+    if library:
+        kept.append(f"  [... {library} library frames ...]")
+    if len(kept) > MAX_FRAMES * 3:
+        kept = ["  [... earlier frames omitted ...]"] + kept[-MAX_FRAMES * 3:]
+    return "\n".join(dedupe_lines(prefix) + body + kept + dedupe_lines(tail))
+
+
+# ---------------------------------------------------------------------------
+# R
+# ---------------------------------------------------------------------------
+
+def digest_r(error: str) -> str:
+    digest: List[str] = []
+    for line in error.splitlines():
+        if line.startswith("Calls:"):
+            calls = [call.strip() for call in line[len("Calls:"):].split("->")]
+            # The leading frames are the evaluation machinery (source, withVisible, eval...)
+            if len(calls) > 3:
+                line = "Calls: ... -> " + " -> ".join(calls[-3:])
+        elif line.strip() == "Execution halted":
+            continue
+        digest.append(line)
+    return "\n".join(dedupe_lines(digest))
+
+
+# ---------------------------------------------------------------------------
+# Julia
+# ---------------------------------------------------------------------------
+
+JULIA_FRAME = re.compile(r"^\s*\[\d+\]\s")
+JULIA_LOCATION = re.compile(r"^\s*@\s+(?P<module>\S+)")
+
+
+def digest_julia(error: str) -> str:
+    lines = error.splitlines()
+    digest: List[str] = []
+    frames: List[List[str]] = []
+    in_stack = False
+    for line in lines:
+        if line.strip().startswith("Stacktrace:"):
+            in_stack = True
+            continue
+        if in_stack and JULIA_FRAME.match(line):
+            frames.append([line])
+        elif in_stack and frames and JULIA_LOCATION.match(line):
+            frames[-1].append(line)
+        elif in_stack and not line.strip():
+            continue
+        else:
+            in_stack = False
+            digest.append(line)
+
+    kept: List[List[str]] = []
+    omitted = 0
+    for frame in frames:
+        location = JULIA_LOCATION.match(frame[-1]) if len(frame) > 1 else None
+        if any("candidate" in line for line in frame) or (location and location.group("module") == "Main"):
+            kept.append(frame)
+        else:
+            omitted += 1
+    if frames:
+        digest.append("Stacktrace:")
+        for frame in kept[:MAX_FRAMES]:
+            digest.extend(elide_templates(line, depth=2) for line in frame)
+        if omitted or len(kept) > MAX_FRAMES:
+            digest.append(f"  [... {omitted + max(0, len(kept) - MAX_FRAMES)} Base/package frames omitted ...]")
+    return "\n".join(dedupe_lines(digest))
+
+
+# Digesters of runtime failures; C++ compiler output goes through digest_cpp first
+DIGESTERS = {
+    "rcpp": digest_r,
+    "python": digest_python,
+    "r": digest_r,
+    "julia": digest_julia,
+}
+
+
+def digest_error(error: str, language: str, max_tokens: int = 1000) -> str:
+    """
+    Condenses the failure output of a candidate for the repair prompt.
+
+    Args:
+        error (str): Raw error (compiler output, traceback, stderr)
+        language (str): Candidate language
+        max_tokens (int): Token budget of the digest
+
+    Returns:
+        str: Digest within roughly max_tokens
+    """
+    error = normalize(error)
+    language = language.lower()
+    digested = None
+    if language in ("cpp", "rcpp"):
+        digested = digest_cpp(error)
+    if digested is None and language in DIGESTERS:
+        digested = DIGESTERS[language](error)
+    if not digested:
+        # Linker and runtime failures, other languages
+        digested = "\n".join(dedupe_lines(error.splitlines()))
+    return trim_error(digested, max_tokens)
+
+
+def summarize_error(error: str, language: str) -> str:
+    """
+    One-line headline of an error, used to summarise earlier attempts.
+
+    Returns:
+        str: The final exception for Python, the first error line otherwise
+    """
+    lines = [line.strip() for line in normalize(error).splitlines() if line.strip()]
+    if not lines:
+        return ""
+    language = language.lower()
+    if language == "python":
+        exception = [line for line in lines if re.match(r"^[\w.]+(Error|Exception|Exit|Interrupt)\b|^[\w.]+:", line)
+                     and not line.startswith("File ")]
+        return (exception[-1] if exception else lines[0])[:200]
+    markers = {
+        "cpp": (": error:", ": fatal error:"),
+        "rcpp": (": error:", "Error"),
+        "r": ("Error",),
+        "julia": ("ERROR:",),
+    }.get(language, ())
+    for line in lines:
+        if any(marker in line for marker in markers):
+            return line[:200]
+    return lines[0][:200]
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class ExecutionOutcome:
+    """
+    Checked result of one candidate.
+
+    Attributes:
+        error: Error fed back to the model, or None when the candidate passed
+        rejected: Whether static validation rejected it before execution
+    """
+    error: Optional[str]
+    rejected: bool = False
+
+
+class ExecutionCache:
+    """
+    In-memory LRU of candidate outcomes.
+
+    At temperature 0 the model often returns byte-identical code on a retry;
+    its outcome is then taken from here instead of validating and running it
+    again. Entries are keyed on the language, the code and the expected
+    output, since the same run passes or fails depending on what is expected.
+    Each agent keeps a private cache per job; one instance can also be
+    shared by several agents to reuse outcomes across jobs.
+
+    Attributes:
+        max_entries: Maximum number of stored outcomes
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, ExecutionOutcome]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(language: str, code: str, expected_output: Optional[str]) -> str:
+        """Builds the cache key of a candidate"""
+        payload = json.dumps(
+            {
+                "language": language.lower(),
+                "code": code,
+                "expected_output": expected_output.strip() if expected_output else None,
+            },
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[ExecutionOutcome]:
+        """Returns the stored outcome, or None on a miss"""
+        with self._lock:
+            outcome = self._entries.get(key)
+            if outcome is not None:
+                self._entries.move_to_end(key)
+            return outcome
+
+    def put(self, key: str, outcome: ExecutionOutcome) -> None:
+        """Stores an outcome, evicting the least recently used beyond max_entries"""
+        with self._lock:
+            self._entries[key] = outcome
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
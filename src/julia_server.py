@@ -0,0 +1,288 @@
+"""
+Persistent Julia execution server.
+
+A cold `julia file.jl` pays Julia's startup plus the JIT compilation of
+every package the candidate loads, which often takes longer than the run
+itself. A JuliaServer is a long-lived Julia process that loads the common
+packages once and then evaluates each candidate in a fresh anonymous module,
+so package code stays compiled between attempts while the candidates' own
+globals do not leak into each other.
+
+Startup can be cut further with a PackageCompiler sysimage of the packages
+generated code uses most:
+    python julia_server.py --build_sysimage [--packages DataFrames CSV]
+
+Without --packages, the packages are picked from the Julia files already
+saved under output/. Once built, the sysimage is used automatically.
+"""
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+from worker_pool import CaptureWorker, WorkerPool
+
+# Packages loaded by every server before it accepts candidates; missing ones are skipped
+DEFAULT_PRELOAD = ("Statistics", "LinearAlgebra", "Random", "Printf", "DataFrames")
+
+# Seconds a new server may take to start and load its packages
+STARTUP_TIMEOUT = 600.0
+
+SYSIMAGE_EXTENSIONS = {"darwin": "dylib", "win32": "dll"}
+DEFAULT_SYSIMAGE = Path("output") / "julia" / f"dscoder_sysimage.{SYSIMAGE_EXTENSIONS.get(sys.platform, 'so')}"
+
+# Server loop. Requests are "mode<TAB>path<TAB>stdout file<TAB>stderr file" lines on
+# stdin (see CaptureWorker for the protocol). exit() is shadowed in each
+# candidate module so it ends the candidate, not the server.
+SERVER_SOURCE = r'''
+using Random
+const CHANNEL = stdout
+
+for pkg in ARGS
+    try
+        Core.eval(Main, Meta.parse("using " * pkg))
+    catch
+    end
+end
+
+struct CandidateExit <: Exception
+    code::Int
+end
+
+function check_syntax(path)
+    ast = Meta.parseall(read(path, String); filename=path)
+    line = 0
+    for ex in ast.args
+        if ex isa LineNumberNode
+            line = ex.line
+        elseif ex isa Expr && ex.head in (:error, :incomplete)
+            println(stderr, "ERROR: ParseError at ", path, ":", line, ": ", join(string.(ex.args), " "))
+            return 1
+        end
+    end
+    return 0
+end
+
+function run_candidate(mode, path, out_path, err_path)
+    mod = Module(gensym(:Candidate))
+    Core.eval(mod, :(include(p) = Base.include($mod, p)))
+    Core.eval(mod, :(eval(x) = Core.eval($mod, x)))
+    Core.eval(mod, :(exit(code::Integer=0) = throw($CandidateExit(code))))
+    Random.seed!()
+    status = 0
+    open(out_path, "w") do out
+        open(err_path, "w") do err
+            redirect_stdout(out) do
+                redirect_stderr(err) do
+                    try
+                        if mode == "parse"
+                            status = check_syntax(path)
+                        else
+                            Base.include(mod, path)
+                        end
+                    catch e
+                        inner = e isa LoadError ? e.error : e
+                        if inner isa CandidateExit
+                            status = inner.code
+                        else
+                            status = 1
+                            print(stderr, "ERROR: ")
+                            showerror(stderr, e, catch_backtrace())
+                            println(stderr)
+                        end
+                    end
+                    flush(stdout)
+                    flush(stderr)
+                end
+            end
+        end
+    end
+    return status
+end
+
+println(CHANNEL, "DSCODER_READY")
+flush(CHANNEL)
+while !eof(stdin)
+    line = readline(stdin)
+    isempty(line) && continue
+    mode, path, out_path, err_path = split(line, '\t')
+    status = run_candidate(String(mode), String(path), String(out_path), String(err_path))
+    println(CHANNEL, "DSCODER_RESULT ", status)
+    flush(CHANNEL)
+end
+'''
+
+
+def julia_server_supported(julia: str = "julia") -> bool:
+    """Checks whether Julia is installed and the platform supports the pipe protocol"""
+    return os.name == "posix" and shutil.which(julia) is not None
+
+
+class JuliaServer(CaptureWorker):
+    """Handle to one long-lived Julia process"""
+
+    name = "Julia"
+    startup_timeout = STARTUP_TIMEOUT
+
+    def __init__(self, julia: str, preload: Sequence[str], sysimage: Optional[str]):
+        command = [julia, "--startup-file=no", "--history-file=no"]
+        if sysimage:
+            command.append(f"--sysimage={sysimage}")
+        super().__init__(command + ["-e", SERVER_SOURCE] + list(preload))
+
+    def request_line(self, mode: str, path: str, out_path: str, err_path: str, timeout: float) -> str:
+        return f"{mode}\t{path}\t{out_path}\t{err_path}"
+
+
+class JuliaServerPool(WorkerPool):
+    """
+    Pool of persistent Julia servers.
+
+    Attributes:
+        size: Maximum number of servers
+        preload: Packages loaded by each server at startup
+        max_runs: Candidates evaluated by a server before it is recycled
+        julia: Julia executable
+        sysimage: Sysimage used by the servers; DEFAULT_SYSIMAGE when it exists
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        preload: Sequence[str] = DEFAULT_PRELOAD,
+        max_runs: int = 100,
+        julia: str = "julia",
+        sysimage: Optional[str] = None
+    ):
+        super().__init__(size, max_runs)
+        self.preload = tuple(preload)
+        self.julia = julia
+        if sysimage is None and DEFAULT_SYSIMAGE.exists():
+            sysimage = str(DEFAULT_SYSIMAGE)
+        self.sysimage = sysimage
+
+    def new_worker(self) -> JuliaServer:
+        return JuliaServer(self.julia, self.preload, self.sysimage)
+
+
+def most_used_packages(paths: Iterable[str], limit: int = 10) -> List[str]:
+    """
+    Counts the packages loaded with `using`/`import` across Julia files.
+
+    Returns:
+        List[str]: Up to limit package names, most used first
+    """
+    counts: Counter = Counter()
+    pattern = re.compile(r"^\s*(?:using|import)\s+([^:\n#]+)", re.MULTILINE)
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                source = f.read()
+        except OSError:
+            continue
+        found = set()
+        for match in pattern.finditer(source):
+            for name in match.group(1).split(","):
+                name = name.strip().split(".")[0]
+                if name and name not in ("Base", "Core", "Main"):
+                    found.add(name)
+        counts.update(found)
+    return [name for name, _ in counts.most_common(limit)]
+
+
+def build_sysimage(
+    packages: Sequence[str],
+    sysimage_path: Path = DEFAULT_SYSIMAGE,
+    julia: str = "julia",
+    timeout: float = 3600.0
+) -> Path:
+    """
+    Builds a PackageCompiler sysimage with packages compiled in.
+
+    Args:
+        packages: Packages to include
+        sysimage_path: Output file
+        julia: Julia executable
+        timeout: Seconds the build may take
+
+    Returns:
+        Path: The sysimage path
+
+    Raises:
+        RuntimeError: When PackageCompiler fails
+    """
+    sysimage_path = Path(sysimage_path)
+    sysimage_path.parent.mkdir(parents=True, exist_ok=True)
+    package_list = ", ".join(f":{name}" for name in packages)
+    # A JSON string is a valid Julia string literal once $ is escaped
+    output = json.dumps(str(sysimage_path)).replace("$", "\\$")
+    script = (
+        "import Pkg; "
+        'haskey(Pkg.project().dependencies, "PackageCompiler") || Pkg.add("PackageCompiler"); '
+        "using PackageCompiler; "
+        f"create_sysimage([{package_list}]; sysimage_path={output})"
+    )
+    process = subprocess.run(
+        [julia, "--startup-file=no", "-e", script],
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Sysimage build failed:\n{process.stderr}")
+    return sysimage_path
+
+
+_pool: Optional[JuliaServerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_julia_pool() -> JuliaServerPool:
+    """Returns the process-wide Julia server pool, creating it with defaults on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = JuliaServerPool()
+        return _pool
+
+
+def configure_julia_pool(**kwargs) -> JuliaServerPool:
+    """Replaces the process-wide Julia server pool (see JuliaServerPool)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = JuliaServerPool(**kwargs)
+        return _pool
+
+
+def main():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Build a Julia sysimage for the dscoder Julia server.")
+    parser.add_argument("--build_sysimage", action="store_true", help="Build the sysimage.")
+    parser.add_argument("--packages", nargs="+", default=None, help="Packages to compile in (default: most used in output/).")
+    parser.add_argument("--limit", type=int, default=10, help="Number of most used packages picked from output/.")
+    parser.add_argument("--output", type=str, default=str(DEFAULT_SYSIMAGE), help="Sysimage file to write.")
+    args = parser.parse_args()
+
+    if not args.build_sysimage:
+        parser.print_help()
+        return
+    packages = args.packages
+    if packages is None:
+        packages = most_used_packages(
+            [str(path) for path in Path("output").rglob("*.jl")], limit=args.limit
+        ) or list(DEFAULT_PRELOAD)
+    print(f"Building sysimage with: {', '.join(packages)}")
+    print(f"Sysimage written to {build_sysimage(packages, Path(args.output))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Type
 from dataclasses import dataclass
+import json
+import logging
 import os
 
-from openai import OpenAI
-from anthropic import Anthropic
+# SDKs are imported by the client pool inside initialize_client, so that only
+# the selected provider's SDK is loaded, and only when it is first used
+from client_pool import get_client_pool
 
 @dataclass
 class LLMResponse:
@@ -13,9 +16,172 @@ class LLMResponse:
     tokens_used: int
     model: str
     provider: str
+    cached: bool = False
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for text when the provider does not report usage"""
+    return len(text) // 4
+
+
+def request_options(timeout: Optional[float]) -> Dict[str, Any]:
+    """Per-request SDK options; the client's default timeout applies when timeout is None"""
+    return {} if timeout is None else {"timeout": timeout}
+
+
+# Tool through which providers with structured output deliver code
+CODE_TOOL_NAME = "deliver_code"
+CODE_TOOL_DESCRIPTION = "Delivers the complete program answering the request"
+CODE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "language": {"type": "string", "description": "Programming language of the code"},
+        "code": {"type": "string", "description": "The complete program, without markdown fences"},
+    },
+    "required": ["language", "code"],
+    "additionalProperties": False,
+}
+
+
+@dataclass
+class CodeDelivery:
+    """Code delivered through the deliver_code tool"""
+    language: str
+    code: str
+
+
+def parse_delivery(content: Any) -> Optional[CodeDelivery]:
+    """
+    Reads the deliver_code arguments a structured response holds.
+
+    Returns:
+        Optional[CodeDelivery]: None when content is not a delivery (plain text,
+                                JSON cut off by the token limit, or not a string)
+    """
+    if not isinstance(content, str):
+        return None
+    text = content.strip()
+    if not text.startswith("{"):
+        return None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("code"), str):
+        return None
+    code = data["code"].strip()
+    if code.startswith("```"):
+        # Fenced despite the schema
+        code = code.split("\n", 1)[1].rstrip() if "\n" in code else ""
+        if code.endswith("```"):
+            code = code[:-3].rstrip()
+    if not code:
+        return None
+    return CodeDelivery(language=str(data.get("language") or ""), code=code)
+
+
+def openai_tool_options() -> Dict[str, Any]:
+    """Request arguments making an OpenAI-compatible model answer through deliver_code"""
+    return {
+        "tools": [{
+            "type": "function",
+            "function": {"name": CODE_TOOL_NAME, "description": CODE_TOOL_DESCRIPTION, "parameters": CODE_SCHEMA},
+        }],
+        "tool_choice": {"type": "function", "function": {"name": CODE_TOOL_NAME}},
+    }
+
+
+def anthropic_tool_options() -> Dict[str, Any]:
+    """Request arguments making a Claude model answer through deliver_code"""
+    return {
+        "tools": [{"name": CODE_TOOL_NAME, "description": CODE_TOOL_DESCRIPTION, "input_schema": CODE_SCHEMA}],
+        "tool_choice": {"type": "tool", "name": CODE_TOOL_NAME},
+    }
+
+
+def openai_message_content(message) -> str:
+    """Content of a chat completion message: the deliver_code arguments when the model called it"""
+    for call in getattr(message, "tool_calls", None) or []:
+        if call.function.name == CODE_TOOL_NAME:
+            return call.function.arguments
+    return message.content or ""
+
+
+def anthropic_message_content(response) -> str:
+    """Content of a Messages API response: the deliver_code input (as JSON) when the model called it"""
+    for block in response.content:
+        if block.type == "tool_use" and block.name == CODE_TOOL_NAME:
+            return json.dumps(block.input)
+    return "".join(block.text for block in response.content if block.type == "text")
+
+
+def openai_delta_content(delta, structured: bool) -> str:
+    """Text of a streamed chat completion delta, or its piece of the deliver_code arguments"""
+    if delta.content:
+        return delta.content
+    if structured and getattr(delta, "tool_calls", None):
+        return "".join(
+            call.function.arguments or "" for call in delta.tool_calls
+            if call.index == 0 and call.function is not None
+        )
+    return ""
+
+
+def _stream_openai_compatible(
+    client,
+    provider: str,
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    temperature: float,
+    model: str,
+    timeout: Optional[float] = None,
+    structured: bool = False
+) -> Iterator[LLMResponse]:
+    """
+    Streams a chat completion from an OpenAI-compatible endpoint as content deltas.
+
+    With structured, the model answers through deliver_code and the deltas
+    are pieces of the call's JSON arguments.
+    """
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True,
+        stream_options={"include_usage": True},
+        **(openai_tool_options() if structured else {}),
+        **request_options(timeout)
+    )
+    try:
+        for chunk in stream:
+            content = ""
+            if chunk.choices:
+                content = openai_delta_content(chunk.choices[0].delta, structured)
+            tokens_used = chunk.usage.total_tokens if getattr(chunk, "usage", None) else 0
+            if content or tokens_used:
+                yield LLMResponse(
+                    content=content,
+                    tokens_used=tokens_used,
+                    model=model,
+                    provider=provider
+                )
+    finally:
+        # Closing the response drops the connection, so the provider stops generating
+        stream.close()
 
 class LLMProvider(ABC):
-    """Abstract base class for LLM providers"""
+    """
+    Abstract base class for LLM providers
+    
+    Providers whose API returns several choices for one request (the OpenAI
+    `n` parameter) set supports_n and implement generate_completions.
+    Providers that can force the model to answer through the deliver_code
+    tool (function calling / tool use) set supports_structured and
+    implement generate_structured and stream_structured.
+    """
+    
+    supports_n = False
+    supports_structured = False
     
     @abstractmethod
     def initialize_client(self) -> None:
@@ -27,13 +193,138 @@ class LLMProvider(ABC):
         messages: List[Dict[str, str]],
         max_tokens: int,
         temperature: float,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
     ) -> LLMResponse:
         pass
+    
+    def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[LLMResponse]:
+        """
+        Streams a completion as a sequence of partial responses.
+        
+        Each yielded LLMResponse carries a content delta and the tokens it
+        accounts for (usually 0 until the provider reports usage). Closing the
+        iterator cancels the request. Providers without native streaming
+        yield the full completion as a single chunk.
+        """
+        yield self.generate_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            model=model,
+            timeout=timeout
+        )
+    
+    def generate_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        """
+        Generates a completion the model must answer through the deliver_code tool.
+        
+        The response content holds the tool arguments as JSON (see
+        parse_delivery), or the text the model wrote if it did not call it.
+        Providers without supports_structured return a plain completion,
+        whose code block is extracted as usual.
+        """
+        return self.generate_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            model=model,
+            timeout=timeout
+        )
+    
+    def stream_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[LLMResponse]:
+        """
+        Streams generate_structured; content deltas are pieces of the tool
+        arguments. Providers without supports_structured stream plain text.
+        """
+        return self.stream_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            model=model,
+            timeout=timeout
+        )
+
+class OpenAICompatibleStructured:
+    """
+    Structured output of the OpenAI-compatible providers, through a forced
+    function call. Mixed into providers holding an OpenAI SDK client;
+    provider is the name reported in responses.
+    """
+    
+    supports_structured = True
+    provider = ""
+    
+    def generate_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        if not self.client:
+            self.initialize_client()
+        
+        response = self.client.chat.completions.create(
+            model=model or self.default_model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **openai_tool_options(),
+            **request_options(timeout)
+        )
+        
+        return LLMResponse(
+            content=openai_message_content(response.choices[0].message),
+            tokens_used=response.usage.total_tokens,
+            model=model or self.default_model,
+            provider=self.provider
+        )
+    
+    def stream_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[LLMResponse]:
+        if not self.client:
+            self.initialize_client()
+        
+        return _stream_openai_compatible(
+            self.client, self.provider, messages, max_tokens, temperature,
+            model or self.default_model, timeout, structured=True
+        )
 
-class OpenAIProvider(LLMProvider):
+class OpenAIProvider(OpenAICompatibleStructured, LLMProvider):
     """Provider for OpenAI"""
     
+    supports_n = True
+    provider = "openai"
+    
     def __init__(self):
         self.client = None
         self.default_model = "gpt-4o"
@@ -42,14 +333,15 @@ class OpenAIProvider(LLMProvider):
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
-        self.client = OpenAI(api_key=api_key)
+        self.client = get_client_pool().openai(api_key=api_key)
     
     def generate_completion(
         self,
         messages: List[Dict[str, str]],
         max_tokens: int,
         temperature: float,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
     ) -> LLMResponse:
         if not self.client:
             self.initialize_client()
@@ -58,7 +350,8 @@ class OpenAIProvider(LLMProvider):
             model=model or self.default_model,
             messages=messages,
             max_tokens=max_tokens,
-            temperature=temperature
+            temperature=temperature,
+            **request_options(timeout)
         )
         
         return LLMResponse(
@@ -67,10 +360,67 @@ class OpenAIProvider(LLMProvider):
             model=model or self.default_model,
             provider="openai"
         )
+    
+    def generate_completions(
+        self,
+        messages: List[Dict[str, str]],
+        n: int,
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        structured: bool = False
+    ) -> List[LLMResponse]:
+        """
+        Generates n completions of the same messages in a single request.
+        
+        The request's usage is reported on the first response only. With
+        structured, every choice answers through deliver_code.
+        """
+        if not self.client:
+            self.initialize_client()
+            
+        response = self.client.chat.completions.create(
+            model=model or self.default_model,
+            messages=messages,
+            n=n,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **(openai_tool_options() if structured else {}),
+            **request_options(timeout)
+        )
+        
+        return [
+            LLMResponse(
+                content=openai_message_content(choice.message),
+                tokens_used=response.usage.total_tokens if index == 0 else 0,
+                model=model or self.default_model,
+                provider="openai"
+            )
+            for index, choice in enumerate(response.choices)
+        ]
+    
+    def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[LLMResponse]:
+        if not self.client:
+            self.initialize_client()
+        
+        return _stream_openai_compatible(
+            self.client, "openai", messages, max_tokens, temperature,
+            model or self.default_model, timeout
+        )
 
 class AnthropicProvider(LLMProvider):
     """Provider for Anthropic"""
     
+    supports_structured = True
+    
     def __init__(self):
         self.client = None
         self.default_model = "claude-3-5-haiku-latest" #claude-3-5-haiku-20241022
@@ -79,49 +429,181 @@ class AnthropicProvider(LLMProvider):
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
-        self.client = Anthropic(api_key=api_key)
+        self.client = get_client_pool().anthropic(api_key=api_key)
     
-    def _convert_messages(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
-        """Converts messages from OpenAI format to Anthropic format"""
+    def _convert_messages(
+        self,
+        messages: List[Dict[str, str]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Converts messages from OpenAI format to Anthropic format.
+
+        System messages become the ``system`` parameter and consecutive turns
+        of the same role are merged. Cache breakpoints are placed after the
+        system prompt and after the first user turn (the task), the prefix
+        shared by every attempt of a job.
+
+        Returns:
+            Tuple[List, List]: System content blocks and conversation messages
+        """
+        system = []
         converted = []
         for msg in messages:
             role = msg["role"]
-            content = msg["content"]
+            block = {"type": "text", "text": msg["content"]}
             if role == "system":
-                converted.append({"role": "assistant", "content": content})
+                system.append(block)
             elif role in ["user", "assistant"]:
-                converted.append({"role": role, "content": content})
+                if converted and converted[-1]["role"] == role:
+                    converted[-1]["content"].append(block)
+                else:
+                    converted.append({"role": role, "content": [block]})
             else:
                 logging.warning(f"Unsupported message type: {role}")
-        return converted
+
+        if system:
+            system[-1]["cache_control"] = {"type": "ephemeral"}
+        if converted and converted[0]["role"] == "user":
+            converted[0]["content"][0]["cache_control"] = {"type": "ephemeral"}
+        return system, converted
+
+    def _message_params(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Builds the messages (and system, when present) arguments of a request"""
+        system, converted = self._convert_messages(messages)
+        params: Dict[str, Any] = {"messages": converted}
+        if system:
+            params["system"] = system
+        return params
+
+    @staticmethod
+    def _input_tokens(usage) -> int:
+        """Input tokens of a request, including those written to or read from the prompt cache"""
+        return (
+            usage.input_tokens
+            + (getattr(usage, "cache_creation_input_tokens", None) or 0)
+            + (getattr(usage, "cache_read_input_tokens", None) or 0)
+        )
+    
+    @staticmethod
+    def _event_content(event) -> str:
+        """Text of a stream event, or its piece of the deliver_code input"""
+        if event.type != "content_block_delta":
+            return ""
+        if event.delta.type == "text_delta":
+            return event.delta.text
+        if event.delta.type == "input_json_delta":
+            return event.delta.partial_json
+        return ""
     
     def generate_completion(
         self,
         messages: List[Dict[str, str]],
         max_tokens: int,
         temperature: float,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        return self._generate(messages, max_tokens, temperature, model, timeout, {})
+    
+    def generate_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        return self._generate(messages, max_tokens, temperature, model, timeout, anthropic_tool_options())
+    
+    def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str],
+        timeout: Optional[float],
+        tools: Dict[str, Any]
     ) -> LLMResponse:
         if not self.client:
             self.initialize_client()
             
-        anthropic_messages = self._convert_messages(messages)
-        
         response = self.client.messages.create(
             model=model or self.default_model,
-            messages=anthropic_messages,
+            **self._message_params(messages),
             max_tokens=max_tokens,
-            temperature=temperature
+            temperature=temperature,
+            **tools,
+            **request_options(timeout)
         )
         
         return LLMResponse(
-            content=response.content[0].text,
-            tokens_used=response.usage.output_tokens + response.usage.input_tokens,
+            content=anthropic_message_content(response),
+            tokens_used=response.usage.output_tokens + self._input_tokens(response.usage),
             model=model or self.default_model,
             provider="anthropic"
         )
+    
+    def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[LLMResponse]:
+        return self._stream(messages, max_tokens, temperature, model, timeout, {})
+    
+    def stream_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[LLMResponse]:
+        return self._stream(messages, max_tokens, temperature, model, timeout, anthropic_tool_options())
+    
+    def _stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str],
+        timeout: Optional[float],
+        tools: Dict[str, Any]
+    ) -> Iterator[LLMResponse]:
+        if not self.client:
+            self.initialize_client()
+        
+        model = model or self.default_model
+        stream = self.client.messages.create(
+            model=model,
+            **self._message_params(messages),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            **tools,
+            **request_options(timeout)
+        )
+        try:
+            for event in stream:
+                content = self._event_content(event)
+                tokens_used = 0
+                if event.type == "message_start":
+                    tokens_used = self._input_tokens(event.message.usage)
+                elif event.type == "message_delta":
+                    tokens_used = event.usage.output_tokens
+                if content or tokens_used:
+                    yield LLMResponse(
+                        content=content,
+                        tokens_used=tokens_used,
+                        model=model,
+                        provider="anthropic"
+                    )
+        finally:
+            stream.close()
 
-class DeepSeekProvider(LLMProvider):
+class DeepSeekProvider(OpenAICompatibleStructured, LLMProvider):
     """
     Provider for the DeepSeek API that uses the same interface as OpenAI.
     
@@ -131,6 +613,8 @@ class DeepSeekProvider(LLMProvider):
         base_url: Base URL of the DeepSeek API
     """
     
+    provider = "deepseek"
+    
     def __init__(self):
         self.client = None
         self.default_model = "deepseek-chat"
@@ -138,7 +622,7 @@ class DeepSeekProvider(LLMProvider):
     
     def initialize_client(self) -> None:
         """
-        Initializes the OpenAI client with DeepSeek configurations.
+        Takes a pooled OpenAI client configured for the DeepSeek API.
         
         Raises:
             ValueError: If DEEPSEEK_API_KEY is not set in environment variables
@@ -147,7 +631,7 @@ class DeepSeekProvider(LLMProvider):
         if not api_key:
             raise ValueError("DEEPSEEK_API_KEY not found in environment variables")
             
-        self.client = OpenAI(
+        self.client = get_client_pool().openai(
             api_key=api_key,
             base_url=self.base_url
         )
@@ -157,7 +641,8 @@ class DeepSeekProvider(LLMProvider):
         messages: List[Dict[str, str]],
         max_tokens: int,
         temperature: float,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
     ) -> LLMResponse:
         """
         Generates a completion using the DeepSeek API.
@@ -167,6 +652,7 @@ class DeepSeekProvider(LLMProvider):
             max_tokens: Maximum number of tokens in the response
             temperature: Generation temperature (creativity)
             model: Specific model to use (optional)
+            timeout: Seconds the request may take (client default when None)
             
         Returns:
             LLMResponse: Standardized response containing generated content and metadata
@@ -181,7 +667,8 @@ class DeepSeekProvider(LLMProvider):
             model=model or self.default_model,
             messages=messages,
             max_tokens=max_tokens,
-            temperature=temperature
+            temperature=temperature,
+            **request_options(timeout)
         )
         
         return LLMResponse(
@@ -190,9 +677,45 @@ class DeepSeekProvider(LLMProvider):
             model=model or self.default_model,
             provider="deepseek"
         )
+    
+    def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[LLMResponse]:
+        """
+        Streams a completion from the DeepSeek API as content deltas.
+        
+        Args:
+            messages: List of messages in OpenAI format
+            max_tokens: Maximum number of tokens in the response
+            temperature: Generation temperature (creativity)
+            model: Specific model to use (optional)
+            timeout: Seconds the request may take (client default when None)
+            
+        Returns:
+            Iterator[LLMResponse]: Partial responses; closing it cancels the request
+        """
+        if not self.client:
+            self.initialize_client()
+        
+        return _stream_openai_compatible(
+            self.client, "deepseek", messages, max_tokens, temperature,
+            model or self.default_model, timeout
+        )
 
-class OpenRouterProvider(LLMProvider):
-    """Provider for OpenRouter API that provides access to multiple LLM models"""
+class OpenRouterProvider(OpenAICompatibleStructured, LLMProvider):
+    """
+    Provider for OpenRouter API that provides access to multiple LLM models
+    
+    Structured output needs a model with tool support; LLMClient falls back
+    to plain text for models whose request is rejected.
+    """
+    
+    provider = "openrouter"
     
     def __init__(self):
         self.client = None
@@ -201,7 +724,7 @@ class OpenRouterProvider(LLMProvider):
     
     def initialize_client(self) -> None:
         """
-        Initializes the OpenAI client with OpenRouter configurations
+        Takes a pooled OpenAI client configured for OpenRouter
         
         Raises:
             ValueError: If OPENROUTER_API_KEY is not set in environment variables
@@ -210,7 +733,7 @@ class OpenRouterProvider(LLMProvider):
         if not api_key:
             raise ValueError("OPENROUTER_API_KEY not found in environment variables")
             
-        self.client = OpenAI(
+        self.client = get_client_pool().openai(
             api_key=api_key,
             base_url=self.base_url,
             default_headers={
@@ -224,7 +747,8 @@ class OpenRouterProvider(LLMProvider):
         messages: List[Dict[str, str]],
         max_tokens: int,
         temperature: float,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
     ) -> LLMResponse:
         """
         Generates a completion using the OpenRouter API
@@ -234,6 +758,7 @@ class OpenRouterProvider(LLMProvider):
             max_tokens: Maximum tokens in response
             temperature: Generation temperature
             model: Specific model to use (optional)
+            timeout: Seconds the request may take (client default when None)
             
         Returns:
             LLMResponse: Standardized response with content and metadata
@@ -246,7 +771,8 @@ class OpenRouterProvider(LLMProvider):
                 model=model or self.default_model,
                 messages=messages,
                 max_tokens=max_tokens,
-                temperature=temperature
+                temperature=temperature,
+                **request_options(timeout)
             )
             
             return LLMResponse(
@@ -257,4 +783,432 @@ class OpenRouterProvider(LLMProvider):
             )
         except Exception as e:
             logging.error(f"OpenRouter API error: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[LLMResponse]:
+        """
+        Streams a completion from the OpenRouter API as content deltas
+        
+        Args:
+            messages: List of messages in OpenAI format
+            max_tokens: Maximum tokens in response
+            temperature: Generation temperature
+            model: Specific model to use (optional)
+            timeout: Seconds the request may take (client default when None)
+            
+        Returns:
+            Iterator[LLMResponse]: Partial responses; closing it cancels the request
+        """
+        if not self.client:
+            self.initialize_client()
+        
+        try:
+            yield from _stream_openai_compatible(
+                self.client, "openrouter", messages, max_tokens, temperature,
+                model or self.default_model, timeout
+            )
+        except Exception as e:
+            logging.error(f"OpenRouter API error: {str(e)}")
+            raise
+
+
+# Provider name -> class. Classes are cheap to build; SDKs load on first use.
+PROVIDER_REGISTRY: Dict[str, Type[LLMProvider]] = {
+    "openai": OpenAIProvider,
+    "anthropic": AnthropicProvider,
+    "deepseek": DeepSeekProvider,
+    "openrouter": OpenRouterProvider,
+}
+
+
+async def _stream_openai_compatible_async(
+    client,
+    provider: str,
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    temperature: float,
+    model: str,
+    timeout: Optional[float] = None,
+    structured: bool = False
+) -> AsyncIterator[LLMResponse]:
+    """Async twin of _stream_openai_compatible"""
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True,
+        stream_options={"include_usage": True},
+        **(openai_tool_options() if structured else {}),
+        **request_options(timeout)
+    )
+    try:
+        async for chunk in stream:
+            content = ""
+            if chunk.choices:
+                content = openai_delta_content(chunk.choices[0].delta, structured)
+            tokens_used = chunk.usage.total_tokens if getattr(chunk, "usage", None) else 0
+            if content or tokens_used:
+                yield LLMResponse(
+                    content=content,
+                    tokens_used=tokens_used,
+                    model=model,
+                    provider=provider
+                )
+    finally:
+        await stream.close()
+
+class AsyncLLMProvider(ABC):
+    """Abstract base class for asyncio LLM providers (see LLMProvider)"""
+    
+    supports_structured = False
+    
+    @abstractmethod
+    def initialize_client(self) -> None:
+        pass
+    
+    @abstractmethod
+    async def generate_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        pass
+    
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LLMResponse]:
+        """Async twin of LLMProvider.stream_completion"""
+        yield await self.generate_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            model=model,
+            timeout=timeout
+        )
+    
+    async def generate_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        """Async twin of LLMProvider.generate_structured"""
+        return await self.generate_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            model=model,
+            timeout=timeout
+        )
+    
+    def stream_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LLMResponse]:
+        """Async twin of LLMProvider.stream_structured"""
+        return self.stream_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            model=model,
+            timeout=timeout
+        )
+
+class AsyncOpenAICompatibleProvider(AsyncLLMProvider):
+    """
+    Shared implementation of the asyncio providers for OpenAI-compatible APIs.
+    
+    Attributes:
+        provider: Provider name reported in responses
+        api_key_env: Environment variable holding the API key
+        default_model: Default model to use
+        base_url: Base URL of the API (None for OpenAI itself)
+        default_headers: Extra headers sent with every request
+    """
+    
+    supports_structured = True
+    provider = ""
+    api_key_env = ""
+    default_model = ""
+    base_url = None
+    default_headers = None
+    
+    def __init__(self):
+        self.client = None
+    
+    def initialize_client(self) -> None:
+        api_key = os.getenv(self.api_key_env)
+        if not api_key:
+            raise ValueError(f"{self.api_key_env} not found in environment variables")
+        self.client = get_client_pool().openai(
+            api_key=api_key,
+            base_url=self.base_url,
+            default_headers=self.default_headers,
+            asynchronous=True
+        )
+    
+    async def generate_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        return await self._generate(messages, max_tokens, temperature, model, timeout, structured=False)
+    
+    async def generate_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        return await self._generate(messages, max_tokens, temperature, model, timeout, structured=True)
+    
+    async def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str],
+        timeout: Optional[float],
+        structured: bool
+    ) -> LLMResponse:
+        if not self.client:
+            self.initialize_client()
+        
+        response = await self.client.chat.completions.create(
+            model=model or self.default_model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **(openai_tool_options() if structured else {}),
+            **request_options(timeout)
+        )
+        
+        return LLMResponse(
+            content=openai_message_content(response.choices[0].message),
+            tokens_used=response.usage.total_tokens,
+            model=model or self.default_model,
+            provider=self.provider
+        )
+    
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LLMResponse]:
+        if not self.client:
+            self.initialize_client()
+        
+        async for chunk in _stream_openai_compatible_async(
+            self.client, self.provider, messages, max_tokens, temperature,
+            model or self.default_model, timeout
+        ):
+            yield chunk
+    
+    async def stream_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LLMResponse]:
+        if not self.client:
+            self.initialize_client()
+        
+        async for chunk in _stream_openai_compatible_async(
+            self.client, self.provider, messages, max_tokens, temperature,
+            model or self.default_model, timeout, structured=True
+        ):
+            yield chunk
+
+class AsyncOpenAIProvider(AsyncOpenAICompatibleProvider):
+    """Asyncio provider for OpenAI"""
+    
+    provider = "openai"
+    api_key_env = "OPENAI_API_KEY"
+    default_model = "gpt-4o"
+
+class AsyncDeepSeekProvider(AsyncOpenAICompatibleProvider):
+    """Asyncio provider for the DeepSeek API"""
+    
+    provider = "deepseek"
+    api_key_env = "DEEPSEEK_API_KEY"
+    default_model = "deepseek-chat"
+    base_url = "https://api.deepseek.com"
+
+class AsyncOpenRouterProvider(AsyncOpenAICompatibleProvider):
+    """Asyncio provider for the OpenRouter API"""
+    
+    provider = "openrouter"
+    api_key_env = "OPENROUTER_API_KEY"
+    default_model = "google/gemini-2.0-pro-exp-02-05:free"
+    base_url = "https://openrouter.ai/api/v1"
+    default_headers = {
+        "HTTP-Referer": "https://github.com/evandeilton/dscoder",
+        "X-Title": "DSCoder"
+    }
+
+class AsyncAnthropicProvider(AsyncLLMProvider):
+    """Asyncio provider for Anthropic"""
+    
+    supports_structured = True
+    _convert_messages = AnthropicProvider._convert_messages
+    _message_params = AnthropicProvider._message_params
+    _input_tokens = staticmethod(AnthropicProvider._input_tokens)
+    _event_content = staticmethod(AnthropicProvider._event_content)
+    
+    def __init__(self):
+        self.client = None
+        self.default_model = "claude-3-5-haiku-latest"
+    
+    def initialize_client(self) -> None:
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
+        self.client = get_client_pool().anthropic(api_key=api_key, asynchronous=True)
+    
+    async def generate_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        return await self._generate(messages, max_tokens, temperature, model, timeout, {})
+    
+    async def generate_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        return await self._generate(messages, max_tokens, temperature, model, timeout, anthropic_tool_options())
+    
+    async def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str],
+        timeout: Optional[float],
+        tools: Dict[str, Any]
+    ) -> LLMResponse:
+        if not self.client:
+            self.initialize_client()
+        
+        response = await self.client.messages.create(
+            model=model or self.default_model,
+            **self._message_params(messages),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **tools,
+            **request_options(timeout)
+        )
+        
+        return LLMResponse(
+            content=anthropic_message_content(response),
+            tokens_used=response.usage.output_tokens + self._input_tokens(response.usage),
+            model=model or self.default_model,
+            provider="anthropic"
+        )
+    
+    def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LLMResponse]:
+        return self._stream(messages, max_tokens, temperature, model, timeout, {})
+    
+    def stream_structured(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LLMResponse]:
+        return self._stream(messages, max_tokens, temperature, model, timeout, anthropic_tool_options())
+    
+    async def _stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str],
+        timeout: Optional[float],
+        tools: Dict[str, Any]
+    ) -> AsyncIterator[LLMResponse]:
+        if not self.client:
+            self.initialize_client()
+        
+        model = model or self.default_model
+        stream = await self.client.messages.create(
+            model=model,
+            **self._message_params(messages),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            **tools,
+            **request_options(timeout)
+        )
+        try:
+            async for event in stream:
+                content = self._event_content(event)
+                tokens_used = 0
+                if event.type == "message_start":
+                    tokens_used = self._input_tokens(event.message.usage)
+                elif event.type == "message_delta":
+                    tokens_used = event.usage.output_tokens
+                if content or tokens_used:
+                    yield LLMResponse(
+                        content=content,
+                        tokens_used=tokens_used,
+                        model=model,
+                        provider="anthropic"
+                    )
+        finally:
+            await stream.close()
+
+
+ASYNC_PROVIDER_REGISTRY: Dict[str, Type[AsyncLLMProvider]] = {
+    "openai": AsyncOpenAIProvider,
+    "anthropic": AsyncAnthropicProvider,
+    "deepseek": AsyncDeepSeekProvider,
+    "openrouter": AsyncOpenRouterProvider,
+}
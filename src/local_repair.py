@@ -0,0 +1,357 @@
+"""
+Rule-based repair of mechanical failures.
+
+Some failures need no model to fix: a missing #include that the compiler
+names, a module that moved between library versions, a package that is
+used but never declared. Each Fixer recognizes one such failure class in
+the error text and rewrites the candidate; the agent runs the rewritten
+candidate before spending an LLM round trip on it.
+
+Fixers are tried in registration order and the first one that changes the
+code wins. register_fixer() adds new ones.
+
+Fixers that only declare a dependency (requires_environments) rely on the
+dependency environments of environments.py to install it, and are skipped
+when those are disabled.
+"""
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from environments import julia_dependencies, python_dependencies, r_dependencies
+
+
+@dataclass
+class LocalFix:
+    """
+    A rewritten candidate.
+
+    Attributes:
+        code: Fixed code
+        description: What was changed, for the logs
+    """
+    code: str
+    description: str
+
+
+@dataclass
+class Fixer:
+    """
+    Repair rule for one failure class.
+
+    Attributes:
+        name: Failure class
+        languages: Languages whose errors it handles
+        pattern: Regular expression searched in the error text
+        apply: Builds the fix from the code and the match; None when it does not apply
+        requires_environments: Whether the fix only works with dependency environments
+    """
+    name: str
+    languages: List[str]
+    pattern: "re.Pattern"
+    apply: Callable[[str, "re.Match"], Optional[LocalFix]]
+    requires_environments: bool = False
+
+
+FIXERS: List[Fixer] = []
+
+
+def register_fixer(fixer: Fixer) -> None:
+    """Adds a fixer after the existing ones"""
+    FIXERS.append(fixer)
+
+
+def insert_after_header(code: str, line: str, header: "re.Pattern") -> str:
+    """Inserts a line after the leading lines matching header (includes, __future__ imports...)"""
+    lines = code.splitlines()
+    position = 0
+    for index, existing in enumerate(lines):
+        if header.match(existing):
+            position = index + 1
+    lines.insert(position, line)
+    return "\n".join(lines) + ("\n" if code.endswith("\n") else "")
+
+
+# ---------------------------------------------------------------------------
+# C++
+# ---------------------------------------------------------------------------
+
+# Headers of symbols GCC and Clang do not name a header for
+CPP_SYMBOL_HEADERS = {
+    "setprecision": "iomanip", "setw": "iomanip", "fixed": "iomanip",
+    "accumulate": "numeric", "iota": "numeric", "gcd": "numeric", "lcm": "numeric",
+    "partial_sum": "numeric", "inner_product": "numeric",
+    "numeric_limits": "limits", "INT_MAX": "climits", "INT_MIN": "climits",
+    "LLONG_MAX": "climits", "memset": "cstring", "memcpy": "cstring", "strlen": "cstring",
+    "sqrt": "cmath", "pow": "cmath", "fabs": "cmath", "floor": "cmath", "ceil": "cmath",
+    "sort": "algorithm", "reverse": "algorithm", "max_element": "algorithm",
+    "min_element": "algorithm", "unique": "algorithm", "stringstream": "sstream",
+    "istringstream": "sstream", "ostringstream": "sstream",
+}
+
+CPP_INCLUDE = re.compile(r"^\s*#\s*include\b")
+
+
+def add_cpp_includes(code: str, headers: List[str]) -> Optional[LocalFix]:
+    present = set(re.findall(r"#\s*include\s*<([^>]+)>", code))
+    missing = [header for header in dict.fromkeys(headers) if header not in present]
+    if not missing:
+        return None
+    for header in missing:
+        code = insert_after_header(code, f"#include <{header}>", CPP_INCLUDE)
+    return LocalFix(code, "added " + ", ".join(f"<{header}>" for header in missing))
+
+
+def fix_suggested_include(code: str, match: "re.Match") -> Optional[LocalFix]:
+    # The compiler lists every missing header of the translation unit
+    headers = re.findall(r"(?:#include|include the header) <([^>]+)>", match.string)
+    return add_cpp_includes(code, headers)
+
+
+def fix_undeclared_symbol(code: str, match: "re.Match") -> Optional[LocalFix]:
+    headers = [
+        CPP_SYMBOL_HEADERS[symbol.split("::")[-1]]
+        for symbol in re.findall(
+            r"'(?:std::)?(\w+)' (?:was not declared in this scope|is not a member of 'std'|has not been declared)",
+            match.string
+        ) + re.findall(r"no member named '(\w+)' in namespace 'std'", match.string)
+        if symbol in CPP_SYMBOL_HEADERS
+    ]
+    return add_cpp_includes(code, headers)
+
+
+register_fixer(Fixer(
+    "missing_include", ["cpp", "rcpp"],
+    re.compile(r"did you forget to '#include <[^>]+>'|include the header <[^>]+>"),
+    fix_suggested_include
+))
+register_fixer(Fixer(
+    "undeclared_symbol", ["cpp", "rcpp"],
+    re.compile(r"was not declared in this scope|is not a member of 'std'|no member named '\w+' in namespace 'std'"),
+    fix_undeclared_symbol
+))
+
+
+# ---------------------------------------------------------------------------
+# Python
+# ---------------------------------------------------------------------------
+
+# Wrong or outdated module names and the module to import instead
+PYTHON_MODULE_ALIASES = {
+    "sklearn.cross_validation": "sklearn.model_selection",
+    "sklearn.grid_search": "sklearn.model_selection",
+    "sklearn.learning_curve": "sklearn.model_selection",
+    "scikit_learn": "sklearn",
+    "opencv": "cv2",
+    "Image": "PIL.Image",
+    "pillow": "PIL",
+    "beautifulsoup4": "bs4",
+    "BeautifulSoup": "bs4",
+    "pyyaml": "yaml",
+}
+
+# Names moved between modules: (old module, name) -> new module
+PYTHON_MOVED_NAMES = {
+    ("pandas.io.json", "json_normalize"): "pandas",
+    ("scipy.misc", "comb"): "scipy.special",
+    ("scipy.misc", "factorial"): "scipy.special",
+    ("scipy.misc", "logsumexp"): "scipy.special",
+    ("sklearn.externals", "joblib"): "joblib",
+    **{("collections", name): "collections.abc" for name in (
+        "Mapping", "MutableMapping", "Sequence", "MutableSequence", "Iterable",
+        "Iterator", "Callable", "Hashable", "Set", "MutableSet"
+    )},
+}
+
+PYTHON_HEADER = re.compile(r"^\s*(from __future__ import|#!|# -\*-)")
+
+
+def fix_module_alias(code: str, match: "re.Match") -> Optional[LocalFix]:
+    module = match.group(1)
+    replacement = PYTHON_MODULE_ALIASES.get(module)
+    if replacement is None:
+        return None
+    escaped = re.escape(module)
+    if "." in module:
+        # Dotted paths are also spelled out where they are used
+        fixed = re.sub(rf"\b{escaped}\b", replacement, code)
+    else:
+        fixed = re.sub(rf"^(\s*)import {escaped}(\s+as\s+\w+)", rf"\1import {replacement}\2", code, flags=re.MULTILINE)
+        # Keep the name the code uses
+        fixed = re.sub(rf"^(\s*)import {escaped}[ \t]*$", rf"\1import {replacement} as {module}", fixed, flags=re.MULTILINE)
+        fixed = re.sub(rf"^(\s*)from {escaped} import", rf"\1from {replacement} import", fixed, flags=re.MULTILINE)
+    if fixed == code:
+        return None
+    return LocalFix(fixed, f"replaced module {module} with {replacement}")
+
+
+def fix_moved_name(code: str, match: "re.Match") -> Optional[LocalFix]:
+    name, module = match.group(1), match.group(2)
+    target = PYTHON_MOVED_NAMES.get((module, name))
+    if target is None:
+        return None
+    pattern = re.compile(rf"^(\s*)from {re.escape(module)} import ([^\n()]+)$", re.MULTILINE)
+    for line in pattern.finditer(code):
+        names = [part.strip() for part in line.group(2).split(",")]
+        moved = [part for part in names if part.split(" as ")[0].strip() == name]
+        if not moved:
+            continue
+        kept = [part for part in names if part not in moved]
+        indent = line.group(1)
+        replacement = f"{indent}from {target} import {', '.join(moved)}"
+        if kept:
+            replacement = f"{indent}from {module} import {', '.join(kept)}\n{replacement}"
+        fixed = code[:line.start()] + replacement + code[line.end():]
+        return LocalFix(fixed, f"imported {name} from {target}")
+    return None
+
+
+def fix_undeclared_python_module(code: str, match: "re.Match") -> Optional[LocalFix]:
+    module = match.group(1).split(".")[0]
+    if module in python_dependencies(code) or module in PYTHON_MODULE_ALIASES:
+        # Imported by the code itself: its environment could not provide it
+        return None
+    fixed = insert_after_header(code, f"import {module}  # noqa: F401 (dependency)", PYTHON_HEADER)
+    return LocalFix(fixed, f"declared dependency {module}")
+
+
+register_fixer(Fixer(
+    "module_alias", ["python"],
+    re.compile(r"ModuleNotFoundError: No module named '([\w.]+)'"),
+    fix_module_alias
+))
+register_fixer(Fixer(
+    "moved_name", ["python"],
+    re.compile(r"ImportError: cannot import name '(\w+)' from '([\w.]+)'"),
+    fix_moved_name
+))
+register_fixer(Fixer(
+    "undeclared_dependency", ["python"],
+    re.compile(r"(?:ModuleNotFoundError: No module named|Missing optional dependency) '([\w.]+)'"),
+    fix_undeclared_python_module,
+    requires_environments=True
+))
+
+
+# ---------------------------------------------------------------------------
+# R
+# ---------------------------------------------------------------------------
+
+# Functions of common packages that candidates call without attaching them
+R_FUNCTION_PACKAGES = {
+    "%>%": "magrittr", "ggplot": "ggplot2", "aes": "ggplot2", "geom_point": "ggplot2",
+    "geom_line": "ggplot2", "mutate": "dplyr", "summarise": "dplyr", "summarize": "dplyr",
+    "group_by": "dplyr", "arrange": "dplyr", "select": "dplyr", "tibble": "tibble",
+    "read_csv": "readr", "write_csv": "readr", "pivot_longer": "tidyr",
+    "pivot_wider": "tidyr", "str_detect": "stringr", "str_replace": "stringr",
+    "str_split": "stringr", "map": "purrr", "fread": "data.table", "data.table": "data.table",
+    "ymd": "lubridate", "cppFunction": "Rcpp", "sourceCpp": "Rcpp",
+}
+
+R_HEADER = re.compile(r"^\s*(library|require|suppressPackageStartupMessages)\(")
+
+
+def fix_r_missing_function(code: str, match: "re.Match") -> Optional[LocalFix]:
+    package = R_FUNCTION_PACKAGES.get(match.group(1))
+    if package is None or package in r_dependencies(code):
+        return None
+    return LocalFix(insert_after_header(code, f"library({package})", R_HEADER), f"attached {package}")
+
+
+def fix_undeclared_r_package(code: str, match: "re.Match") -> Optional[LocalFix]:
+    package = match.group(1)
+    if package in r_dependencies(code):
+        return None
+    fixed = insert_after_header(code, f'invisible(requireNamespace("{package}", quietly = TRUE))', R_HEADER)
+    return LocalFix(fixed, f"declared dependency {package}")
+
+
+register_fixer(Fixer(
+    "missing_function", ["r"],
+    re.compile(r"could not find function \"([^\"]+)\""),
+    fix_r_missing_function
+))
+register_fixer(Fixer(
+    "undeclared_dependency", ["r"],
+    re.compile(r"there is no package called [‘'\"]([\w.]+)[’'\"]"),
+    fix_undeclared_r_package,
+    requires_environments=True
+))
+
+
+# ---------------------------------------------------------------------------
+# Julia
+# ---------------------------------------------------------------------------
+
+# Standard library functions that need a `using`
+JULIA_FUNCTION_MODULES = {
+    "mean": "Statistics", "median": "Statistics", "std": "Statistics", "var": "Statistics",
+    "cor": "Statistics", "quantile": "Statistics", "norm": "LinearAlgebra",
+    "dot": "LinearAlgebra", "det": "LinearAlgebra", "eigen": "LinearAlgebra",
+    "I": "LinearAlgebra", "@printf": "Printf", "@sprintf": "Printf",
+    "now": "Dates", "Date": "Dates", "DateTime": "Dates", "shuffle": "Random",
+    "shuffle!": "Random", "randperm": "Random",
+}
+
+JULIA_HEADER = re.compile(r"^\s*(using|import)\s")
+
+
+def fix_julia_undefined(code: str, match: "re.Match") -> Optional[LocalFix]:
+    module = JULIA_FUNCTION_MODULES.get(match.group(1))
+    if module is None or re.search(rf"^\s*(using|import)\s+.*\b{module}\b", code, re.MULTILINE):
+        return None
+    return LocalFix(insert_after_header(code, f"using {module}", JULIA_HEADER), f"added using {module}")
+
+
+def fix_undeclared_julia_package(code: str, match: "re.Match") -> Optional[LocalFix]:
+    package = match.group(1)
+    if package in julia_dependencies(code):
+        return None
+    return LocalFix(insert_after_header(code, f"import {package}", JULIA_HEADER), f"declared dependency {package}")
+
+
+register_fixer(Fixer(
+    "undefined_function", ["julia"],
+    re.compile(r"UndefVarError: `?(@?[\w!]+)`? not defined"),
+    fix_julia_undefined
+))
+register_fixer(Fixer(
+    "undeclared_dependency", ["julia"],
+    re.compile(r"Package (\w+) not found in current path"),
+    fix_undeclared_julia_package,
+    requires_environments=True
+))
+
+
+def classify_error(error: str, language: str) -> Optional[str]:
+    """Returns the failure class of an error, or None when no fixer recognizes it"""
+    for fixer in FIXERS:
+        if language.lower() in fixer.languages and fixer.pattern.search(error):
+            return fixer.name
+    return None
+
+
+def local_repair(code: str, error: str, language: str, environments: bool = True) -> Optional[LocalFix]:
+    """
+    Tries the fixers of a language on a failed candidate.
+
+    Args:
+        code (str): Candidate code
+        error (str): Error it failed with
+        language (str): Candidate language
+        environments (bool): Whether dependency environments are enabled
+
+    Returns:
+        Optional[LocalFix]: First fix that changes the code, or None
+    """
+    language = language.lower()
+    for fixer in FIXERS:
+        if language not in fixer.languages or (fixer.requires_environments and not environments):
+            continue
+        match = fixer.pattern.search(error)
+        if match is None:
+            continue
+        fix = fixer.apply(code, match)
+        if fix is not None and fix.code != code:
+            return fix
+    return None
@@ -0,0 +1,288 @@
+"""
+Streaming capture of candidate output.
+
+Candidates used to be run with communicate(), which holds everything they
+print in memory and lets them run to the end even when their first line
+is already wrong. Output is now read from the pipes as it arrives:
+
+- each stream goes to a RingBuffer that keeps only its last MAX_CAPTURE
+  characters, so a candidate printing gigabytes costs a bounded amount of
+  memory;
+- stdout is checked against the expected output with a PrefixMatcher, and
+  the run is killed as soon as no continuation could match any more.
+
+The pipes are read with select(), which needs POSIX (like the process
+groups the runs are killed through).
+"""
+import codecs
+import os
+import select
+import signal
+import subprocess
+import time
+from collections import deque
+from dataclasses import dataclass
+from io import IncrementalNewlineDecoder
+from typing import Deque, Dict, Optional, Sequence
+
+# Characters kept of each of stdout and stderr
+MAX_CAPTURE = 1 << 20
+
+# Bytes read from a pipe at a time
+CHUNK_SIZE = 65536
+
+
+@dataclass
+class RunResult:
+    """Outcome of running one candidate"""
+    stdout: str
+    stderr: str
+    returncode: int
+    timed_out: bool = False
+    # Stopped early because its output could no longer match the expected output
+    diverged: bool = False
+
+
+class RingBuffer:
+    """
+    Text buffer that keeps only the last capacity characters written to it.
+
+    Attributes:
+        capacity: Maximum number of characters kept
+        dropped: Number of characters discarded so far
+    """
+
+    def __init__(self, capacity: int = MAX_CAPTURE):
+        self.capacity = capacity
+        self.dropped = 0
+        self._chunks: Deque[str] = deque()
+        self._size = 0
+
+    def write(self, text: str) -> None:
+        if len(text) >= self.capacity:
+            self.dropped += self._size + len(text) - self.capacity
+            self._chunks.clear()
+            self._size = 0
+            text = text[len(text) - self.capacity:]
+        self._chunks.append(text)
+        self._size += len(text)
+        while self._size > self.capacity:
+            excess = self._size - self.capacity
+            first = self._chunks[0]
+            if len(first) <= excess:
+                self._chunks.popleft()
+                cut = len(first)
+            else:
+                self._chunks[0] = first[excess:]
+                cut = excess
+            self._size -= cut
+            self.dropped += cut
+
+    def getvalue(self) -> str:
+        """Returns the kept text, preceded by a marker when older text was dropped"""
+        text = "".join(self._chunks)
+        if self.dropped:
+            return f"[... {self.dropped} characters dropped ...]\n{text}"
+        return text
+
+
+class PrefixMatcher:
+    """
+    Tells, while output arrives, whether it can still match the expected output.
+
+    Matching follows AIAgent.check_result, which compares both sides after
+    strip(): leading whitespace of the output is skipped, and once the
+    expected text is complete only whitespace may follow.
+
+    Attributes:
+        expected: Stripped expected output
+        diverged: Whether the output seen so far can no longer match
+    """
+
+    def __init__(self, expected: str):
+        self.expected = expected.strip()
+        self.diverged = False
+        self._position = 0
+        self._started = False
+
+    def feed(self, text: str) -> bool:
+        """
+        Checks the next piece of output.
+
+        Returns:
+            bool: False once the output has diverged from the expected output
+        """
+        if self.diverged:
+            return False
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return True
+            self._started = True
+
+        position = self._position
+        if position < len(self.expected):
+            size = min(len(text), len(self.expected) - position)
+            if text[:size] != self.expected[position:position + size]:
+                self.diverged = True
+                return False
+            self._position = position + size
+            text = text[size:]
+        if text and not text.isspace():
+            self.diverged = True
+        return not self.diverged
+
+
+class OutputMonitor:
+    """
+    Decodes the raw output of a run into ring buffers and watches stdout for divergence.
+
+    Bytes are decoded as UTF-8 (invalid sequences replaced) with universal
+    newlines, like a text-mode Popen.
+
+    Attributes:
+        stdout: Buffer of the decoded stdout
+        stderr: Buffer of the decoded stderr
+        matcher: Checks stdout against the expected output; None without one
+    """
+
+    def __init__(self, expected_output: Optional[str] = None, capacity: int = MAX_CAPTURE):
+        self.stdout = RingBuffer(capacity)
+        self.stderr = RingBuffer(capacity)
+        self.matcher = PrefixMatcher(expected_output) if expected_output else None
+        self._decoders = {
+            name: IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(errors="replace"), translate=True)
+            for name in ("stdout", "stderr")
+        }
+
+    @property
+    def diverged(self) -> bool:
+        return self.matcher is not None and self.matcher.diverged
+
+    def feed_stdout(self, data: bytes, final: bool = False) -> None:
+        text = self._decoders["stdout"].decode(data, final)
+        self.stdout.write(text)
+        if self.matcher is not None and text:
+            self.matcher.feed(text)
+
+    def feed_stderr(self, data: bytes, final: bool = False) -> None:
+        self.stderr.write(self._decoders["stderr"].decode(data, final))
+
+    def close(self) -> None:
+        """Flushes bytes held back by the decoders"""
+        self.feed_stdout(b"", final=True)
+        self.feed_stderr(b"", final=True)
+
+    def result(self, returncode: int, timed_out: bool = False) -> RunResult:
+        self.close()
+        return RunResult(
+            self.stdout.getvalue(), self.stderr.getvalue(), returncode,
+            timed_out=timed_out, diverged=self.diverged
+        )
+
+
+def pump(stdout_fd: int, stderr_fd: int, monitor: OutputMonitor, deadline: float) -> str:
+    """
+    Reads two pipes into a monitor until both close, stdout diverges or the deadline passes.
+
+    Args:
+        stdout_fd (int): Read end of the stdout pipe
+        stderr_fd (int): Read end of the stderr pipe
+        monitor (OutputMonitor): Receives the output
+        deadline (float): time.monotonic() value at which reading stops
+
+    Returns:
+        str: "eof", "diverged" or "timeout"
+    """
+    feeds = {stdout_fd: monitor.feed_stdout, stderr_fd: monitor.feed_stderr}
+    while feeds:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return "timeout"
+        ready, _, _ = select.select(list(feeds), [], [], remaining)
+        for fd in ready:
+            data = os.read(fd, CHUNK_SIZE)
+            if data:
+                feeds[fd](data)
+            else:
+                del feeds[fd]
+        if monitor.diverged:
+            return "diverged"
+    return "eof"
+
+
+def kill_group(pid: int) -> None:
+    """Kills the process group led by pid, if it is still there"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run_process(
+    command: Sequence[str],
+    timeout: float,
+    expected_output: Optional[str] = None,
+    capacity: int = MAX_CAPTURE,
+    env: Optional[Dict[str, str]] = None
+) -> RunResult:
+    """
+    Runs a command in its own session, streaming its output.
+
+    The whole process group is killed when the timeout passes or, given an
+    expected output, as soon as stdout can no longer match it.
+
+    Args:
+        command (Sequence[str]): Command to run
+        timeout (float): Seconds the command may run
+        expected_output (Optional[str]): Output the command should print
+        capacity (int): Characters kept of each of stdout and stderr
+        env (Optional[Dict[str, str]]): Variables added to the inherited environment
+
+    Returns:
+        RunResult: Captured (possibly truncated) output and exit status
+
+    Raises:
+        OSError: When the command cannot be started
+    """
+    deadline = time.monotonic() + timeout
+    process = subprocess.Popen(
+        list(command),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+        env={**os.environ, **env} if env else None
+    )
+    monitor = OutputMonitor(expected_output, capacity)
+    try:
+        status = pump(process.stdout.fileno(), process.stderr.fileno(), monitor, deadline)
+        if status == "eof":
+            try:
+                process.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                status = "timeout"
+    finally:
+        if process.poll() is None:
+            kill_group(process.pid)
+        process.wait()
+        process.stdout.close()
+        process.stderr.close()
+    return monitor.result(process.returncode, timed_out=status == "timeout")
+
+
+def read_tail(path: str, capacity: int = MAX_CAPTURE) -> str:
+    """
+    Reads the last capacity bytes of an output file, like a RingBuffer would keep them.
+
+    Returns:
+        str: Decoded text, preceded by a marker when the start was skipped
+    """
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        skipped = max(0, size - capacity)
+        f.seek(skipped)
+        buffer = RingBuffer(capacity)
+        buffer.dropped = skipped
+        buffer.write(f.read().decode("utf-8", errors="replace").replace("\r\n", "\n"))
+    return buffer.getvalue()
@@ -0,0 +1,253 @@
+"""
+Warm Python interpreter pool.
+
+Each worker is a long-lived Python process that imports the common
+scientific packages once and then acts as a fork server: every candidate
+runs in a fresh forked child of that warm parent, so it starts with numpy,
+pandas, etc. already loaded while still getting its own address space,
+stdin, stdout and stderr. The parent streams the child's output through
+pipes (see output_stream), stopping it as soon as it diverges from the
+expected output. Workers are replaced after a number of runs.
+
+Forking needs POSIX; use python_pool_supported() to check.
+
+The worker side runs when this file is executed as a script:
+    python python_pool.py --preload numpy,pandas
+"""
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict
+from typing import Optional, Sequence
+
+from output_stream import OutputMonitor, kill_group, pump
+from worker_pool import RunResult, Worker, WorkerPool
+
+# Packages imported by every worker before it serves requests; missing ones are skipped
+DEFAULT_PRELOAD = ("numpy", "pandas", "scipy", "sklearn", "matplotlib")
+
+# Extra seconds the client waits for a worker beyond the run timeout
+WORKER_GRACE = 10.0
+
+# Seconds a new worker may take to import its preloads
+STARTUP_TIMEOUT = 60.0
+
+
+def python_pool_supported() -> bool:
+    """Checks whether the platform can run fork-based workers"""
+    return hasattr(os, "fork") and os.name == "posix"
+
+
+# ---------------------------------------------------------------------------
+# Worker side (runs inside the warm process)
+# ---------------------------------------------------------------------------
+
+def _run_candidate(path: str) -> int:
+    """Runs a script as __main__ inside the forked child and returns its exit code"""
+    import random
+    import runpy
+    import traceback
+
+    sys.stdin = open(os.devnull)
+    sys.argv = [path]
+    sys.path[0] = os.path.dirname(os.path.abspath(path))
+    # Forked children inherit the parent's random state; reseed like a fresh interpreter
+    random.seed()
+    if "numpy" in sys.modules:
+        sys.modules["numpy"].random.seed()
+
+    try:
+        runpy.run_path(path, run_name="__main__")
+        code = 0
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        # Hide the runpy frames so the traceback matches `python path`
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != path:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    return code
+
+
+def _exit_code(wait_status: int) -> int:
+    """Exit code of a waitpid() status, minus the signal number when killed"""
+    # os.waitstatus_to_exitcode needs Python 3.9
+    if os.WIFSIGNALED(wait_status):
+        return -os.WTERMSIG(wait_status)
+    return os.WEXITSTATUS(wait_status)
+
+
+def _fork_and_run(path: str, timeout: float, expected_output: Optional[str] = None) -> dict:
+    """Runs one candidate in a forked child, enforcing the timeout and the expected output"""
+    out_read, out_write = os.pipe()
+    err_read, err_write = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            # Own process group, so a timeout also kills anything it spawned
+            os.setsid()
+            # fd 0 is the request channel; the candidate must never read it
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.dup2(out_write, 1)
+            os.dup2(err_write, 2)
+            for fd in (out_read, out_write, err_read, err_write):
+                os.close(fd)
+            code = _run_candidate(path)
+        finally:
+            os._exit(code)
+
+    os.close(out_write)
+    os.close(err_write)
+    monitor = OutputMonitor(expected_output)
+    deadline = time.monotonic() + timeout
+    try:
+        status = pump(out_read, err_read, monitor, deadline)
+    finally:
+        os.close(out_read)
+        os.close(err_read)
+
+    if status != "eof":
+        kill_group(pid)
+        _, wait_status = os.waitpid(pid, 0)
+    else:
+        # The pipes closed; the child itself may still be exiting
+        while True:
+            finished, wait_status = os.waitpid(pid, os.WNOHANG)
+            if finished:
+                break
+            if time.monotonic() > deadline:
+                status = "timeout"
+                kill_group(pid)
+                _, wait_status = os.waitpid(pid, 0)
+                break
+            time.sleep(0.005)
+
+    result = monitor.result(_exit_code(wait_status), timed_out=status == "timeout")
+    return asdict(result)
+
+
+def serve(preload: Sequence[str]) -> None:
+    """Worker main loop: reads JSON requests from stdin and answers on stdout"""
+    import importlib
+
+    # Keep a private channel for answers; stray prints go to stderr
+    channel = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+    if "matplotlib" in sys.modules:
+        # Generated scripts must never open a window from a worker
+        sys.modules["matplotlib"].use("Agg")
+
+    channel.write(json.dumps({"ready": True}) + "\n")
+    for line in sys.stdin:
+        request = json.loads(line)
+        result = _fork_and_run(request["path"], request["timeout"], request.get("expected_output"))
+        channel.write(json.dumps(result) + "\n")
+
+
+# ---------------------------------------------------------------------------
+# Client side
+# ---------------------------------------------------------------------------
+
+class PythonWorker(Worker):
+    """Handle to one warm Python worker process"""
+
+    name = "Python"
+    startup_timeout = STARTUP_TIMEOUT
+
+    def __init__(self, preload: Sequence[str], python: str):
+        super().__init__([python, "-u", os.path.abspath(__file__), "--preload", ",".join(preload)])
+
+    def wait_ready(self, timeout: float) -> bool:
+        # The first answer tells that the preloads are done
+        return self.readline(timeout) is not None
+
+    def run(self, path: str, timeout: float, mode: str = "run", expected_output: Optional[str] = None) -> RunResult:
+        # Syntax checks need no worker: compile() in the caller is cheaper
+        request = json.dumps({"path": os.path.abspath(path), "timeout": timeout, "expected_output": expected_output})
+        answer = self.readline(timeout + WORKER_GRACE) if self.send(request) else None
+        if answer is None:
+            self.broken = True
+            return RunResult("", "Python worker stopped responding", 1)
+        self.runs += 1
+        return RunResult(**json.loads(answer))
+
+
+class PythonWorkerPool(WorkerPool):
+    """
+    Pool of warm Python workers.
+
+    Attributes:
+        size: Maximum number of workers
+        preload: Packages imported by each worker at startup
+        max_runs: Runs served by a worker before it is recycled
+        python: Interpreter used for the workers
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        preload: Sequence[str] = DEFAULT_PRELOAD,
+        max_runs: int = 50,
+        python: Optional[str] = None
+    ):
+        super().__init__(size, max_runs)
+        self.preload = tuple(preload)
+        self.python = python or sys.executable
+
+    def new_worker(self) -> PythonWorker:
+        return PythonWorker(self.preload, self.python)
+
+
+_pool: Optional[PythonWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_python_pool() -> PythonWorkerPool:
+    """Returns the process-wide Python worker pool, creating it with defaults on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PythonWorkerPool()
+        return _pool
+
+
+def configure_python_pool(**kwargs) -> PythonWorkerPool:
+    """Replaces the process-wide Python worker pool (see PythonWorkerPool)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = PythonWorkerPool(**kwargs)
+        return _pool
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Warm Python worker (internal).")
+    parser.add_argument("--preload", default="", help="Comma-separated packages to import at startup.")
+    args = parser.parse_args()
+    serve([name for name in args.preload.split(",") if name])
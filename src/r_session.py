@@ -0,0 +1,271 @@
+"""
+Persistent R sessions for R and Rcpp candidates.
+
+Running every attempt with `Rscript` reloads tidyverse/ggplot2 each time,
+and the old Rcpp path only compiled the code with `R CMD SHLIB`. An RSession
+is a long-lived R process with the common packages already attached that
+evaluates each candidate in a fresh environment:
+
+- R files are sourced with top-level values printed, as Rscript does.
+- Rcpp files are compiled with Rcpp::sourceCpp into a cache keyed by the
+  source hash, so an unchanged candidate is never rebuilt, and then run:
+  embedded `/*** R */` blocks are evaluated, otherwise every exported
+  function taking no arguments is called and its visible result printed.
+  rcpp_command() runs them the same way in a cold Rscript process.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from worker_pool import CaptureWorker, WorkerPool
+
+# Packages attached by every session before it accepts candidates; missing ones are skipped
+DEFAULT_PRELOAD = ("stats", "utils", "methods", "ggplot2", "dplyr", "tidyr", "readr", "Rcpp")
+
+# Compiled Rcpp candidates, one source file and shared library per source hash
+RCPP_CACHE_DIR = Path("output") / "cache" / "rcpp"
+
+# Compiles and runs an Rcpp candidate, in a session or a cold Rscript alike:
+# embedded R blocks run through sourceCpp, otherwise every exported function
+# taking no arguments is called
+RCPP_RUNNER = r'''
+run_rcpp <- function(path, env, cache_dir) {
+  Rcpp::sourceCpp(path, env = env, cacheDir = cache_dir, echo = FALSE)
+  if (!any(grepl("^\\s*/\\*{3}\\s*R", readLines(path, warn = FALSE)))) {
+    for (name in ls(env)) {
+      fn <- get(name, envir = env)
+      if (is.function(fn) && length(formals(fn)) == 0) {
+        result <- withVisible(fn())
+        if (result$visible && !is.null(result$value)) print(result$value)
+      }
+    }
+  }
+}
+'''
+
+# Session loop (see CaptureWorker for the protocol). Requests are
+# "mode<TAB>path<TAB>stdout file<TAB>stderr file<TAB>timeout<TAB>cache dir"
+# lines; the time limit is enforced inside R with setTimeLimit, and quit()
+# is shadowed in each candidate environment so it ends only the candidate.
+SERVER_SOURCE = RCPP_RUNNER + r'''
+for (pkg in commandArgs(trailingOnly = TRUE)) {
+  try(suppressPackageStartupMessages(library(pkg, character.only = TRUE)), silent = TRUE)
+}
+
+candidate_exit <- function(save = "default", status = 0, runLast = TRUE) {
+  stop(structure(class = c("candidateExit", "condition"),
+                 list(message = "quit", call = NULL, status = status)))
+}
+
+run_candidate <- function(mode, path, out_path, err_path, timeout, cache_dir) {
+  out <- file(out_path, open = "wt")
+  err <- file(err_path, open = "wt")
+  wd <- getwd()
+  saved_options <- options()
+  sink(out)
+  sink(err, type = "message")
+  on.exit({
+    sink(type = "message")
+    sink()
+    close(out)
+    close(err)
+    setwd(wd)
+    options(saved_options)
+    grDevices::graphics.off()
+  })
+
+  env <- new.env(parent = globalenv())
+  env$quit <- candidate_exit
+  env$q <- candidate_exit
+  if (exists(".Random.seed", envir = globalenv())) rm(".Random.seed", envir = globalenv())
+
+  timed_out <- FALSE
+  setTimeLimit(elapsed = timeout, transient = TRUE)
+  status <- tryCatch(
+    withCallingHandlers(
+      {
+        if (mode == "parse") invisible(parse(path))
+        else if (mode == "rcpp") run_rcpp(path, env, cache_dir)
+        else source(path, local = env, print.eval = TRUE)
+        0L
+      },
+      warning = function(w) {
+        message("Warning message:\n", conditionMessage(w))
+        invokeRestart("muffleWarning")
+      }
+    ),
+    candidateExit = function(e) as.integer(e$status),
+    error = function(e) {
+      if (grepl("elapsed time limit", conditionMessage(e), fixed = TRUE)) timed_out <<- TRUE
+      call <- conditionCall(e)
+      message("Error", if (is.null(call)) "" else paste0(" in ", deparse(call)[1]),
+              ": ", conditionMessage(e))
+      message("Execution halted")
+      1L
+    }
+  )
+  setTimeLimit(elapsed = Inf)
+  c(status, timed_out)
+}
+
+cat("DSCODER_READY\n")
+flush(stdout())
+input <- file("stdin")
+open(input)
+while (length(line <- readLines(input, n = 1)) > 0) {
+  if (!nzchar(line)) next
+  fields <- strsplit(line, "\t", fixed = TRUE)[[1]]
+  result <- run_candidate(fields[1], fields[2], fields[3], fields[4], as.numeric(fields[5]), fields[6])
+  cat("DSCODER_RESULT", result[1], if (result[2]) "timeout" else "", "\n")
+  flush(stdout())
+}
+'''
+
+
+def r_session_supported(rscript: str = "Rscript") -> bool:
+    """Checks whether R is installed and the platform supports the pipe protocol"""
+    return os.name == "posix" and shutil.which(rscript) is not None
+
+
+def server_script(cache_dir: Path = RCPP_CACHE_DIR) -> str:
+    """
+    Writes the session script into the cache directory and returns its path.
+
+    The script is kept next to the Rcpp builds rather than in the shared
+    temp directory, and rewritten whenever the file found there differs
+    from SERVER_SOURCE, so only this code is ever run as the session.
+    """
+    source = SERVER_SOURCE.encode("utf-8")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = (cache_dir / f"dscoder_r_server_{hashlib.sha256(source).hexdigest()[:12]}.R").resolve()
+    try:
+        with open(path, "rb") as f:
+            if f.read() == source:
+                return str(path)
+    except OSError:
+        pass
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".R")
+    with os.fdopen(fd, "wb") as f:
+        f.write(source)
+    os.replace(tmp_path, path)
+    return str(path)
+
+
+def cached_rcpp_source(path: str, cache_dir: Path = RCPP_CACHE_DIR) -> str:
+    """
+    Copies an Rcpp source to a path derived from its content hash.
+
+    sourceCpp reuses a build only when the same file is compiled again, and
+    every attempt is saved under a new name; the stable copy lets identical
+    candidates (across attempts, jobs and sessions) share one build.
+
+    Returns:
+        str: Absolute path of the copy
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    target = (cache_dir / f"rcpp_{hashlib.sha256(source).hexdigest()[:16]}.cpp").resolve()
+    if not target.exists():
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".cpp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        os.replace(tmp_path, target)
+    return str(target)
+
+
+def rcpp_build_dir(cache_dir: Path = RCPP_CACHE_DIR) -> str:
+    """Creates the sourceCpp cacheDir of the Rcpp build cache and returns its absolute path"""
+    build_dir = cache_dir / "build"
+    build_dir.mkdir(parents=True, exist_ok=True)
+    return str(build_dir.resolve())
+
+
+def rcpp_command(path: str, rscript: str = "Rscript", cache_dir: Path = RCPP_CACHE_DIR) -> List[str]:
+    """
+    Command running an Rcpp candidate in a fresh R process the way RSession does.
+
+    The build cache is shared with the sessions, so the same candidate is
+    compiled once and prints the same output on either executor.
+    """
+    source = cached_rcpp_source(path, cache_dir)
+    call = f"run_rcpp({json.dumps(source)}, new.env(), {json.dumps(rcpp_build_dir(cache_dir))})"
+    return [rscript, "-e", RCPP_RUNNER + call]
+
+
+class RSession(CaptureWorker):
+    """Handle to one long-lived R process"""
+
+    name = "R"
+    startup_timeout = 300.0
+    # setTimeLimit stops R code itself; the grace covers code stuck in C
+    grace = 5.0
+
+    def __init__(self, rscript: str, preload: Sequence[str], cache_dir: Path):
+        self.cache_dir = cache_dir
+        super().__init__([rscript, server_script(cache_dir)] + list(preload))
+
+    def request_line(self, mode: str, path: str, out_path: str, err_path: str, timeout: float) -> str:
+        if mode == "run":
+            mode = "r"
+        if mode == "r" and path.lower().endswith(".cpp"):
+            mode = "rcpp"
+            path = cached_rcpp_source(path, self.cache_dir)
+        return "\t".join([mode, path, out_path, err_path, str(timeout), rcpp_build_dir(self.cache_dir)])
+
+
+class RSessionPool(WorkerPool):
+    """
+    Pool of persistent R sessions.
+
+    Attributes:
+        size: Maximum number of sessions
+        preload: Packages attached by each session at startup
+        max_runs: Candidates evaluated by a session before it is recycled
+        rscript: Rscript executable
+        cache_dir: Directory of the Rcpp build cache
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        preload: Sequence[str] = DEFAULT_PRELOAD,
+        max_runs: int = 50,
+        rscript: str = "Rscript",
+        cache_dir: Path = RCPP_CACHE_DIR
+    ):
+        super().__init__(size, max_runs)
+        self.preload = tuple(preload)
+        self.rscript = rscript
+        self.cache_dir = Path(cache_dir)
+
+    def new_worker(self) -> RSession:
+        return RSession(self.rscript, self.preload, self.cache_dir)
+
+
+_pool: Optional[RSessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_r_pool() -> RSessionPool:
+    """Returns the process-wide R session pool, creating it with defaults on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RSessionPool()
+        return _pool
+
+
+def configure_r_pool(**kwargs) -> RSessionPool:
+    """Replaces the process-wide R session pool (see RSessionPool)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = RSessionPool(**kwargs)
+        return _pool
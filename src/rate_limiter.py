@@ -0,0 +1,266 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from deadline import Deadline, DeadlineExceeded
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously up to a per-minute rate.
+
+    reserve() takes the amount right away, letting the balance go negative,
+    and returns how long the caller must wait for the deficit to refill. This
+    keeps callers in arrival order without a second pass through the lock.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Takes amount from the bucket and returns the wait in seconds"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A single request larger than the bucket could never be served otherwise
+        self.tokens -= min(amount, self.capacity)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+@dataclass
+class ProviderState:
+    """Rate limit buckets and scheduling statistics of one provider"""
+    requests: Optional[TokenBucket] = None
+    tokens: Optional[TokenBucket] = None
+    paused_until: float = 0.0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    calls: int = 0
+    throttled: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Checks whether an SDK exception is an HTTP 429 response"""
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Reads the server-requested delay in seconds from a rate limit error, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class RateLimitScheduler:
+    """
+    Per-provider request scheduler enforcing requests-per-minute and
+    tokens-per-minute budgets.
+
+    Callers reserve capacity before each request and wait until their share
+    is available. When a provider still answers 429, the provider is paused
+    for the Retry-After delay (or a jittered exponential backoff) and the
+    request is retried, without involving the caller's attempt budget.
+
+    Attributes:
+        max_retries: Rate-limited retries before the error is raised
+        base_delay: First backoff delay in seconds
+        max_delay: Upper bound of a single backoff delay in seconds
+    """
+
+    def __init__(self, max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._states: Dict[str, ProviderState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, provider: str) -> ProviderState:
+        if provider not in self._states:
+            self._states[provider] = ProviderState()
+        return self._states[provider]
+
+    def set_limits(
+        self,
+        provider: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None
+    ) -> None:
+        """Sets (or clears, with None) the budgets of a provider"""
+        with self._lock:
+            state = self._state(provider)
+            state.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+            state.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def _enter(self, provider: str, tokens: int) -> float:
+        """Reserves capacity for one request and returns how long to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(provider)
+            wait = max(0.0, state.paused_until - now)
+            if state.requests is not None:
+                wait = max(wait, state.requests.reserve(1, now))
+            if state.tokens is not None:
+                wait = max(wait, state.tokens.reserve(tokens, now))
+            state.calls += 1
+            state.total_wait += wait
+            state.max_wait = max(state.max_wait, wait)
+            if wait > 0:
+                state.queue_depth += 1
+                state.max_queue_depth = max(state.max_queue_depth, state.queue_depth)
+            return wait
+
+    def _leave_queue(self, provider: str) -> None:
+        with self._lock:
+            self._state(provider).queue_depth -= 1
+
+    def _backoff(self, provider: str, error: Exception, retry: int) -> bool:
+        """Pauses the provider after a 429; returns False when the error must be raised"""
+        if not is_rate_limit_error(error) or retry >= self.max_retries:
+            return False
+        # Full jitter spreads retries of concurrent callers; Retry-After is a floor
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        requested = retry_after(error)
+        if requested is not None:
+            delay = max(delay, requested)
+        with self._lock:
+            state = self._state(provider)
+            state.throttled += 1
+            state.paused_until = max(state.paused_until, time.monotonic() + delay)
+        return True
+
+    def _check_wait(self, provider: str, wait: float, deadline: Optional[Deadline]) -> None:
+        """Gives up right away when the wait would outlast the caller's deadline"""
+        if deadline is not None and wait >= deadline.remaining():
+            if wait > 0:
+                self._leave_queue(provider)
+            raise DeadlineExceeded(f"Rate limit wait of {wait:.1f}s for {provider} exceeds the deadline")
+
+    def call(
+        self,
+        provider: str,
+        tokens: int,
+        request: Callable[[], T],
+        deadline: Optional[Deadline] = None
+    ) -> T:
+        """
+        Runs a request within the provider's budget, retrying rate-limited ones.
+
+        With a deadline, raises DeadlineExceeded instead of queueing or backing
+        off past it.
+        """
+        retry = 0
+        while True:
+            wait = self._enter(provider, tokens)
+            self._check_wait(provider, wait, deadline)
+            if wait > 0:
+                try:
+                    time.sleep(wait)
+                finally:
+                    self._leave_queue(provider)
+            try:
+                return request()
+            except Exception as e:
+                if not self._backoff(provider, e, retry):
+                    raise
+                retry += 1
+
+    async def acall(
+        self,
+        provider: str,
+        tokens: int,
+        request: Callable[[], Awaitable[T]],
+        deadline: Optional[Deadline] = None
+    ) -> T:
+        """asyncio twin of call()"""
+        # Imported here: asyncio is only loaded by the asyncio entry points
+        import asyncio
+
+        retry = 0
+        while True:
+            wait = self._enter(provider, tokens)
+            self._check_wait(provider, wait, deadline)
+            if wait > 0:
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self._leave_queue(provider)
+            try:
+                return await request()
+            except Exception as e:
+                if not self._backoff(provider, e, retry):
+                    raise
+                retry += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns per-provider scheduling statistics: current and peak queue
+        depth, number of requests and 429s, and total/average/max wait in
+        seconds. Sustained queueing means the worker pool outruns the limits.
+        """
+        with self._lock:
+            return {
+                provider: {
+                    "queue_depth": state.queue_depth,
+                    "max_queue_depth": state.max_queue_depth,
+                    "requests": state.calls,
+                    "throttled": state.throttled,
+                    "total_wait": round(state.total_wait, 3),
+                    "avg_wait": round(state.total_wait / state.calls, 3) if state.calls else 0.0,
+                    "max_wait": round(state.max_wait, 3),
+                }
+                for provider, state in self._states.items()
+            }
+
+
+_scheduler: Optional[RateLimitScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_rate_limit_scheduler() -> RateLimitScheduler:
+    """Returns the process-wide scheduler shared by every LLMClient"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RateLimitScheduler()
+        return _scheduler
+
+
+def configure_rate_limits(
+    provider: str,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None
+) -> RateLimitScheduler:
+    """Sets the process-wide budgets of a provider"""
+    scheduler = get_rate_limit_scheduler()
+    scheduler.set_limits(provider, requests_per_minute, tokens_per_minute)
+    return scheduler
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from llm_providers import LLMResponse
+
+
+class ResponseCache:
+    """
+    Content-addressed, SQLite-backed cache of LLM responses.
+
+    Entries are keyed on a hash of everything that determines a completion
+    (provider, model, full message list, max_tokens and temperature) and are
+    evicted least-recently-used first once the store exceeds its entry or
+    size budget. Entries older than ``max_age`` seconds are never served.
+
+    Attributes:
+        path: Location of the SQLite database file
+        max_entries: Maximum number of stored responses
+        max_bytes: Maximum total size of stored response contents
+        max_age: Maximum age of an entry in seconds (None disables expiry)
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_entries: int = 10000,
+        max_bytes: int = 200 * 1024 * 1024,
+        max_age: Optional[float] = 30 * 24 * 3600
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                tokens_used INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        structured: bool = False
+    ) -> str:
+        """Builds the cache key for a completion request"""
+        request = {
+            "provider": provider,
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        if structured:
+            # Kept out of plain requests so their existing keys stay valid
+            request["structured"] = True
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[LLMResponse]:
+        """Returns the cached response for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT provider, model, content, tokens_used, created_at FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            provider, model, content, tokens_used, created_at = row
+            if self.max_age is not None and now - created_at > self.max_age:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+
+        return LLMResponse(
+            content=content,
+            tokens_used=tokens_used,
+            model=model,
+            provider=provider,
+            cached=True
+        )
+
+    def put(self, key: str, response: LLMResponse) -> None:
+        """Stores a response and evicts entries beyond the configured budget"""
+        now = time.time()
+        size = len(response.content.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response.provider, response.model, response.content,
+                 response.tokens_used, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drops expired entries, then least recently used ones until within budget"""
+        if self.max_age is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.max_age,)
+            )
+
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ).fetchall()
+        stale = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self) -> None:
+        """Removes every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
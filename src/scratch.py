@@ -0,0 +1,52 @@
+"""
+Memory-backed scratch files for candidates.
+
+Every attempt used to be written to output/temp and failed attempts were
+never removed. Candidates are now written to a RAM-backed directory
+(/dev/shm where available, the system temp directory otherwise) and removed
+as soon as they have been validated and run, whatever the outcome.
+
+A path is kept rather than piping the source over stdin: the warm executors,
+the validation stage and the C++ binary cache all address candidates by
+path, and a file in /dev/shm costs no disk I/O either.
+"""
+import functools
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+SHM_DIR = "/dev/shm"
+
+
+@functools.lru_cache(maxsize=None)
+def scratch_dir() -> str:
+    """Returns /dev/shm when it is a writable directory, else the system temp directory"""
+    if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK | os.X_OK):
+        return SHM_DIR
+    return tempfile.gettempdir()
+
+
+@contextmanager
+def scratch_file(content: str, suffix: str, directory: Optional[str] = None) -> Iterator[str]:
+    """
+    Writes content to a private scratch file and removes it on exit.
+
+    Args:
+        content (str): File content
+        suffix (str): File name suffix, e.g. ".py"
+        directory (Optional[str]): Directory of the file; scratch_dir() when None
+
+    Yields:
+        str: Path of the file
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="dscoder_", dir=directory or scratch_dir())
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        yield path
+    finally:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
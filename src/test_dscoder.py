@@ -1,7 +1,42 @@
 from dscoder import dscoder
+import asyncio
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+import time
 import unittest
-from unittest.mock import patch, MagicMock
-from dscoder import dscoder, AIAgent, LLMClient, ErrorHandler, MetricsCollector, LLMResponse
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
+from dscoder import dscoder, AIAgent, LLMClient, ErrorHandler, MetricsCollector, LLMResponse, CodeFenceWatcher, parse_contender
+from response_cache import ResponseCache
+from async_agent import AsyncAIAgent, adscoder
+from batch import BatchRunner, job_id
+import bench_startup
+from client_pool import ClientPool
+from rate_limiter import RateLimitScheduler, TokenBucket
+from conversation import ConversationContext, trim_error
+from prompts import build_system_prompt
+from llm_providers import AnthropicProvider, LLMProvider, OpenAIProvider, parse_delivery
+from python_pool import PythonWorkerPool, _exit_code, python_pool_supported
+from julia_server import JuliaServerPool, julia_server_supported, most_used_packages
+from dscoder import warm_pool, REPEAT_HINT, REPEAT_TEMPERATURE, CANDIDATE_TEMPERATURE
+from r_session import RSessionPool, SERVER_SOURCE, cached_rcpp_source, r_session_supported, rcpp_command, server_script
+from worker_pool import CaptureWorker, WorkerPool
+from cpp_build import CppEngine, cpp_compiler_available
+from validation import validate_candidate
+from deadline import Deadline, DeadlineExceeded, step_timeout
+from scratch import scratch_dir, scratch_file
+from execution_cache import ExecutionCache, ExecutionOutcome
+from output_stream import PrefixMatcher, RingBuffer, run_process
+from environments import DependencyError, EnvironmentManager, extract_dependencies
+from local_repair import classify_error, local_repair
+from error_digest import digest_error, summarize_error
+from edits import EditError, apply_edits, parse_edits
 
 code = dscoder(
     description="""
@@ -16,24 +51,40 @@ code = dscoder(
     """,
     language="r",
     provider="openai",
-    model="gpt-4o-mini"
+    model="gpt-4o-mini",
+    use_cache=False
 )
 
 
 print(code)
 
+
+def setUpModule():
+    # Agents write logs and caches under ./output; keep them out of the source tree
+    global _workdir, _previous_cwd
+    _workdir = tempfile.TemporaryDirectory()
+    _previous_cwd = os.getcwd()
+    os.chdir(_workdir.name)
+
+
+def tearDownModule():
+    os.chdir(_previous_cwd)
+    _workdir.cleanup()
+
 class TestDSCoder(unittest.TestCase):
 
     @patch('dscoder.LLMClient')
     def test_dscoder_success(self, MockLLMClient):
         mock_client = MockLLMClient.return_value
         mock_response = LLMResponse(
-            content="```r\nprint('Hello, world!')\n```",
+            content="```r\ngreet <- function() print('Hello, world!')\ngreet()\n```",
             tokens_used=10,
             model="gpt-4",
             provider="openai"
         )
         mock_client.generate_completion.return_value = mock_response
+        # Completions are streamed by default
+        mock_client.stream_completion.return_value = mock_response
 
         code = dscoder(
             description="Print 'Hello, world!' in R",
@@ -48,6 +99,7 @@ class TestDSCoder(unittest.TestCase):
     def test_dscoder_failure(self, MockLLMClient):
         mock_client = MockLLMClient.return_value
         mock_client.generate_completion.side_effect = Exception("API error")
+        mock_client.stream_completion.side_effect = Exception("API error")
 
         with self.assertRaises(RuntimeError):
             dscoder(
@@ -77,12 +129,14 @@ class TestDSCoder(unittest.TestCase):
     def test_ai_agent_generate_code(self, MockLLMClient):
         mock_client = MockLLMClient.return_value
         mock_response = LLMResponse(
-            content="```r\nprint('Hello, world!')\n```",
+            content="```r\ngreet <- function() print('Hello, world!')\ngreet()\n```",
             tokens_used=10,
             model="gpt-4",
             provider="openai"
         )
         mock_client.generate_completion.return_value = mock_response
+        # Completions are streamed by default
+        mock_client.stream_completion.return_value = mock_response
 
         agent = AIAgent(provider="openai", trace=False)
         code = agent.generate_code(
@@ -96,6 +150,7 @@ class TestDSCoder(unittest.TestCase):
     def test_ai_agent_generate_code_failure(self, MockLLMClient):
         mock_client = MockLLMClient.return_value
         mock_client.generate_completion.side_effect = Exception("API error")
+        mock_client.stream_completion.side_effect = Exception("API error")
 
         agent = AIAgent(provider="openai", trace=False)
         code = agent.generate_code(
@@ -105,5 +160,1358 @@ class TestDSCoder(unittest.TestCase):
 
         self.assertIsNone(code)
 
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "responses.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _response(self, content):
+        return LLMResponse(content=content, tokens_used=10, model="m", provider="openai")
+
+    def test_roundtrip(self):
+        cache = ResponseCache(self.path)
+        key = ResponseCache.make_key("openai", "m", [{"role": "user", "content": "hi"}], 100, 0)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, self._response("hello"))
+        hit = cache.get(key)
+        self.assertTrue(hit.cached)
+        self.assertEqual(hit.content, "hello")
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(self.path, max_entries=2)
+        cache.put("a", self._response("a"))
+        cache.put("b", self._response("b"))
+        cache.get("a")
+        cache.put("c", self._response("c"))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+
+    def test_expired_entries_are_not_served(self):
+        cache = ResponseCache(self.path, max_age=-1)
+        cache.put("a", self._response("a"))
+        self.assertIsNone(cache.get("a"))
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test"})
+    def test_llm_client_serves_hits(self):
+        client = LLMClient("openrouter", cache=ResponseCache(self.path))
+        client.current_provider.generate_completion = MagicMock(return_value=self._response("x"))
+        messages = [{"role": "user", "content": "hi"}]
+
+        first = client.generate_completion(messages, max_tokens=100, temperature=0)
+        second = client.generate_completion(messages, max_tokens=100, temperature=0)
+
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(client.current_provider.generate_completion.call_count, 1)
+
+class TestStreaming(unittest.TestCase):
+
+    def test_code_fence_watcher(self):
+        agent_extract = lambda text: "print(1)" if text.count("```") >= 2 else None
+        watcher = CodeFenceWatcher(agent_extract)
+        self.assertFalse(watcher("Here it is:\n``"))
+        self.assertFalse(watcher("Here it is:\n```python\nprint(1)\n`"))
+        self.assertTrue(watcher("Here it is:\n```python\nprint(1)\n```"))
+        self.assertEqual(watcher.code, "print(1)")
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test"})
+    def test_stream_stops_after_code_block(self):
+        closed = []
+
+        def fake_stream(**kwargs):
+            try:
+                for delta in ["```python\nimport math\n", "print(math.pi)\n```", "\nExplanation", " text"]:
+                    yield LLMResponse(content=delta, tokens_used=0, model="m", provider="openrouter")
+            finally:
+                closed.append(True)
+
+        client = LLMClient("openrouter")
+        client.current_provider.stream_completion = fake_stream
+        received = []
+        response = client.stream_completion(
+            [{"role": "user", "content": "hi"}],
+            stop_when=lambda text: received.append(text) or text.endswith("```")
+        )
+
+        self.assertEqual(response.content, "```python\nimport math\nprint(math.pi)\n```")
+        self.assertEqual(len(received), 2)
+        self.assertEqual(closed, [True])
+        self.assertGreater(response.tokens_used, 0)
+
+class TestAsyncAgent(unittest.TestCase):
+
+    @patch('async_agent.AsyncLLMClient')
+    def test_adscoder_success(self, MockAsyncLLMClient):
+        mock_client = MockAsyncLLMClient.return_value
+        mock_client.stream_completion = AsyncMock(return_value=LLMResponse(
+            content="```python\nimport sys\nprint('hello')\n```",
+            tokens_used=10,
+            model="gpt-4",
+            provider="openai"
+        ))
+
+        code = asyncio.run(adscoder(
+            description="Print hello",
+            language="python",
+            provider="openai",
+            expected_output="hello"
+        ))
+
+        self.assertIn("print('hello')", code)
+        mock_client.stream_completion.assert_awaited_once()
+
+    @patch('async_agent.AsyncLLMClient')
+    def test_execute_code_reports_errors(self, MockAsyncLLMClient):
+        agent = AsyncAIAgent(provider="openai")
+        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+            f.write("import sys\nsys.exit('boom')\n")
+        try:
+            result, error = asyncio.run(agent.execute_code(f.name, "python"))
+        finally:
+            os.remove(f.name)
+
+        self.assertEqual(result, "")
+        self.assertIn("boom", error)
+
+class TestBatchRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.jobs = os.path.join(self.tmp.name, "jobs.jsonl")
+        self.output = os.path.join(self.tmp.name, "results.jsonl")
+        self.checkpoint = os.path.join(self.tmp.name, "results.checkpoint")
+        with open(self.jobs, "w") as f:
+            f.write('{"id": "a", "description": "first"}\n')
+            f.write('\n')
+            f.write('{"description": "second", "language": "r", "model": null}\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @patch('batch.LLMClient')
+    @patch('batch.AIAgent')
+    def test_run_and_resume(self, MockAIAgent, MockLLMClient):
+        agent = MockAIAgent.return_value
+        agent.generate_code.return_value = "print(1)"
+        agent.metrics_collector = MetricsCollector()
+        agent.metrics_collector.update_metrics(10, True)
+
+        runner = BatchRunner(workers=2, use_cache=False)
+        with open(self.checkpoint, "w") as f:
+            f.write("a\n")
+        summary = runner.run(self.jobs, self.output, self.checkpoint)
+
+        self.assertEqual(summary, {"succeeded": 1, "failed": 0, "skipped": 1})
+        self.assertEqual(agent.generate_code.call_count, 1)
+        self.assertEqual(agent.generate_code.call_args.kwargs["language"], "r")
+        self.assertEqual(agent.generate_code.call_args.kwargs["timeout"], 120.0)
+        with open(self.output) as f:
+            results = [json.loads(line) for line in f]
+        self.assertEqual(results[0]["id"], job_id({"description": "second", "language": "r", "model": None}))
+        self.assertTrue(results[0]["success"])
+
+        summary = runner.run(self.jobs, self.output, self.checkpoint)
+        self.assertEqual(summary, {"succeeded": 0, "failed": 0, "skipped": 2})
+        self.assertEqual(MockLLMClient.call_count, 1)
+
+    @patch('batch.warm_pool')
+    @patch('batch.LLMClient')
+    @patch('batch.AIAgent')
+    def test_warm_pools_grow_to_the_job_threads(self, MockAIAgent, MockLLMClient, mock_warm_pool):
+        MockAIAgent.return_value.generate_code.return_value = None
+        MockAIAgent.return_value.metrics_collector = MetricsCollector()
+        pools = {"python": MagicMock(), "r": MagicMock()}
+        mock_warm_pool.side_effect = lambda language: pools["r" if language in ("r", "rcpp") else language]
+        with open(self.jobs, "a") as f:
+            for n in range(3):
+                f.write(json.dumps({"description": f"rcpp {n}", "language": "rcpp"}) + "\n")
+        BatchRunner(workers=3, use_cache=False).run(self.jobs, self.output, self.checkpoint)
+        pools["python"].grow.assert_called_once_with(1)
+        pools["r"].grow.assert_called_once_with(3)
+        pools["r"].start.assert_called_once()
+
+    @patch('batch.LLMClient')
+    @patch('batch.AIAgent')
+    def test_agent_options_are_forwarded(self, MockAIAgent, MockLLMClient):
+        runner = BatchRunner(use_cache=False, cpp_profile="bench", dependency_envs=True,
+                             edit_repairs=False, structured_output=False)
+        runner.run_job("x", {"description": "x"})
+        options = MockAIAgent.call_args.kwargs
+        self.assertEqual(
+            (options["cpp_profile"], options["dependency_envs"], options["edit_repairs"], options["structured_output"]),
+            ("bench", True, False, False)
+        )
+
+    def test_null_fields_use_the_defaults(self):
+        runner = BatchRunner(language="julia", timeout=30.0, use_cache=False)
+        settings = runner.settings({"description": "x", "language": None, "timeout": None, "max_attempts": 2})
+        self.assertEqual((settings["language"], settings["timeout"], settings["max_attempts"]), ("julia", 30.0, 2))
+
+    def test_invalid_jobs_are_rejected_before_running(self):
+        runner = BatchRunner(use_cache=False)
+        for record in ['{"description": "x", "language": "cobol"}', '{"description": "x", "timeout": "60"}',
+                       '{"description": "x", "max_attempts": 0}', '["x"]']:
+            with open(self.jobs, "w") as f:
+                f.write(record + "\n")
+            with self.assertRaises(ValueError, msg=record):
+                runner.run(self.jobs, self.output, self.checkpoint)
+
+class TestStartup(unittest.TestCase):
+
+    @patch('dscoder.LLMClient')
+    def test_log_file_is_opened_once_per_process(self, _):
+        with patch.object(logging.root, "handlers", []):
+            AIAgent(provider="openai")
+            handlers = list(logging.root.handlers)
+            AIAgent(provider="openai")
+            self.assertEqual(logging.root.handlers, handlers)
+            for handler in handlers:
+                handler.close()
+
+    def test_no_heavy_imports_at_startup(self):
+        timings = bench_startup.measure_import("dscoder")
+        self.assertIn("dscoder", timings)
+        self.assertEqual(bench_startup.heavy_imports(timings), [])
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test"})
+    def test_providers_are_built_on_demand(self):
+        client = LLMClient("openrouter")
+        self.assertEqual(list(client.providers), ["openrouter"])
+        with self.assertRaises(ValueError):
+            client.switch_provider("unknown")
+
+class TestClientPool(unittest.TestCase):
+
+    def test_clients_are_shared_per_key(self):
+        pool = ClientPool(max_connections=5, timeout=30)
+        first = pool.openai("key", base_url="https://api.deepseek.com")
+        self.assertIs(first, pool.openai("key", base_url="https://api.deepseek.com"))
+        self.assertIsNot(first, pool.openai("key"))
+        self.assertIsNot(first, pool.openai("other", base_url="https://api.deepseek.com"))
+        self.assertEqual(len(pool), 3)
+        # Retries belong to the rate limit scheduler
+        self.assertEqual(first.max_retries, 0)
+        pool.close()
+        self.assertEqual(len(pool), 0)
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test"})
+    def test_llm_clients_reuse_pooled_sdk_client(self):
+        first = LLMClient("openrouter")
+        second = LLMClient("openrouter")
+        self.assertIs(first.current_provider.client, second.current_provider.client)
+
+class FakeStreamingProvider:
+    """Provider double that streams fixed deltas with a delay before each one"""
+
+    supports_n = False
+
+    def __init__(self, name, deltas, delay=0.0):
+        self.name = name
+        self.deltas = deltas
+        self.delay = delay
+        self.default_model = name + "-model"
+        self.closed = False
+
+    def initialize_client(self):
+        pass
+
+    def stream_completion(self, **kwargs):
+        try:
+            for delta in self.deltas:
+                time.sleep(self.delay)
+                yield LLMResponse(content=delta, tokens_used=0, model=self.default_model, provider=self.name)
+        finally:
+            self.closed = True
+
+
+class TestRacing(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {"OPENROUTER_API_KEY": "test"})
+        self.env.start()
+        self.client = LLMClient("openrouter")
+        self.slow = FakeStreamingProvider("openrouter", ["```python\n", "print(1)\n", "```"], delay=0.3)
+        self.fast = FakeStreamingProvider("deepseek", ["```python\nprint(2)\n```"])
+        self.client.providers = {"openrouter": self.slow, "deepseek": self.fast}
+
+    def tearDown(self):
+        self.env.stop()
+
+    def test_parse_contender(self):
+        self.assertEqual(parse_contender("deepseek"), ("deepseek", None))
+        self.assertEqual(
+            parse_contender("openrouter:google/gemini-2.0-pro-exp-02-05:free"),
+            ("openrouter", "google/gemini-2.0-pro-exp-02-05:free")
+        )
+
+    def test_fastest_acceptable_response_wins(self):
+        response, outcome = self.client.race_completion(
+            [{"role": "user", "content": "hi"}],
+            contenders=[("openrouter", None), ("deepseek", None)],
+            accept=lambda text: "print" in text
+        )
+        self.assertIn("print(2)", response.content)
+        self.assertEqual(outcome.winner, "deepseek:deepseek-model")
+        time.sleep(0.5)
+        self.assertTrue(self.slow.closed)
+
+    def test_hedge_is_not_launched_when_primary_is_fast(self):
+        self.slow.delay = 0.0
+        response, outcome = self.client.race_completion(
+            [{"role": "user", "content": "hi"}],
+            contenders=[("openrouter", None), ("deepseek", None)],
+            hedge_delay=5.0
+        )
+        self.assertIn("print(1)", response.content)
+        self.assertEqual(outcome.launched, 1)
+
+    def test_rejected_response_falls_through_to_next_contender(self):
+        self.fast.deltas = ["no code here"]
+        self.slow.delay = 0.0
+        response, outcome = self.client.race_completion(
+            [{"role": "user", "content": "hi"}],
+            contenders=[("deepseek", None), ("openrouter", None)],
+            accept=lambda text: "```" in text,
+            hedge_delay=5.0
+        )
+        self.assertIn("print(1)", response.content)
+        self.assertEqual(outcome.launched, 2)
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("rate limited")
+        self.response = MagicMock(headers={"retry-after": retry_after})
+
+
+class TestRateLimitScheduler(unittest.TestCase):
+
+    def test_token_bucket_reports_wait_for_deficit(self):
+        bucket = TokenBucket(60)
+        now = bucket.updated
+        self.assertEqual(bucket.reserve(60, now), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1, now), 1.0)
+
+    def test_rate_limited_requests_are_retried(self):
+        scheduler = RateLimitScheduler(base_delay=0.01)
+        request = MagicMock(side_effect=[FakeRateLimitError("0.05"), "ok"])
+        start = time.monotonic()
+
+        self.assertEqual(scheduler.call("openai", 10, request), "ok")
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        stats = scheduler.stats()["openai"]
+        self.assertEqual(stats["throttled"], 1)
+        self.assertEqual(stats["requests"], 2)
+
+    def test_other_errors_are_raised(self):
+        scheduler = RateLimitScheduler()
+        request = MagicMock(side_effect=ValueError("boom"))
+        with self.assertRaises(ValueError):
+            scheduler.call("openai", 10, request)
+        self.assertEqual(request.call_count, 1)
+
+    def test_gives_up_after_max_retries(self):
+        scheduler = RateLimitScheduler(max_retries=1, base_delay=0.0)
+        request = MagicMock(side_effect=FakeRateLimitError("0"))
+        with self.assertRaises(FakeRateLimitError):
+            scheduler.call("openai", 10, request)
+        self.assertEqual(request.call_count, 2)
+
+    def test_requests_per_minute_budget_queues_callers(self):
+        scheduler = RateLimitScheduler()
+        scheduler.set_limits("openai", requests_per_minute=600)
+        scheduler._states["openai"].requests.tokens = 0
+        start = time.monotonic()
+        scheduler.call("openai", 10, lambda: None)
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertEqual(scheduler.stats()["openai"]["max_queue_depth"], 1)
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test"})
+    def test_llm_client_retries_without_raising(self):
+        client = LLMClient("openrouter", scheduler=RateLimitScheduler(base_delay=0.0))
+        client.current_provider.generate_completion = MagicMock(side_effect=[
+            FakeRateLimitError("0"),
+            LLMResponse(content="x", tokens_used=1, model="m", provider="openrouter")
+        ])
+        response = client.generate_completion([{"role": "user", "content": "hi"}])
+        self.assertEqual(response.content, "x")
+
+class TestConversationContext(unittest.TestCase):
+
+    def test_first_request_is_system_and_task(self):
+        context = ConversationContext("system")
+        context.start("task", "python")
+        self.assertEqual(context.build_messages(), [
+            {"role": "system", "content": "system"},
+            {"role": "user", "content": "task"},
+        ])
+
+    def test_repair_request_holds_only_latest_code_and_error(self):
+        context = ConversationContext("system")
+        context.start("task", "python")
+        for attempt in range(5):
+            context.record_code(f"print({attempt})")
+            context.record_error(f"Error {attempt}\ndetails")
+
+        messages = context.build_messages()
+        self.assertEqual([m["role"] for m in messages], ["system", "user", "assistant", "user"])
+        self.assertEqual(messages[2]["content"], "```python\nprint(4)\n```")
+        self.assertIn("Error 4\ndetails", messages[3]["content"])
+        self.assertIn("- Error 3", messages[3]["content"])
+        self.assertNotIn("Error 0", messages[3]["content"])
+
+    def test_missing_code_keeps_task_prefix(self):
+        context = ConversationContext("system")
+        context.start("task", "python")
+        context.record_error("Response contains no valid code")
+        messages = context.build_messages()
+        self.assertEqual([m["role"] for m in messages], ["system", "user", "user"])
+        self.assertEqual(messages[1]["content"], "task")
+        self.assertIn("no valid code", messages[2]["content"])
+
+    def test_error_is_trimmed_to_budget(self):
+        context = ConversationContext("system", max_tokens=400, error_tokens=1000)
+        context.start("task", "python")
+        context.record_code("print(1)")
+        context.record_error("\n".join(f"frame {i}" * 5 for i in range(2000)))
+        messages = context.build_messages()
+        self.assertLessEqual(sum(len(m["content"]) for m in messages) // 4, 400)
+        self.assertIn("[... truncated ...]", messages[3]["content"])
+        self.assertIn("frame 1999", messages[3]["content"])
+
+    def test_trim_error_keeps_short_errors(self):
+        self.assertEqual(trim_error("NameError: x", 100), "NameError: x")
+
+    @patch('dscoder.LLMClient')
+    def test_messages_do_not_grow_across_jobs(self, MockLLMClient):
+        mock_client = MockLLMClient.return_value
+        mock_client.stream_completion.return_value = LLMResponse(
+            content="no code", tokens_used=1, model="m", provider="openai"
+        )
+        agent = AIAgent(provider="openai")
+        agent.generate_code("first task", max_attempts=3)
+        agent.generate_code("second task", max_attempts=3)
+        self.assertEqual(len(agent.messages), 3)
+        self.assertIn("second task", agent.messages[1]["content"])
+        self.assertNotIn("first task", "".join(m["content"] for m in agent.messages))
+
+
+class TestPrompts(unittest.TestCase):
+
+    def test_prompt_holds_only_target_language_rules(self):
+        prompt = build_system_prompt("python")
+        self.assertIn("PYTHON REQUIREMENTS", prompt)
+        self.assertNotIn("C++ REQUIREMENTS", prompt)
+        self.assertNotIn("JULIA", prompt)
+        self.assertEqual(prompt, build_system_prompt("python"))
+
+    def test_install_rule_only_with_dependency_environments(self):
+        self.assertNotIn("Never install packages", build_system_prompt("r"))
+        self.assertIn("Never install packages", build_system_prompt("r", dependency_envs=True))
+
+    @patch('dscoder.LLMClient')
+    def test_agent_uses_language_prompt(self, MockLLMClient):
+        MockLLMClient.return_value.stream_completion.return_value = LLMResponse(
+            content="no code", tokens_used=1, model="m", provider="openai"
+        )
+        agent = AIAgent(provider="openai")
+        agent.generate_code("task", language="cpp", max_attempts=1)
+        self.assertEqual(agent.messages[0]["content"], build_system_prompt("cpp"))
+
+    def test_anthropic_sends_system_parameter_with_cache_breakpoints(self):
+        provider = AnthropicProvider()
+        params = provider._message_params([
+            {"role": "system", "content": "rules"},
+            {"role": "user", "content": "task"},
+            {"role": "user", "content": "repair"},
+        ])
+        self.assertEqual(params["system"], [
+            {"type": "text", "text": "rules", "cache_control": {"type": "ephemeral"}}
+        ])
+        self.assertEqual(len(params["messages"]), 1)
+        blocks = params["messages"][0]["content"]
+        self.assertEqual(blocks[0]["cache_control"], {"type": "ephemeral"})
+        self.assertNotIn("cache_control", blocks[1])
+
+@unittest.skipUnless(python_pool_supported(), "fork-based workers need POSIX")
+class TestPythonWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = PythonWorkerPool(size=1, preload=("json",), max_runs=3)
+        self.addCleanup(self.pool.close)
+
+    def script(self, source):
+        f = tempfile.NamedTemporaryFile("w", suffix=".py", delete=False)
+        f.write(source)
+        f.close()
+        self.addCleanup(os.unlink, f.name)
+        return f.name
+
+    def test_captures_output_and_errors(self):
+        result = self.pool.run(self.script("import sys\nprint('out')\nprint('err', file=sys.stderr)\n"))
+        self.assertEqual((result.stdout, result.stderr, result.returncode), ("out\n", "err\n", 0))
+
+        path = self.script("x = 1\nraise ValueError('boom')\n")
+        result = self.pool.run(path)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(f'File "{path}", line 2', result.stderr)
+        self.assertNotIn("runpy", result.stderr)
+
+        self.assertEqual(self.pool.run(self.script("import sys\nsys.exit(3)\n")).returncode, 3)
+
+    def test_exit_code_of_wait_status(self):
+        for action, expected in ((lambda: os._exit(3), 3), (lambda: os.kill(os.getpid(), 9), -9)):
+            pid = os.fork()
+            if pid == 0:
+                action()
+            self.assertEqual(_exit_code(os.waitpid(pid, 0)[1]), expected)
+
+    def test_runs_are_isolated(self):
+        self.pool.run(self.script("import json\njson.leaked = True\n"))
+        result = self.pool.run(self.script("import json\nprint(hasattr(json, 'leaked'))\n"))
+        self.assertEqual(result.stdout, "False\n")
+
+    def test_timeout_kills_the_run(self):
+        start = time.monotonic()
+        result = self.pool.run(self.script("import time\ntime.sleep(10)\n"), timeout=0.5)
+        self.assertTrue(result.timed_out)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(self.pool.run(self.script("print(1)\n")).stdout, "1\n")
+
+    def test_worker_is_recycled_after_max_runs(self):
+        path = self.script("import os\nprint(os.getppid())\n")
+        parents = [self.pool.run(path).stdout for _ in range(4)]
+        self.assertEqual(len(set(parents[:3])), 1)
+        self.assertNotEqual(parents[3], parents[0])
+        self.assertEqual(len(self.pool), 1)
+
+class TestJuliaServer(unittest.TestCase):
+
+    def test_most_used_packages(self):
+        paths = []
+        for source in ["using DataFrames, Statistics\nimport CSV\n", "using DataFrames: DataFrame\nusing Base.Threads\n"]:
+            f = tempfile.NamedTemporaryFile("w", suffix=".jl", delete=False)
+            f.write(source)
+            f.close()
+            self.addCleanup(os.unlink, f.name)
+            paths.append(f.name)
+        packages = most_used_packages(paths)
+        self.assertEqual(packages[0], "DataFrames")
+        self.assertEqual(set(packages), {"DataFrames", "Statistics", "CSV"})
+
+    @patch('dscoder.julia_server_supported', return_value=False)
+    def test_cold_process_without_julia(self, _):
+        self.assertIsNone(warm_pool("julia"))
+        self.assertIsNone(warm_pool("cpp"))
+
+    @unittest.skipUnless(julia_server_supported(), "Julia is not installed")
+    def test_candidates_run_in_fresh_modules(self):
+        pool = JuliaServerPool(preload=())
+        self.addCleanup(pool.close)
+        paths = []
+        for source in ["x = 41\nprintln(x + 1)\n", "println(isdefined(@__MODULE__, :x))\nexit(2)\n"]:
+            f = tempfile.NamedTemporaryFile("w", suffix=".jl", delete=False)
+            f.write(source)
+            f.close()
+            self.addCleanup(os.unlink, f.name)
+            paths.append(f.name)
+        self.assertEqual(pool.run(paths[0]).stdout, "42\n")
+        result = pool.run(paths[1])
+        self.assertEqual((result.stdout, result.returncode), ("false\n", 2))
+        self.assertEqual(len(pool), 1)
+
+ECHO_SERVER = """
+import sys
+print("loading noise")
+print("DSCODER_READY", flush=True)
+for line in sys.stdin:
+    path, out_path, err_path, timeout = line.rstrip("\\n").split("\\t")
+    source = open(path).read()
+    if "hang" in source:
+        import time
+        time.sleep(float(timeout) + 5)
+    open(out_path, "w").write(source.upper())
+    print("stray", file=sys.stderr, flush=True)
+    print("DSCODER_RESULT", 3 if "fail" in source else 0, flush=True)
+"""
+
+
+class EchoServer(CaptureWorker):
+    name = "Echo"
+    startup_timeout = 10.0
+
+    def __init__(self):
+        super().__init__([sys.executable, "-c", ECHO_SERVER])
+
+    def request_line(self, mode, path, out_path, err_path, timeout):
+        return "\t".join([path, out_path, err_path, str(timeout)])
+
+
+class EchoPool(WorkerPool):
+    def new_worker(self):
+        return EchoServer()
+
+
+class SlowServer(EchoServer):
+    def __init__(self):
+        CaptureWorker.__init__(self, [sys.executable, "-c", "import time; time.sleep(30)"])
+
+
+class SlowPool(WorkerPool):
+    def new_worker(self):
+        return SlowServer()
+
+
+class TestCaptureWorker(unittest.TestCase):
+
+    def script(self, source):
+        f = tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False)
+        f.write(source)
+        f.close()
+        self.addCleanup(os.unlink, f.name)
+        return f.name
+
+    def test_protocol_and_stray_stderr(self):
+        pool = EchoPool(size=1, max_runs=10)
+        self.addCleanup(pool.close)
+        result = pool.run(self.script("ok"))
+        self.assertEqual((result.stdout, result.stderr, result.returncode), ("OK", "stray\n", 0))
+        self.assertEqual(pool.run(self.script("fail")).returncode, 3)
+
+    def test_unanswered_run_replaces_the_server(self):
+        pool = EchoPool(size=1, max_runs=10)
+        self.addCleanup(pool.close)
+        first = pool._acquire()
+        self.assertTrue(first.warm_up(10))
+        pool._release(first)
+        self.assertTrue(pool.run(self.script("hang"), timeout=0.3).timed_out)
+        self.assertFalse(first.healthy())
+        self.assertEqual(pool.run(self.script("ok")).stdout, "OK")
+
+    def test_warm_up_counts_against_the_time_limit(self):
+        pool = SlowPool(size=1, max_runs=10)
+        self.addCleanup(pool.close)
+        start = time.monotonic()
+        result = pool.run(self.script("ok"), timeout=0.3)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertTrue(result.timed_out)
+        # Still warming up, so it is kept for later runs
+        self.assertTrue(pool._acquire(0).healthy())
+
+    def test_busy_pool_times_out(self):
+        pool = EchoPool(size=1, max_runs=10)
+        self.addCleanup(pool.close)
+        busy = pool._acquire()
+        self.addCleanup(pool._release, busy)
+        start = time.monotonic()
+        self.assertTrue(pool.run(self.script("ok"), timeout=0.2).timed_out)
+        self.assertLess(time.monotonic() - start, 5)
+
+
+class TestRSession(unittest.TestCase):
+
+    def test_rcpp_cache_path_follows_content(self):
+        cache_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache_dir)
+        paths = []
+        for source in ["int a;", "int a;", "int b;"]:
+            f = tempfile.NamedTemporaryFile("w", suffix=".cpp", delete=False)
+            f.write(source)
+            f.close()
+            self.addCleanup(os.unlink, f.name)
+            paths.append(cached_rcpp_source(f.name, cache_dir))
+        self.assertEqual(paths[0], paths[1])
+        self.assertNotEqual(paths[0], paths[2])
+        with open(paths[2]) as f:
+            self.assertEqual(f.read(), "int b;")
+
+    def test_server_script_is_private_and_checked(self):
+        cache_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache_dir)
+        path = server_script(cache_dir)
+        self.assertEqual(Path(path).parent, cache_dir.resolve())
+        with open(path, "w") as f:
+            f.write("system('echo planted')")
+        self.assertEqual(server_script(cache_dir), path)
+        with open(path) as f:
+            self.assertEqual(f.read(), SERVER_SOURCE)
+
+    def test_cold_rcpp_command_shares_the_session_build(self):
+        cache_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache_dir)
+        f = tempfile.NamedTemporaryFile("w", suffix=".cpp", delete=False)
+        f.write("int a;")
+        f.close()
+        self.addCleanup(os.unlink, f.name)
+        command = rcpp_command(f.name, cache_dir=cache_dir)
+        self.assertEqual(command[:2], ["Rscript", "-e"])
+        self.assertIn("run_rcpp <- function", command[2])
+        self.assertIn(json.dumps(cached_rcpp_source(f.name, cache_dir)), command[2])
+        self.assertIn(json.dumps(str((cache_dir / "build").resolve())), command[2])
+        with patch('dscoder.rcpp_command', return_value=["cmd"]) as cold:
+            self.assertEqual(AIAgent.execution_command(None, f.name, "rcpp"), ["cmd"])
+        cold.assert_called_once_with(f.name)
+
+    @patch('dscoder.r_session_supported', return_value=False)
+    def test_cold_process_without_r(self, _):
+        self.assertIsNone(warm_pool("r"))
+        self.assertIsNone(warm_pool("rcpp"))
+
+    @unittest.skipUnless(r_session_supported(), "R is not installed")
+    def test_candidates_run_in_fresh_environments(self):
+        pool = RSessionPool(preload=())
+        self.addCleanup(pool.close)
+        first = tempfile.NamedTemporaryFile("w", suffix=".R", delete=False)
+        first.write("x <- 41\nx + 1\n")
+        first.close()
+        second = tempfile.NamedTemporaryFile("w", suffix=".R", delete=False)
+        second.write("cat(exists('x', inherits = FALSE))\nquit(status = 2)\n")
+        second.close()
+        self.addCleanup(os.unlink, first.name)
+        self.addCleanup(os.unlink, second.name)
+        self.assertEqual(pool.run(first.name).stdout, "[1] 42\n")
+        result = pool.run(second.name)
+        self.assertEqual((result.stdout, result.returncode), ("FALSE", 2))
+
+@unittest.skipUnless(cpp_compiler_available(), "g++ is not installed")
+class TestCppEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def source(self, code):
+        f = tempfile.NamedTemporaryFile("w", suffix=".cpp", delete=False)
+        f.write(code)
+        f.close()
+        self.addCleanup(os.unlink, f.name)
+        return f.name
+
+    def test_compiles_runs_and_caches(self):
+        engine = CppEngine(cache_dir=self.cache_dir, use_pch=False)
+        path = self.source("#include <iostream>\nint main() { std::cout << 6 * 7 << std::endl; }\n")
+        self.assertEqual(engine.run(path).stdout, "42\n")
+        with patch('cpp_build.subprocess.run') as mock_run:
+            self.assertEqual(engine.run(self.source(open(path).read())).stdout, "42\n")
+            mock_run.assert_not_called()
+        bench = CppEngine(profile="bench", cache_dir=self.cache_dir, use_pch=False)
+        self.assertNotEqual(bench.build(path)[0], engine.build(path)[0])
+
+    def test_compile_errors_and_timeouts(self):
+        engine = CppEngine(cache_dir=self.cache_dir, use_pch=False)
+        result = engine.run(self.source("int main() { return missing; }\n"))
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Compilation failed", result.stderr)
+        self.assertIn("missing", result.stderr)
+        result = engine.run(self.source("int main() { for (;;) {} }\n"), timeout=0.5)
+        self.assertTrue(result.timed_out)
+
+    def test_precompiled_header(self):
+        engine = CppEngine(cache_dir=self.cache_dir)
+        flags = engine.pch_flags()
+        if flags:
+            self.assertTrue(os.path.exists(flags[1] + ".gch"))
+        path = self.source("#include <vector>\n#include <cstdio>\nint main() { std::vector<int> v(3); std::printf(\"%zu\\n\", v.size()); }\n")
+        self.assertEqual(engine.run(path).stdout, "3\n")
+
+class TestValidation(unittest.TestCase):
+
+    def source(self, code, suffix):
+        f = tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False)
+        f.write(code)
+        f.close()
+        self.addCleanup(os.unlink, f.name)
+        return f.name
+
+    def test_python_syntax_errors_are_reported(self):
+        self.assertIsNone(validate_candidate(self.source("print(1)\n", ".py"), "python"))
+        diagnostics = validate_candidate(self.source("x = (1,\nprint(x)\n", ".py"), "python")
+        self.assertIn("SyntaxError", diagnostics)
+        self.assertIn("line 1", diagnostics)
+
+    def test_languages_without_session_are_not_checked(self):
+        self.assertIsNone(validate_candidate(self.source("x <- (", ".R"), "r"))
+
+    @unittest.skipUnless(cpp_compiler_available(), "g++ is not installed")
+    def test_cpp_check_fills_the_binary_cache(self):
+        cache_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache_dir)
+        engine = CppEngine(cache_dir=cache_dir, use_pch=False)
+        self.assertIn("error", validate_candidate(self.source("int main() { return x }", ".cpp"), "cpp", cpp_engine=engine))
+        path = self.source("int main() { return 0; }\n", ".cpp")
+        self.assertIsNone(validate_candidate(path, "cpp", cpp_engine=engine))
+        self.assertEqual(len(list((cache_dir / "bin").iterdir())), 1)
+
+    @patch('dscoder.LLMClient')
+    def test_invalid_candidate_is_not_executed(self, MockLLMClient):
+        MockLLMClient.return_value.stream_completion.side_effect = [
+            LLMResponse(content="```python\nimport sys\nprint('a'\n```", tokens_used=1, model="m", provider="openai"),
+            LLMResponse(content="```python\nimport sys\nprint('a')\n```", tokens_used=1, model="m", provider="openai"),
+        ]
+        agent = AIAgent(provider="openai")
+        with patch.object(agent, "execute_code", return_value=("a\n", None)) as mock_execute:
+            self.assertEqual(agent.generate_code("print a", max_attempts=2), "import sys\nprint('a')")
+        self.assertEqual(mock_execute.call_count, 1)
+        self.assertEqual(agent.metrics_collector.validation_rejections, 1)
+        self.assertIn("SyntaxError", agent.messages[-1]["content"])
+
+class TestDeadline(unittest.TestCase):
+
+    def test_remaining_budget(self):
+        deadline = Deadline(10)
+        self.assertLessEqual(deadline.timeout(), 10)
+        self.assertEqual(deadline.timeout(2), 2)
+        self.assertEqual(step_timeout(None, 3), 3)
+        deadline.expires_at = time.monotonic() - 1
+        self.assertTrue(deadline.expired())
+        with self.assertRaises(DeadlineExceeded):
+            step_timeout(deadline)
+
+    def test_scheduler_does_not_wait_past_deadline(self):
+        scheduler = RateLimitScheduler()
+        scheduler.set_limits("openai", requests_per_minute=1)
+        request = MagicMock(return_value="ok")
+        self.assertEqual(scheduler.call("openai", 10, request, Deadline(5)), "ok")
+        with self.assertRaises(DeadlineExceeded):
+            scheduler.call("openai", 10, request, Deadline(5))
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(scheduler.stats()["openai"]["queue_depth"], 0)
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test"})
+    def test_stream_is_cancelled_at_deadline(self):
+        client = LLMClient("openrouter")
+        provider = FakeStreamingProvider("openrouter", ["a"] * 10, delay=0.2)
+        provider.stream_completion = MagicMock(wraps=provider.stream_completion)
+        client.providers = {"openrouter": provider}
+        client.current_provider = provider
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            client.stream_completion([{"role": "user", "content": "hi"}], deadline=Deadline(0.5))
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertTrue(provider.closed)
+        self.assertLessEqual(provider.stream_completion.call_args.kwargs["timeout"], 0.5)
+
+    @patch('dscoder.LLMClient')
+    def test_job_returns_within_budget(self, MockLLMClient):
+        MockLLMClient.return_value.stream_completion.return_value = LLMResponse(
+            content="```python\nimport time\ntime.sleep(30)\n```", tokens_used=1, model="m", provider="openai"
+        )
+        agent = AIAgent(provider="openai", warm_executors=False)
+        start = time.monotonic()
+        self.assertEqual(agent.generate_code("hang", max_attempts=5, timeout=1.0), "import time\ntime.sleep(30)")
+        self.assertLess(time.monotonic() - start, 3.0)
+        self.assertEqual(MockLLMClient.return_value.stream_completion.call_count, 1)
+        self.assertIs(MockLLMClient.return_value.stream_completion.call_args.kwargs["deadline"], agent.deadline)
+
+class TestScratchFiles(unittest.TestCase):
+
+    def test_scratch_file_is_removed_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with scratch_file("print(1)\n", ".py") as path:
+                self.assertEqual(os.path.dirname(path), scratch_dir())
+                with open(path) as f:
+                    self.assertEqual(f.read(), "print(1)\n")
+                raise RuntimeError("boom")
+        self.assertFalse(os.path.exists(path))
+
+    @patch('dscoder.LLMClient')
+    def test_attempts_run_from_scratch_files(self, MockLLMClient):
+        MockLLMClient.return_value.stream_completion.side_effect = [
+            LLMResponse(content="```python\nimport sys\nprint(a)\n```", tokens_used=1, model="m", provider="openai"),
+            LLMResponse(content="```python\nimport sys\nprint('a')\n```", tokens_used=1, model="m", provider="openai"),
+        ]
+        agent = AIAgent(provider="openai")
+        seen = []
+
+        def execute(path, language, expected_output=None):
+            seen.append((path, os.path.exists(path)))
+            return ("", "boom") if len(seen) == 1 else ("a\n", None)
+
+        with patch.object(agent, "execute_code", side_effect=execute), \
+                patch.object(agent, "save_final_version", return_value="final") as mock_save:
+            self.assertEqual(agent.generate_code("print a", max_attempts=2), "import sys\nprint('a')")
+        self.assertEqual(len(seen), 2)
+        for path, existed in seen:
+            self.assertEqual(os.path.dirname(path), scratch_dir())
+            self.assertTrue(existed)
+            self.assertFalse(os.path.exists(path))
+        # Only the final version is written to output/
+        self.assertEqual([c.args[2] for c in mock_save.call_args_list], ["success"])
+
+class TestExecutionCache(unittest.TestCase):
+
+    def test_lru_and_key(self):
+        cache = ExecutionCache(max_entries=2)
+        keys = [ExecutionCache.make_key("python", f"print({i})", None) for i in range(3)]
+        self.assertNotEqual(keys[0], ExecutionCache.make_key("python", "print(0)", "0"))
+        for key in keys:
+            cache.put(key, ExecutionOutcome(None))
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertEqual(len(cache), 2)
+
+    @patch('dscoder.LLMClient')
+    def test_repeated_candidate_changes_strategy_then_stops(self, MockLLMClient):
+        stream = MockLLMClient.return_value.stream_completion
+        stream.return_value = LLMResponse(
+            content="```python\nimport sys\nsys.exit(1)\n```", tokens_used=1, model="m", provider="openai"
+        )
+        agent = AIAgent(provider="openai")
+        with patch.object(agent, "execute_code", return_value=("", "boom")) as mock_execute:
+            self.assertEqual(agent.generate_code("fail", max_attempts=5), "import sys\nsys.exit(1)")
+        self.assertEqual(mock_execute.call_count, 1)
+        self.assertEqual(stream.call_count, 3)
+        self.assertEqual(stream.call_args_list[1].kwargs["temperature"], 0)
+        self.assertEqual(stream.call_args_list[2].kwargs["temperature"], REPEAT_TEMPERATURE)
+        self.assertIn(REPEAT_HINT, stream.call_args_list[2].kwargs["messages"][-1]["content"])
+        self.assertEqual(agent.metrics_collector.reused_executions, 2)
+        self.assertEqual(agent.metrics_collector.repeated_failures, 2)
+
+    @patch('dscoder.LLMClient')
+    def test_shared_cache_reuses_outcomes_across_jobs(self, MockLLMClient):
+        MockLLMClient.return_value.stream_completion.return_value = LLMResponse(
+            content="```python\nimport sys\nprint('a')\n```", tokens_used=1, model="m", provider="openai"
+        )
+        cache = ExecutionCache()
+        for executions in (1, 0):
+            agent = AIAgent(provider="openai", execution_cache=cache)
+            with patch.object(agent, "execute_code", return_value=("a\n", None)) as mock_execute:
+                self.assertIsNotNone(agent.generate_code("print a", expected_output="a"))
+            self.assertEqual(mock_execute.call_count, executions)
+
+class TestCandidates(unittest.TestCase):
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test"})
+    def test_sample_completions(self):
+        client = LLMClient("openrouter")
+        provider = FakeStreamingProvider("openrouter", ["```python\n", "print(1)\n", "```"], delay=0.2)
+        client.providers = {"openrouter": provider}
+        client.current_provider = provider
+        start = time.monotonic()
+        responses = list(client.sample_completions([{"role": "user", "content": "hi"}], n=3))
+        # The three streams run side by side
+        self.assertLess(time.monotonic() - start, 1.2)
+        self.assertEqual([r.content for r in responses], ["```python\nprint(1)\n```"] * 3)
+
+        batched = MagicMock(supports_n=True)
+        batched.generate_completions.return_value = responses[:2]
+        client.current_provider = batched
+        self.assertEqual(list(client.sample_completions([{"role": "user", "content": "hi"}], n=2)), responses[:2])
+        self.assertEqual(batched.generate_completions.call_args.kwargs["n"], 2)
+
+    @patch('dscoder.LLMClient')
+    def test_first_passing_candidate_is_returned(self, MockLLMClient):
+        sample = MockLLMClient.return_value.sample_completions
+        sample.return_value = iter([
+            LLMResponse(content=f"```python\nimport sys\nprint({i})\n```", tokens_used=1, model="m", provider="openai")
+            for i in range(3)
+        ])
+        agent = AIAgent(provider="openai", candidates=3)
+
+        def execute(path, language, expected_output=None):
+            with open(path) as f:
+                value = f.read().split("print(")[1][0]
+            if value != "2":
+                time.sleep(0.2)
+            return value + "\n", None
+
+        with patch.object(agent, "execute_code", side_effect=execute):
+            self.assertEqual(agent.generate_code("print 2", expected_output="2"), "import sys\nprint(2)")
+        self.assertEqual(sample.call_count, 1)
+        self.assertEqual(sample.call_args.kwargs["n"], 3)
+        self.assertGreaterEqual(sample.call_args.kwargs["temperature"], CANDIDATE_TEMPERATURE)
+        self.assertTrue(sample.call_args.kwargs["cancelled"].is_set())
+        with self.assertRaises(ValueError):
+            AIAgent(provider="openai", candidates=2, race=["deepseek"])
+
+class TestOutputStream(unittest.TestCase):
+
+    def test_ring_buffer_keeps_the_tail(self):
+        buffer = RingBuffer(5)
+        for text in ("abc", "defg", "h"):
+            buffer.write(text)
+        self.assertEqual(buffer.getvalue(), "[... 3 characters dropped ...]\ndefgh")
+
+    def test_prefix_matcher_follows_check_result(self):
+        for chunks, expected, matches in [
+            (["\n  1", "2\n3", "\n\n"], "12\n3", True),
+            (["12\n4"], "12\n3", False),
+            (["12\n3", " x"], "12\n3", False),
+        ]:
+            matcher = PrefixMatcher(expected)
+            for chunk in chunks:
+                matcher.feed(chunk)
+            self.assertEqual(not matcher.diverged, matches, chunks)
+
+    def script(self, source):
+        f = tempfile.NamedTemporaryFile("w", suffix=".py", delete=False)
+        f.write(source)
+        f.close()
+        self.addCleanup(os.unlink, f.name)
+        return f.name
+
+    def test_run_stops_at_first_wrong_line(self):
+        path = self.script("import time\nprint('1', flush=True)\nprint('9', flush=True)\ntime.sleep(10)\n")
+        start = time.monotonic()
+        result = run_process([sys.executable, path], timeout=5, expected_output="1\n2")
+        self.assertLess(time.monotonic() - start, 3.0)
+        self.assertTrue(result.diverged)
+        # Killed on divergence, so the trailing newline may not have been read yet
+        self.assertTrue(result.stdout.startswith("1\n9"), result.stdout)
+        # Without an expected output the same run goes on until its timeout
+        self.assertTrue(run_process([sys.executable, path], timeout=0.5).timed_out)
+
+    def test_captured_output_is_bounded(self):
+        path = self.script("import sys\nfor _ in range(200):\n    sys.stdout.write('x' * 100000)\n")
+        result = run_process([sys.executable, path], timeout=30, capacity=1000)
+        self.assertEqual(result.returncode, 0)
+        self.assertTrue(result.stdout.startswith("[... 19999000 characters dropped ...]\n"))
+        self.assertTrue(result.stdout.endswith("x" * 1000))
+
+    @unittest.skipUnless(python_pool_supported(), "fork-based workers need POSIX")
+    def test_warm_worker_stops_diverging_run(self):
+        pool = PythonWorkerPool(size=1, preload=())
+        self.addCleanup(pool.close)
+        path = self.script("import time\nprint('wrong', flush=True)\ntime.sleep(10)\n")
+        start = time.monotonic()
+        result = pool.run(path, timeout=5, expected_output="right")
+        self.assertLess(time.monotonic() - start, 3.0)
+        self.assertTrue(result.diverged)
+        self.assertEqual(pool.run(self.script("print('right')\n"), expected_output="right").stdout, "right\n")
+
+class TestDependencyEnvironments(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.manager = EnvironmentManager(root=Path(self.root))
+
+    def fake_build(self, language, packages, path, timeout):
+        # A "venv" whose interpreter marks the runs it serves
+        (path / "bin").mkdir()
+        python = path / "bin" / "python"
+        python.write_text(f'#!/bin/sh\nDSCODER_ENV={"-".join(packages)} exec {sys.executable} "$@"\n')
+        python.chmod(0o755)
+
+    def test_dependencies_are_read_statically(self):
+        self.assertEqual(
+            extract_dependencies("import os, numpy as np\nfrom sklearn.linear_model import X\nfrom . import y\n", "python"),
+            ["numpy", "sklearn"]
+        )
+        self.assertEqual(
+            extract_dependencies("library(ggplot2)\nrequire('dplyr')\nx <- stats::sd(1)\ndata.table::fread('a')\n", "r"),
+            ["data.table", "dplyr", "ggplot2"]
+        )
+        self.assertEqual(extract_dependencies("using DataFrames, LinearAlgebra\nimport CSV: read\n", "julia"), ["CSV", "DataFrames"])
+        self.assertEqual(extract_dependencies("#include <vector>\n", "cpp"), [])
+
+    def test_environment_is_built_once_per_dependency_set(self):
+        self.assertIsNone(self.manager.resolve("import json\n", "python"))
+        with patch.object(self.manager, "build", side_effect=self.fake_build) as mock_build:
+            first = self.manager.resolve("import dscoder_missing_pkg\n", "python")
+            second = self.manager.resolve("from dscoder_missing_pkg import x\n", "python")
+        self.assertEqual(mock_build.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(first.packages, ("dscoder_missing_pkg",))
+        # Reused by a new manager, e.g. in a later process
+        with patch.object(EnvironmentManager, "build") as mock_build:
+            EnvironmentManager(root=Path(self.root)).resolve("import dscoder_missing_pkg\n", "python")
+        mock_build.assert_not_called()
+
+    def test_failed_installation_is_remembered(self):
+        with patch.object(self.manager, "build", side_effect=DependencyError("no such package")) as mock_build:
+            for _ in range(2):
+                with self.assertRaises(DependencyError):
+                    self.manager.resolve("import dscoder_missing_pkg\n", "python")
+        self.assertEqual(mock_build.call_count, 1)
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_interrupted_build_is_resumed(self):
+        calls = []
+
+        def interrupted_build(language, packages, path, timeout):
+            calls.append(sorted(os.listdir(path)))
+            if len(calls) == 1:
+                (path / "partial").touch()
+                raise subprocess.TimeoutExpired("pip", timeout)
+            self.fake_build(language, packages, path, timeout)
+
+        with patch.object(self.manager, "build", side_effect=interrupted_build):
+            with self.assertRaisesRegex(DependencyError, "resumes"):
+                self.manager.resolve("import dscoder_missing_pkg\n", "python", timeout=1.0)
+            environment = self.manager.resolve("import dscoder_missing_pkg\n", "python", timeout=1.0)
+        self.assertEqual(calls, [[], ["partial"]])
+        self.assertEqual(environment.packages, ("dscoder_missing_pkg",))
+
+    def test_build_over_total_budget_is_remembered(self):
+        with patch('environments.INSTALL_TIMEOUT', 0.0), \
+                patch.object(self.manager, "build", side_effect=subprocess.TimeoutExpired("pip", 0)) as mock_build:
+            for _ in range(2):
+                with self.assertRaisesRegex(DependencyError, "did not finish"):
+                    self.manager.resolve("import dscoder_missing_pkg\n", "python")
+        self.assertEqual(mock_build.call_count, 1)
+
+    @patch('dscoder.LLMClient')
+    def test_candidate_runs_in_its_environment(self, MockLLMClient):
+        agent = AIAgent(provider="openai", dependency_envs=True)
+        with patch.object(self.manager, "build", side_effect=self.fake_build), \
+                patch('dscoder.get_environment_manager', return_value=self.manager):
+            with scratch_file("import os\ntry:\n    import dscoder_missing_pkg\nexcept ImportError:\n    pass\n"
+                              "print(os.environ.get('DSCODER_ENV'))\n", ".py") as path:
+                self.assertEqual(agent.execute_code(path, "python"), ("dscoder_missing_pkg\n", None))
+            with scratch_file("import os\nprint(os.environ.get('DSCODER_ENV'))\n", ".py") as path:
+                self.assertEqual(agent.execute_code(path, "python"), ("None\n", None))
+
+class TestLocalRepair(unittest.TestCase):
+
+    def test_fixers(self):
+        gcc = (
+            "a.cpp:4:18: error: 'setprecision' is not a member of 'std'\n"
+            "a.cpp:1:1: note: 'std::setprecision' is defined in header '<iomanip>'; "
+            "did you forget to '#include <iomanip>'?\n"
+        )
+        self.assertEqual(classify_error(gcc, "cpp"), "missing_include")
+        fix = local_repair("#include <iostream>\nint main() {}\n", gcc, "cpp")
+        self.assertEqual(fix.code, "#include <iostream>\n#include <iomanip>\nint main() {}\n")
+
+        fix = local_repair(
+            "from collections import OrderedDict, Mapping\n",
+            "ImportError: cannot import name 'Mapping' from 'collections' (/usr/lib/python3/collections/__init__.py)",
+            "python"
+        )
+        self.assertEqual(fix.code, "from collections import OrderedDict\nfrom collections.abc import Mapping\n")
+
+        r_error = 'Error in df %>% head() : could not find function "%>%"'
+        self.assertEqual(local_repair("library(stats)\ndf %>% head()\n", r_error, "r").code,
+                         "library(stats)\nlibrary(magrittr)\ndf %>% head()\n")
+
+        missing = "ImportError: Missing optional dependency 'openpyxl'."
+        self.assertIn("import openpyxl", local_repair("import pandas\n", missing, "python").code)
+        self.assertIsNone(local_repair("import pandas\n", missing, "python", environments=False))
+        self.assertIsNone(local_repair("print(1)\n", "Output mismatch", "python"))
+
+    @patch('dscoder.LLMClient')
+    def test_mechanical_failure_is_fixed_without_round_trip(self, MockLLMClient):
+        stream = MockLLMClient.return_value.stream_completion
+        stream.return_value = LLMResponse(
+            content="```python\nfrom collections import Mapping\nprint(issubclass(dict, Mapping))\n```",
+            tokens_used=1, model="m", provider="openai"
+        )
+        agent = AIAgent(provider="openai")
+        self.assertEqual(
+            agent.generate_code("check dict", expected_output="True"),
+            "from collections.abc import Mapping\nprint(issubclass(dict, Mapping))"
+        )
+        self.assertEqual(stream.call_count, 1)
+        self.assertEqual(agent.metrics_collector.local_repairs, 1)
+
+
+class TestErrorDigest(unittest.TestCase):
+
+    def test_cpp_template_error_is_condensed(self):
+        library = "/usr/include/c++/12/bits/stl_algo.h"
+        error = "Compilation failed:\n" + "\n".join([
+            "/dev/shm/dscoder_ab12.cpp: In function 'int main()':",
+            "/dev/shm/dscoder_ab12.cpp:8:14: error: no match for 'operator<' "
+            "(operand types are 'std::map<std::string, std::vector<int> >' and 'int')",
+            "    8 |     if (m < 3) {}",
+            "      |         ~ ^ ~",
+            *[f"{library}:{i}:5: note:   required from 'void std::__sort<std::vector<int> >()'" for i in range(40)],
+            "/dev/shm/dscoder_ab12.cpp:9:5: error: 'undefined_fn' was not declared in this scope",
+            "/dev/shm/dscoder_ab12.cpp:10:5: error: 'undefined_fn' was not declared in this scope",
+        ])
+        digest = digest_error(error, "cpp")
+        self.assertTrue(digest.startswith("Compilation failed:\ncandidate.cpp:8:14: error: no match for 'operator<' "
+                                          "(operand types are 'std::map<...>' and 'int')"))
+        self.assertIn("    8 |     if (m < 3) {}", digest)
+        self.assertIn("[... 41 template instantiation/include context lines omitted ...]", digest)
+        self.assertEqual(digest.count("undefined_fn"), 1)
+        self.assertNotIn("dscoder_ab12", digest)
+
+    def test_python_library_frames_are_collapsed(self):
+        frames = "\n".join(
+            f'  File "/usr/lib/python3/site-packages/pandas/core/frame{i}.py", line {i}, in f{i}\n    return g()'
+            for i in range(30)
+        )
+        error = (
+            "Traceback (most recent call last):\n"
+            '  File "/dev/shm/dscoder_x1.py", line 3, in <module>\n    df["missing"]\n'
+            f"{frames}\nKeyError: 'missing'"
+        )
+        digest = digest_error(error, "python")
+        self.assertIn('File "candidate.py", line 3', digest)
+        self.assertIn("[... 30 library frames ...]", digest)
+        self.assertTrue(digest.endswith("KeyError: 'missing'"))
+        self.assertNotIn("pandas/core", digest)
+        self.assertLessEqual(len(digest_error(error * 200, "python", max_tokens=100)) // 4, 110)
+        self.assertEqual(summarize_error(error, "python"), "KeyError: 'missing'")
+
+    def test_history_keeps_error_headline(self):
+        context = ConversationContext("system")
+        context.start("task", "python")
+        context.record_code("import pandas")
+        context.record_error('Traceback (most recent call last):\n  File "x.py", line 1\nValueError: bad value')
+        context.record_error("Output mismatch")
+        self.assertIn("- ValueError: bad value", context.build_messages()[3]["content"])
+
+
+
+class TestEditRepairs(unittest.TestCase):
+
+    def test_apply_edits(self):
+        code = "def f(x):\n    if x:\n        return 1\n    return 0\n\nprint(f(1))\n"
+        edits = parse_edits(
+            "Fix:\n<<<<<<< SEARCH\nif x:\n    return 1\n=======\nif x > 1:\n    return 2\n>>>>>>> REPLACE\n"
+            "<<<<<<< SEARCH\nprint(f(1))\n=======\nprint(f(2))\n>>>>>>> REPLACE"
+        )
+        self.assertEqual(len(edits), 2)
+        self.assertEqual(
+            apply_edits(code, edits),
+            "def f(x):\n    if x > 1:\n        return 2\n    return 0\n\nprint(f(2))\n"
+        )
+        with self.assertRaises(EditError):
+            apply_edits(code, parse_edits("<<<<<<< SEARCH\nreturn\n=======\npass\n>>>>>>> REPLACE"))
+        with self.assertRaises(EditError):
+            apply_edits("x = 1\nx = 1\n", parse_edits("<<<<<<< SEARCH\nx = 1\n=======\nx = 2\n>>>>>>> REPLACE"))
+
+    @patch('dscoder.LLMClient')
+    def test_repair_applies_edits_to_last_code(self, MockLLMClient):
+        stream = MockLLMClient.return_value.stream_completion
+        replies = ["```python\nimport math\nprint(math.floor(1.5))\n```",
+                   "<<<<<<< SEARCH\nprint(math.floor(1.5))\n=======\nprint(math.ceil(1.5))\n>>>>>>> REPLACE"]
+        stream.side_effect = [LLMResponse(content=reply, tokens_used=1, model="m", provider="openai") for reply in replies]
+        agent = AIAgent(provider="openai")
+        self.assertEqual(agent.generate_code("round up", expected_output="2"), "import math\nprint(math.ceil(1.5))")
+        self.assertIn("<<<<<<< SEARCH", stream.call_args_list[1].kwargs["messages"][-1]["content"])
+        self.assertIsNone(stream.call_args_list[1].kwargs["stop_when"])
+        self.assertEqual(agent.metrics_collector.edit_repairs, 1)
+
+    @patch('dscoder.LLMClient')
+    def test_unapplied_edits_fall_back_to_full_code(self, MockLLMClient):
+        stream = MockLLMClient.return_value.stream_completion
+        replies = ["```python\nimport math\nprint(math.floor(1.5))\n```",
+                   "<<<<<<< SEARCH\nprint(round(1.5))\n=======\nprint(2)\n>>>>>>> REPLACE",
+                   "```python\nimport math\nprint(math.ceil(1.5))\n```"]
+        stream.side_effect = [LLMResponse(content=reply, tokens_used=1, model="m", provider="openai") for reply in replies]
+        agent = AIAgent(provider="openai")
+        self.assertEqual(
+            agent.generate_code("round up", expected_output="2", max_attempts=2),
+            "import math\nprint(math.ceil(1.5))"
+        )
+        self.assertIn("complete corrected version", stream.call_args_list[2].kwargs["messages"][-1]["content"])
+        self.assertEqual(agent.metrics_collector.edit_fallbacks, 1)
+        self.assertTrue(agent.context.edits)
+
+
+
+class ToollessProvider(FakeStreamingProvider):
+    """Provider double whose model rejects the code tool"""
+
+    supports_structured = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.structured_calls = 0
+
+    def stream_structured(self, **kwargs):
+        self.structured_calls += 1
+        error = RuntimeError("No endpoints found that support tool use")
+        error.status_code = 404
+        # Rejected once the stream is read, like the SDK streams
+        yield from ()
+        raise error
+
+
+class TestStructuredOutput(unittest.TestCase):
+
+    def test_providers_without_tools_fall_back_to_text(self):
+        class TextProvider(LLMProvider):
+            def initialize_client(self):
+                pass
+
+            def generate_completion(self, messages, max_tokens, temperature, model=None, timeout=None):
+                return LLMResponse(content="```python\nprint(1)\n```", tokens_used=1, model="m", provider="text")
+
+        provider = TextProvider()
+        self.assertFalse(provider.supports_structured)
+        request = dict(messages=[], max_tokens=10, temperature=0)
+        self.assertEqual(provider.generate_structured(**request).content, "```python\nprint(1)\n```")
+        self.assertEqual([chunk.content for chunk in provider.stream_structured(**request)],
+                         ["```python\nprint(1)\n```"])
+
+    def test_parse_delivery(self):
+        delivery = parse_delivery(json.dumps(
+            {"language": "python", "code": "```python\nprint(1)\n```"}
+        ))
+        self.assertEqual((delivery.language, delivery.code), ("python", "print(1)"))
+        self.assertIsNone(parse_delivery("```python\nprint(1)\n```"))
+        self.assertIsNone(parse_delivery(MagicMock()))
+        self.assertIsNone(parse_delivery(None))
+        self.assertIsNone(parse_delivery('{"language": "python", "code": "print('))
+        self.assertNotEqual(
+            ResponseCache.make_key("openai", "m", [], 10, 0, structured=True),
+            ResponseCache.make_key("openai", "m", [], 10, 0)
+        )
+
+    def test_providers_force_the_code_tool(self):
+        arguments = '{"language": "python", "code": "print(1)"}'
+        provider = OpenAIProvider()
+        provider.client = MagicMock()
+        call = SimpleNamespace(function=SimpleNamespace(name="deliver_code", arguments=arguments))
+        provider.client.chat.completions.create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=[call]))],
+            usage=SimpleNamespace(total_tokens=7)
+        )
+        response = provider.generate_structured([{"role": "user", "content": "task"}], 100, 0)
+        self.assertEqual(response.content, arguments)
+        request = provider.client.chat.completions.create.call_args.kwargs
+        self.assertEqual(request["tool_choice"], {"type": "function", "function": {"name": "deliver_code"}})
+
+        anthropic = AnthropicProvider()
+        anthropic.client = MagicMock()
+        usage = SimpleNamespace(input_tokens=5, cache_creation_input_tokens=0, cache_read_input_tokens=0)
+        events = [SimpleNamespace(type="message_start", message=SimpleNamespace(usage=usage))]
+        events += [
+            SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="input_json_delta", partial_json=part))
+            for part in (arguments[:20], arguments[20:])
+        ]
+        events.append(SimpleNamespace(type="message_delta", usage=SimpleNamespace(output_tokens=3)))
+        anthropic.client.messages.create.return_value = MagicMock(__iter__=lambda self: iter(events))
+        chunks = list(anthropic.stream_structured([{"role": "user", "content": "task"}], 100, 0))
+        self.assertEqual("".join(chunk.content for chunk in chunks), arguments)
+        self.assertEqual(sum(chunk.tokens_used for chunk in chunks), 8)
+        self.assertEqual(anthropic.client.messages.create.call_args.kwargs["tool_choice"],
+                         {"type": "tool", "name": "deliver_code"})
+
+    @patch.dict(os.environ, {"OPENROUTER_API_KEY": "test"})
+    def test_rejected_tool_falls_back_to_text(self):
+        client = LLMClient("openrouter")
+        provider = ToollessProvider("openrouter", ["```python\n", "print(1)\n", "```"])
+        client.providers = {"openrouter": provider}
+        client.current_provider = provider
+        for _ in range(2):
+            response = client.stream_completion([{"role": "user", "content": "hi"}], structured=True)
+            self.assertEqual(response.content, "```python\nprint(1)\n```")
+        self.assertEqual(provider.structured_calls, 1)
+        self.assertIn("openrouter:openrouter-model", client.unstructured)
+
+    @patch('dscoder.LLMClient')
+    def test_structured_delivery_skips_code_block_extraction(self, MockLLMClient):
+        stream = MockLLMClient.return_value.stream_completion
+        stream.return_value = LLMResponse(
+            content='{"language": "python", "code": "print(6 * 7)"}',
+            tokens_used=1, model="m", provider="openai"
+        )
+        agent = AIAgent(provider="openai")
+        self.assertEqual(agent.generate_code("print 42", expected_output="42"), "print(6 * 7)")
+        self.assertTrue(stream.call_args.kwargs["structured"])
+        self.assertEqual(agent.metrics_collector.structured_replies, 1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -5,8 +5,11 @@ import os
 from datetime import datetime
 import subprocess
 import sys
-import tempfile
 from typing import Tuple, Optional
+from julia_server import get_julia_pool, julia_server_supported
+from r_session import get_r_pool, r_session_supported
+from cpp_build import get_cpp_engine
+from scratch import scratch_file
 
 class CodeExecutor:
     """
@@ -14,8 +17,14 @@ class CodeExecutor:
     Suporta R, Python, Julia e C++.
     """
     
-    def __init__(self):
-        """Inicializa o executor de código verificando as dependências necessárias."""
+    def __init__(self, cpp_profile: str = 'iterate'):
+        """
+        Inicializa o executor de código verificando as dependências necessárias.
+        
+        Args:
+            cpp_profile (str): Perfil de flags do C++: 'iterate' (-O0) ou 'bench' (-O2 -march=native)
+        """
+        self.cpp_profile = cpp_profile
         self.check_dependencies()
     
     def check_dependencies(self) -> None:
@@ -64,28 +73,35 @@ class CodeExecutor:
         return '', f'Linguagem {language} não suportada'
 
     def execute_python(self, code: str) -> Tuple[str, str]:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py') as f:
-            f.write(code)
-            f.flush()
-            process = subprocess.run([sys.executable, f.name], capture_output=True, text=True)
+        # O código vai pelo stdin: nenhum arquivo é criado
+        process = subprocess.run([sys.executable, '-'], input=code, capture_output=True, text=True)
         return process.stdout, process.stderr
 
     def execute_r(self, code: str) -> Tuple[str, str]:
         if not self.available_langs.get('r', False):
             return '', 'R não está instalado no sistema'
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.R') as f:
-            f.write(code)
-            f.flush()
-            process = subprocess.run(['Rscript', f.name], capture_output=True, text=True)
+        # Arquivo em memória (/dev/shm), removido ao final em qualquer caso
+        with scratch_file(code, '.R') as path:
+            if r_session_supported():
+                # Sessão R persistente: os pacotes comuns já estão carregados
+                result = get_r_pool().run(path, timeout=120)
+                if result.timed_out:
+                    return result.stdout, 'Erro: Execução excedeu o tempo limite de 120 segundos'
+                return result.stdout, result.stderr
+            process = subprocess.run(['Rscript', path], capture_output=True, text=True)
         return process.stdout, process.stderr
 
     def execute_julia(self, code: str) -> Tuple[str, str]:
         if not self.available_langs.get('julia', False):
             return '', 'Julia não está instalada no sistema'
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.jl') as f:
-            f.write(code)
-            f.flush()
-            process = subprocess.run(['julia', f.name], capture_output=True, text=True)
+        with scratch_file(code, '.jl') as path:
+            if julia_server_supported():
+                # Servidor Julia persistente: evita a inicialização e a compilação a cada execução
+                result = get_julia_pool().run(path, timeout=120)
+                if result.timed_out:
+                    return result.stdout, 'Erro: Execução excedeu o tempo limite de 120 segundos'
+                return result.stdout, result.stderr
+            process = subprocess.run(['julia', path], capture_output=True, text=True)
         return process.stdout, process.stderr
 
     def execute_cpp(self, code: str) -> Tuple[str, str]:
@@ -97,35 +113,18 @@ class CodeExecutor:
             return '', 'Código vazio'
         
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                src_path = os.path.join(temp_dir, 'source.cpp')
-                exe_path = os.path.join(temp_dir, 'program')
-                if os.name == 'nt':
-                    exe_path += '.exe'
-                
-                with open(src_path, 'w', encoding='utf-8') as src_file:
-                    src_file.write(code)
-                
-                compile_process = subprocess.run(
-                    ['g++', src_path, '-o', exe_path, '-std=c++11'],
-                    capture_output=True,
-                    text=True
-                )
-                
-                if compile_process.returncode != 0:
-                    return '', f'Erro de compilação:\n{compile_process.stderr}'
-                
-                run_process = subprocess.run(
-                    [exe_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
+            with scratch_file(code, '.cpp') as src_path:
+                # Binários ficam em cache por código-fonte, flags e versão do compilador
+                engine = get_cpp_engine(self.cpp_profile)
+                binary, diagnostics = engine.build(src_path)
+                if binary is None:
+                    return '', f'Erro de compilação:\n{diagnostics}'
                 
-                return run_process.stdout, run_process.stderr
+                result = engine.execute(binary, timeout=10)
+                if result.timed_out:
+                    return result.stdout, 'Erro: Execução excedeu o tempo limite de 10 segundos'
+                return result.stdout, result.stderr
                 
-        except subprocess.TimeoutExpired:
-            return '', 'Erro: Execução excedeu o tempo limite de 10 segundos'
         except Exception as e:
             return '', f'Erro durante execução: {str(e)}'
 
@@ -0,0 +1,77 @@
+"""
+Static pre-validation of candidates before they are executed.
+
+Each check costs milliseconds and rejects a candidate that cannot run at
+all, returning the diagnostics that go straight into the repair prompt:
+
+- python: compile() in this process
+- cpp: compilation through the CppEngine binary cache; a valid candidate is
+  then executed from the cache, so the check costs no extra compile
+- r / julia: parse() / Meta.parse on a warm session, which is already
+  running; without one the check is skipped, as starting an interpreter
+  only to parse would cost what this stage is meant to save
+"""
+import traceback
+from typing import Optional
+
+from cpp_build import CppEngine
+from worker_pool import WorkerPool
+
+
+def validate_python(path: str) -> Optional[str]:
+    """Compiles a Python file without running it"""
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    try:
+        compile(source, path, "exec")
+    except (SyntaxError, ValueError) as e:
+        return "".join(traceback.format_exception_only(type(e), e))
+    return None
+
+
+def validate_cpp(path: str, engine: CppEngine, timeout: Optional[float] = None) -> Optional[str]:
+    """Compiles a C++ file into the engine's binary cache"""
+    binary, diagnostics = engine.build(path, timeout)
+    if binary is None:
+        return f"Compilation failed:\n{diagnostics}"
+    return None
+
+
+def validate_with_session(path: str, pool: WorkerPool, timeout: float = 10.0) -> Optional[str]:
+    """Parses a file on a warm R or Julia session"""
+    result = pool.run(path, timeout, mode="parse")
+    if result.returncode != 0 and not result.timed_out:
+        return result.stderr or "Syntax check failed"
+    return None
+
+
+def validate_candidate(
+    path: str,
+    language: str,
+    pool: Optional[WorkerPool] = None,
+    cpp_engine: Optional[CppEngine] = None,
+    timeout: Optional[float] = None
+) -> Optional[str]:
+    """
+    Runs the static check of a language on a saved candidate.
+
+    Args:
+        path (str): Candidate file
+        language (str): Candidate language
+        pool (Optional[WorkerPool]): Warm session used for R and Julia
+        cpp_engine (Optional[CppEngine]): Engine used for C++
+        timeout (Optional[float]): Seconds the check may take (compilation
+                                   or parse); each check's own limit when None
+
+    Returns:
+        Optional[str]: Diagnostics when the candidate is rejected, None
+                       when it passed or the language has no check here
+    """
+    language = language.lower()
+    if language == "python":
+        return validate_python(path)
+    if language == "cpp" and cpp_engine is not None:
+        return validate_cpp(path, cpp_engine, timeout)
+    if language in ("r", "julia") and pool is not None:
+        return validate_with_session(path, pool, 10.0 if timeout is None else min(10.0, timeout))
+    return None
@@ -0,0 +1,314 @@
+import os
+import queue
+import select
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence
+
+from output_stream import MAX_CAPTURE, RunResult, read_tail
+from scratch import scratch_dir
+
+
+class Worker(ABC):
+    """
+    Handle to one long-lived interpreter process serving run requests over
+    its stdin/stdout pipes.
+
+    The process runs in its own session so close() also stops anything the
+    candidates spawned. A worker that stops answering, or does not get ready
+    within startup_timeout, is marked broken and replaced by its pool.
+
+    Attributes:
+        name: Interpreter name used in error messages
+        startup_timeout: Seconds a new worker may take to become ready
+    """
+
+    name = "Interpreter"
+    startup_timeout = 600.0
+
+    def __init__(self, command: Sequence[str], stderr=subprocess.DEVNULL):
+        self.runs = 0
+        self.broken = False
+        self.ready = False
+        self._buffer = b""
+        self.started = time.monotonic()
+        self.process = subprocess.Popen(
+            list(command),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            bufsize=0,
+            start_new_session=True
+        )
+
+    def readline(self, timeout: float) -> Optional[str]:
+        """Reads one line, or returns None when the worker is gone or too slow"""
+        # Lines are split from raw reads: a buffered reader could hold a
+        # complete line that select() would never report again
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self._buffer:
+            ready, _, _ = select.select([self.process.stdout], [], [], max(0.0, deadline - time.monotonic()))
+            if not ready:
+                return None
+            data = os.read(self.process.stdout.fileno(), 65536)
+            if not data:
+                return None
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line.decode("utf-8", errors="replace") + "\n"
+
+    def send(self, line: str) -> bool:
+        """Writes one request line; False when the worker is gone"""
+        try:
+            self.process.stdin.write((line + "\n").encode("utf-8"))
+            return True
+        except (BrokenPipeError, OSError):
+            return False
+
+    @abstractmethod
+    def wait_ready(self, timeout: float) -> bool:
+        """Waits up to timeout seconds for the worker's ready signal"""
+        pass
+
+    def warm_up(self, limit: float) -> bool:
+        """
+        Waits until the worker is ready, for at most limit seconds.
+
+        A worker still warming up when limit runs out stays in the pool for
+        later runs; one that is gone, or not ready within startup_timeout,
+        is marked broken.
+        """
+        if self.ready:
+            return True
+        left = self.started + self.startup_timeout - time.monotonic()
+        wait = max(0.0, min(limit, left))
+        self.ready = self.wait_ready(wait)
+        if not self.ready and (wait >= left or self.process.poll() is not None):
+            self.broken = True
+        return self.ready
+
+    @abstractmethod
+    def run(self, path: str, timeout: float, mode: str = "run", expected_output: Optional[str] = None) -> RunResult:
+        """
+        Runs one candidate file on a ready worker; sets broken when the worker must be replaced.
+
+        mode is "run", or "parse" to only check the file's syntax on
+        workers that support it. Workers that stream the candidate's output
+        stop the run as soon as it diverges from expected_output.
+        """
+        pass
+
+    def healthy(self) -> bool:
+        return not self.broken and self.process.poll() is None
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.process.wait()
+
+
+class CaptureWorker(Worker):
+    """
+    Worker driven by a small server script in the interpreter's own language.
+
+    The script prints READY_MARKER once warm. For each request line it runs
+    the candidate, writes its stdout and stderr to the files named in the
+    request, and answers with RESULT_MARKER followed by the exit status (and
+    "timeout" when the candidate hit its time limit); any other output is
+    skipped. Servers also accept a "parse" mode that only checks the
+    candidate's syntax. The server's own stderr goes to a log, and whatever lands there
+    during a run (e.g. from subprocesses the script cannot redirect) is
+    appended to the candidate's stderr.
+
+    Only the tail of each output file is read back (see read_tail). Runs
+    are not stopped on diverging output: the interpreter cannot be
+    interrupted safely, and replacing a warm server costs more than the
+    rest of the run.
+
+    Attributes:
+        grace: Extra seconds waited for an answer beyond the run timeout
+    """
+
+    READY_MARKER = "DSCODER_READY"
+    RESULT_MARKER = "DSCODER_RESULT "
+
+    grace = 0.0
+
+    def __init__(self, command: Sequence[str]):
+        self.log = tempfile.TemporaryFile()
+        super().__init__(command, stderr=self.log)
+
+    @abstractmethod
+    def request_line(self, mode: str, path: str, out_path: str, err_path: str, timeout: float) -> str:
+        """Builds the request line the server script expects"""
+        pass
+
+    def wait_for(self, marker: str, timeout: float) -> Optional[str]:
+        """Skips output until a line starting with marker, returning the rest of it"""
+        deadline = time.monotonic() + timeout
+        while True:
+            line = self.readline(max(0.0, deadline - time.monotonic()))
+            if line is None:
+                return None
+            if line.startswith(marker):
+                return line[len(marker):].strip()
+
+    def wait_ready(self, timeout: float) -> bool:
+        return self.wait_for(self.READY_MARKER, timeout) is not None
+
+    def run(self, path: str, timeout: float, mode: str = "run", expected_output: Optional[str] = None) -> RunResult:
+        out_fd, out_path = tempfile.mkstemp(suffix=".out", dir=scratch_dir())
+        err_fd, err_path = tempfile.mkstemp(suffix=".err", dir=scratch_dir())
+        os.close(out_fd)
+        os.close(err_fd)
+        log_offset = self.log.seek(0, os.SEEK_END)
+        try:
+            answer = None
+            if self.send(self.request_line(mode, os.path.abspath(path), out_path, err_path, timeout)):
+                answer = self.wait_for(self.RESULT_MARKER, timeout + self.grace)
+            stdout = read_tail(out_path)
+            stderr = read_tail(err_path)
+        finally:
+            os.unlink(out_path)
+            os.unlink(err_path)
+        self.log.seek(log_offset)
+        stderr += self.log.read(MAX_CAPTURE).decode("utf-8", errors="replace")
+
+        if answer is None:
+            # The interpreter cannot be interrupted safely from outside, so
+            # the server is dropped and the pool starts a fresh one
+            self.broken = True
+            return RunResult(stdout, stderr, 1, timed_out=self.process.poll() is None)
+        fields = answer.split()
+        self.runs += 1
+        return RunResult(stdout, stderr, int(fields[0]), timed_out="timeout" in fields[1:])
+
+    def close(self) -> None:
+        super().close()
+        self.log.close()
+
+
+class WorkerPool(ABC):
+    """
+    Bounded pool of warm workers shared by every agent in the process.
+
+    Workers are started lazily (or all at once with start()) and each one
+    serves a single run at a time. A worker is replaced after max_runs runs,
+    or as soon as it breaks; the replacement starts right away so it warms
+    up while idle. grow() raises the bound for callers that run several
+    candidates at once. Waiting for a free worker and for its warm-up both
+    count against the time limit of the run.
+
+    Attributes:
+        size: Maximum number of workers
+        max_runs: Runs served by a worker before it is recycled
+    """
+
+    def __init__(self, size: int, max_runs: int):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.size = size
+        self.max_runs = max_runs
+        self._idle: "queue.Queue[Worker]" = queue.Queue()
+        self._workers: List[Worker] = []
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def new_worker(self) -> Worker:
+        """Starts a new worker process"""
+        pass
+
+    def _spawn(self) -> Worker:
+        worker = self.new_worker()
+        self._workers.append(worker)
+        return worker
+
+    def start(self) -> None:
+        """Starts every worker now, so their warm-up runs while nothing waits on them"""
+        with self._lock:
+            while len(self._workers) < self.size:
+                self._idle.put(self._spawn())
+
+    def grow(self, size: int) -> None:
+        """Raises the maximum number of workers to size; the extra ones start on demand"""
+        with self._lock:
+            self.size = max(self.size, size)
+
+    def _acquire(self, timeout: Optional[float] = None) -> Optional[Worker]:
+        """Takes an idle worker, or None when none is free within timeout seconds"""
+        with self._lock:
+            if self._idle.empty() and len(self._workers) < self.size:
+                return self._spawn()
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _release(self, worker: Worker) -> None:
+        if worker.healthy() and worker.runs < self.max_runs:
+            self._idle.put(worker)
+            return
+        worker.close()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+                self._idle.put(self._spawn())
+
+    def run(
+        self,
+        path: str,
+        timeout: float = 30.0,
+        mode: str = "run",
+        expected_output: Optional[str] = None
+    ) -> RunResult:
+        """
+        Runs a candidate file on a warm worker.
+
+        Args:
+            path (str): File to run
+            timeout (float): Seconds the run may take, including the wait
+                             for a free worker and its warm-up
+            mode (str): "run", or "parse" to only check the syntax (where supported)
+            expected_output (Optional[str]): Output the candidate should print;
+                                             workers that stream output stop it
+                                             as soon as it diverges
+
+        Returns:
+            RunResult: Captured stdout, stderr, exit status and timeout flag;
+                       timed out when no worker was ready in time
+        """
+        expires = time.monotonic() + timeout
+        worker = self._acquire(timeout)
+        if worker is None:
+            return RunResult("", "No worker became free within the time limit", 1, timed_out=True)
+        try:
+            if not worker.warm_up(max(0.0, expires - time.monotonic())):
+                if worker.broken:
+                    return RunResult("", f"{worker.name} server failed to start", 1)
+                return RunResult("", f"{worker.name} server still starting at the time limit", 1, timed_out=True)
+            return worker.run(path, max(0.0, expires - time.monotonic()), mode, expected_output)
+        except Exception:
+            worker.broken = True
+            raise
+        finally:
+            self._release(worker)
+
+    def close(self) -> None:
+        """Stops every worker"""
+        with self._lock:
+            workers, self._workers = self._workers, []
+            while not self._idle.empty():
+                self._idle.get_nowait()
+        for worker in workers:
+            worker.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._workers)